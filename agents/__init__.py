@@ -1,9 +1,24 @@
 """
 Agents Package
 Multi-agent system for EduQuest
+
+Agents are imported on first access (agents.ManagerAgent), so importing the
+package does not load the model backends.
 """
-from .manager_agent import ManagerAgent
-from .planner_agent import PlannerAgent
-from .quiz_agent import QuizAgent
+import importlib
+
+_MODULES = {
+    'ManagerAgent': '.manager_agent',
+    'PlannerAgent': '.planner_agent',
+    'QuizAgent': '.quiz_agent',
+}
 
 __all__ = ['ManagerAgent', 'PlannerAgent', 'QuizAgent']
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -2,8 +2,44 @@
 Manager Agent - Primary Interface
 Analyzes user input and routes to appropriate specialist agents
 """
-import google.generativeai as genai
-from config import GEMINI_API_KEY, MANAGER_MODEL, MANAGER_TEMPERATURE
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+from config import MANAGER_MODEL, MANAGER_TEMPERATURE, MANAGER_STREAM_ENABLED, MANAGER_PARSE_RETRIES
+from json_stream import JsonStreamError, JsonStreamParser
+from llm_backend import ModelBackend, create_backend
+from messages import HELP_MESSAGE, WELCOME_MESSAGE
+from metrics import metrics
+
+# Separates the routing JSON from the task output in a fused reply
+PAYLOAD_MARKER = "===PAYLOAD==="
+
+INTENTS = ("PLANNER", "QUIZZER", "MANAGER")
+
+# Response schema for intent analysis. Fields are generated in this order, so
+# the intent and the message to show arrive before the extracted details.
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "format": "enum", "enum": list(INTENTS)},
+        "user_message": {"type": "string"},
+        "extracted_info": {
+            "type": "object",
+            "properties": {
+                "subject": {"type": "string"},
+                "topics": {"type": "array", "items": {"type": "string"}},
+                "days_available": {"type": "integer", "nullable": True},
+                "exam_date": {"type": "string", "nullable": True},
+                "additional_context": {"type": "string"},
+            },
+        },
+    },
+    "required": ["intent", "user_message", "extracted_info"],
+    "property_ordering": ["intent", "user_message", "extracted_info"],
+}
+
+_RETRY_NOTE = """
+
+Your previous reply could not be read. Reply with the JSON object only."""
 
 
 class ManagerAgent:
@@ -12,9 +48,9 @@ class ManagerAgent:
     and routes requests to either the Planner or Quiz agent.
     """
     
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(MANAGER_MODEL)
+    def __init__(self, backend: Optional[ModelBackend] = None):
+        self.model = backend or create_backend(MANAGER_MODEL)
+        self.use_schema = True  # cleared if the model SDK rejects response_schema
         
         self.system_prompt = """You are the Manager Agent for EduQuest, an intelligent study assistant.
 
@@ -46,26 +82,37 @@ RESPONSE FORMAT:
 Respond with a JSON object:
 {
     "intent": "PLANNER" | "QUIZZER" | "MANAGER",
+    "user_message": "A friendly message to the user explaining what you understood",
     "extracted_info": {
         "subject": "subject name if mentioned",
         "topics": ["list", "of", "topics"],
         "days_available": number or null,
         "exam_date": "date if mentioned" or null,
         "additional_context": "any other relevant info"
-    },
-    "user_message": "A friendly message to the user explaining what you understood"
+    }
 }
 
 Be conversational and helpful. Extract as much relevant information as possible from the user's input.
 """
     
-    def analyze_intent(self, user_input: str, conversation_context: str = "") -> dict:
+    def analyze_intent(self, user_input: str, conversation_context: str = "",
+                       on_field: Optional[Callable[[str, Any], None]] = None) -> dict:
         """
         Analyze user input and determine routing intent
         
+        The reply is constrained to INTENT_SCHEMA and parsed as it streams in.
+        A reply that breaks off or goes wrong after a valid intent is used as
+        far as it got; one without an intent is asked for again up to
+        MANAGER_PARSE_RETRIES times before falling back. If the SDK rejects
+        the schema config, the call is made again without it (and later calls
+        go without it), relying on the prompt's JSON instructions.
+        
         Args:
             user_input: The user's message
             conversation_context: Previous conversation context
+            on_field: Called with (name, value) as each field of the reply
+                arrives ("intent", then "user_message", then "extracted_info"),
+                before the whole reply is complete; at most once per field
             
         Returns:
             Dictionary with intent, extracted info, and user message
@@ -77,84 +124,182 @@ Previous Context: {conversation_context if conversation_context else "This is th
 User Input: {user_input}
 
 Analyze this input and respond with the JSON object as specified."""
+        generation_config = {
+            'temperature': MANAGER_TEMPERATURE,
+            'candidate_count': 1,
+        }
+        if self.use_schema:
+            generation_config.update(response_mime_type='application/json',
+                                     response_schema=INTENT_SCHEMA)
+        
+        reported = set()
+        attempt = 0
+        while attempt <= MANAGER_PARSE_RETRIES:
+            if attempt:
+                metrics.increment("manager.parse_retries")
+                prompt = prompt if prompt.endswith(_RETRY_NOTE) else prompt + _RETRY_NOTE
+            attempt += 1
+            parser = JsonStreamParser()
+            start = time.perf_counter()
+            chunks = self._reply_chunks(prompt, generation_config, streaming=on_field is not None)
+            try:
+                for chunk in chunks:
+                    for name, value in parser.feed(chunk):
+                        if not _valid_field(name, value):
+                            raise JsonStreamError(f"Invalid {name}: {value!r}")
+                        if name == "intent":
+                            metrics.observe("manager.intent_ms", (time.perf_counter() - start) * 1000)
+                        if on_field and name in INTENT_SCHEMA["properties"] and name not in reported:
+                            reported.add(name)
+                            on_field(name, value)
+                return self._routing(parser.close())
+            except JsonStreamError:
+                partial = self._partial_routing(parser)
+                if partial is not None:
+                    return partial
+            except Exception as e:
+                if "response_schema" in generation_config and _config_rejected(e):
+                    # An SDK without response schemas; the prompt still asks for JSON
+                    print(f"Manager Agent: model rejected the response schema ({e}); "
+                          f"continuing without it")
+                    metrics.increment("manager.schema_rejected")
+                    self.use_schema = False
+                    del generation_config['response_mime_type'], generation_config['response_schema']
+                    attempt -= 1
+                    continue
+                print(f"Error in Manager Agent: {e}")
+                break
+            finally:
+                chunks.close()
+        
+        metrics.increment("manager.fallbacks")
+        return self._fallback_routing()
+    
+    def _reply_chunks(self, prompt: str, generation_config: Dict, streaming: bool) -> Iterator[str]:
+        """The reply as a stream, or in one piece when nobody reads it early"""
+        if streaming and MANAGER_STREAM_ENABLED:
+            yield from self.model.stream_content(prompt, generation_config=generation_config)
+        else:
+            # A single call can be shared with identical concurrent requests
+            yield self.model.generate_content(prompt, generation_config=generation_config).text
+    
+    def route_and_act(self, user_input: str, conversation_context: str,
+                      intent: str, task_prompt: str, temperature: float = MANAGER_TEMPERATURE) -> dict:
+        """
+        Analyze intent and, in the same call, carry out the likely specialist task
+        
+        Args:
+            user_input: The user's message
+            conversation_context: Previous conversation context
+            intent: The intent the task belongs to (PLANNER or QUIZZER)
+            task_prompt: The specialist prompt to answer if the intent is confirmed
+            temperature: The specialist's own sampling temperature, so the task
+                output (which may be cached or shared) is sampled as it would be
+                by the specialist; the routing half is sampled at it too
+            
+        Returns:
+            analyze_intent's dictionary plus "payload": the task output, or None
+            when the model chose another intent or skipped the task
+        """
+        prompt = f"""{self.system_prompt}
+
+Previous Context: {conversation_context if conversation_context else "This is the start of the conversation"}
+
+User Input: {user_input}
+
+If the intent is {intent}, also carry out this {intent} task in the same reply:
+<<<TASK
+{task_prompt}
+TASK>>>
+
+RESPONSE FORMAT FOR THIS REPLY:
+First the JSON object as specified. If the intent is {intent}, follow it with a line
+containing only {PAYLOAD_MARKER} and then the task output exactly as the task asks.
+Otherwise stop after the JSON object."""
 
         try:
             response = self.model.generate_content(
                 prompt,
                 generation_config={
-                    'temperature': MANAGER_TEMPERATURE,
+                    'temperature': temperature,
                     'candidate_count': 1,
                 }
             )
             
-            # Extract JSON from response
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            response_text = response_text.strip()
-            
-            # Parse JSON
-            import json
-            result = json.loads(response_text)
-            
+            routing, _, payload = response.text.partition(PAYLOAD_MARKER)
+            result = self._parse_routing(routing)
+            payload = payload.strip()
+            result["payload"] = payload if payload and result.get("intent") == intent else None
             return result
             
         except Exception as e:
             print(f"Error in Manager Agent: {e}")
-            # Fallback response
-            return {
-                "intent": "MANAGER",
-                "extracted_info": {},
-                "user_message": "I'm having trouble understanding. Could you rephrase that?"
-            }
+            metrics.increment("manager.fallbacks")
+            result = self._fallback_routing()
+            result["payload"] = None
+            return result
+    
+    def _parse_routing(self, text: str) -> dict:
+        """Routing dictionary from the model's JSON reply (fences and stray text are skipped)"""
+        parser = JsonStreamParser()
+        try:
+            parser.feed(text)
+            return self._routing(parser.close())
+        except JsonStreamError:
+            partial = self._partial_routing(parser)
+            if partial is None:
+                raise
+            return partial
+    
+    def _partial_routing(self, parser: JsonStreamParser) -> Optional[dict]:
+        """Routing from the fields of a reply that failed to parse, if its intent came through"""
+        metrics.increment("manager.parse_failures")
+        if not _valid_field("intent", parser.fields.get("intent")):
+            return None
+        metrics.increment("manager.partial_parses")
+        return self._routing({name: value for name, value in parser.fields.items()
+                              if _valid_field(name, value)})
+    
+    def _routing(self, fields: Dict[str, Any]) -> dict:
+        """Routing dictionary with every field present"""
+        if not _valid_field("intent", fields.get("intent")):
+            raise JsonStreamError(f"Invalid intent: {fields.get('intent')!r}")
+        return {
+            "intent": fields["intent"],
+            "extracted_info": fields.get("extracted_info") or {},
+            "user_message": fields.get("user_message") or "",
+        }
+    
+    def _fallback_routing(self) -> dict:
+        return {
+            "intent": "MANAGER",
+            "extracted_info": {},
+            "user_message": "I'm having trouble understanding. Could you rephrase that?"
+        }
     
     def get_welcome_message(self) -> str:
         """Get welcome message for new users"""
-        return """
-╔═══════════════════════════════════════════════════════════╗
-║              Welcome to EduQuest!                         ║
-╚═══════════════════════════════════════════════════════════╝
-
-Hi! I'm your AI tutor designed to help u ace ur exams.
-
-I can help you:
-  - Create structured study plans based on your timeline
-  - Quiz you on specific topics with real-time feedback
-  - Track your progress and identify weak areas
-
-Examples of what you can say:
-  • "I have a Java exam in 3 days covering OOPs and Threads"
-  • "Help me prepare for my Data Structures final"
-  • "Quiz me on Python decorators and generators"
-  • "I want to practice Algorithms"
-
-What would you like to do today?
-"""
+        return WELCOME_MESSAGE
     
     def get_help_message(self) -> str:
         """Get help information"""
-        return """
-EduQuest Help
+        return HELP_MESSAGE
 
-CREATING STUDY PLANS:
-  Tell me about your exam, subject, topics, and timeline.
-  Example: "I have a Database exam in 5 days on SQL, Normalization, and Transactions"
 
-TAKING QUIZZES:
-  Ask to be quizzed on specific topics.
-  Example: "Quiz me on Java OOPs concepts"
+def _config_rejected(error: Exception) -> bool:
+    """Whether a model call failed on its generation config rather than the request"""
+    # TypeError/ValueError from SDK-side config validation, or the API's 400
+    # (google.api_core.exceptions.InvalidArgument, matched by name so the SDK stays optional)
+    return (isinstance(error, (TypeError, ValueError)) and not isinstance(error, JsonStreamError)
+            or type(error).__name__ == "InvalidArgument")
 
-TIPS:
-  • Be specific about topics and timeframes
-  • You can switch between planning and quizzing anytime
-  • Type 'exit' or 'quit' to end the session
 
-What would you like help with?
-"""
+def _valid_field(name: str, value: Any) -> bool:
+    """Whether a top-level field of the routing reply has a usable value (unknown fields pass)"""
+    if name == "intent":
+        return value in INTENTS
+    if name == "user_message":
+        return isinstance(value, str)
+    if name == "extracted_info":
+        return isinstance(value, dict)
+    return True
@@ -2,10 +2,19 @@
 Planner Agent - Study Schedule Specialist
 Creates structured study plans with Google Search grounding
 """
-import google.generativeai as genai
-from typing import List, Dict
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from config import GEMINI_API_KEY, PLANNER_MODEL, PLANNER_TEMPERATURE, DEFAULT_STUDY_HOURS_PER_DAY
+from config import (
+    PLANNER_MODEL, PLANNER_TEMPERATURE, DEFAULT_STUDY_HOURS_PER_DAY,
+    PLAN_CHUNKING_THRESHOLD_DAYS, PLAN_CHUNK_DAYS, PLAN_MAX_WORKERS
+)
+from call_scheduler import carry_context
+from llm_backend import ModelBackend, create_backend
+from study_scheduler import TopicSpec, DaySchedule, allocate_schedule, format_schedule
+from curriculum import CurriculumEntry, canonical_name, get_curriculum_index
+from plan_cache import PlanKey, plan_templates, make_plan_key, render_plan
 
 
 class PlannerAgent:
@@ -15,11 +24,9 @@ class PlannerAgent:
     workload into manageable chunks based on available time.
     """
     
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        
+    def __init__(self, backend: Optional[ModelBackend] = None):
         # Initialize the model (Google Search grounding requires different API in newer models)
-        self.model = genai.GenerativeModel(PLANNER_MODEL)
+        self.model = backend or create_backend(PLANNER_MODEL)
         
         self.system_prompt = """You are the Planner Agent for EduQuest, an expert study scheduler.
 
@@ -50,10 +57,17 @@ Provide a structured day-by-day breakdown with:
 - Review tasks
 
 Be encouraging and realistic. Quality over quantity."""
+        
+        # Known subjects come with a pre-ordered curriculum, so skip verification
+        self.indexed_system_prompt = self.system_prompt.replace(
+            "- Use Google Search to verify current syllabus/curriculum if topics are vague\n", ""
+        )
     
     def create_study_plan(self, subject: str, topics: List[str], 
                          days_available: int, exam_date: str = None,
-                         additional_context: str = "") -> Dict:
+                         additional_context: str = "",
+                         due_reviews: Optional[Dict[str, int]] = None,
+                         template: Optional[str] = None) -> Dict:
         """
         Create a comprehensive study plan
         
@@ -63,6 +77,10 @@ Be encouraging and realistic. Quality over quantity."""
             days_available: Number of days until exam
             exam_date: Exam date if provided
             additional_context: Any additional user requirements
+            due_reviews: {topic: plan day} from the learner's spaced repetition
+                memory; plan topics among them get review slots from that day
+            template: Plan text already generated for plan_prompt() (e.g. by a
+                fused routing call); cached and used instead of a model call
             
         Returns:
             Dictionary containing the structured study plan
@@ -75,51 +93,25 @@ Be encouraging and realistic. Quality over quantity."""
             exam_day = today + timedelta(days=days_available)
             exam_date_str = exam_day.strftime("%B %d, %Y")
         
-        # Construct the planning prompt
-        topics_str = ", ".join(topics) if topics else "general curriculum"
+        curriculum, specs, topics_str, schedule, key = self._prepare(
+            subject, topics, days_available, additional_context, due_reviews)
+        if template is not None:
+            plan_templates.put(key, template)
         
-        prompt = f"""{self.system_prompt}
-
-STUDY PLAN REQUEST:
-Subject: {subject}
-Topics to Cover: {topics_str}
-Days Available: {days_available}
-Exam Date: {exam_date_str}
-Additional Context: {additional_context if additional_context else "None"}
-Today's Date: {today.strftime("%B %d, %Y")}
-
-TASK:
-Create a comprehensive {days_available}-day study plan for {subject}.
-
-1. First, verify the key topics and concepts typically covered in {subject} curriculum
-2. Organize the topics ({topics_str}) into a logical learning sequence
-3. Create a day-by-day schedule that:
-   - Allocates approximately {DEFAULT_STUDY_HOURS_PER_DAY} hours per day
-   - Progresses from foundational to advanced concepts
-   - Includes practice and review sessions
-   - Leaves the last day for comprehensive revision
-
-4. For each day, specify:
-   - Date and Day number
-   - Main topics/subtopics
-   - Learning objectives
-   - Estimated time breakdown
-   - Recommended activities (reading, practice problems, video tutorials, etc.)
-   - Review checkpoints
-
-Make the plan specific, actionable, and motivating. Include study tips and strategies.
-"""
-
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    'temperature': PLANNER_TEMPERATURE,
-                    'candidate_count': 1,
-                }
+        def generate() -> str:
+            if days_available > PLAN_CHUNKING_THRESHOLD_DAYS:
+                return self._create_chunked_plan(
+                    subject, schedule, days_available, additional_context,
+                    curriculum, specs
+                )
+            return self._create_single_plan(
+                subject, topics_str, schedule, days_available,
+                additional_context, curriculum, specs
             )
-            
-            plan_text = response.text
+        
+        try:
+            template, cached = plan_templates.get_or_create(key, generate)
+            plan_text = render_plan(template, today, exam_date_str)
             
             return {
                 "success": True,
@@ -128,6 +120,8 @@ Make the plan specific, actionable, and motivating. Include study tips and strat
                 "days_available": days_available,
                 "exam_date": exam_date_str,
                 "plan": plan_text,
+                "schedule": [day.to_dict() for day in schedule],
+                "cached": cached,
                 "created_at": today.strftime("%B %d, %Y %H:%M")
             }
             
@@ -138,6 +132,183 @@ Make the plan specific, actionable, and motivating. Include study tips and strat
                 "message": "I encountered an error creating your study plan. Please try again."
             }
     
+    def plan_prompt(self, subject: str, topics: List[str], days_available: int,
+                    additional_context: str = "",
+                    due_reviews: Optional[Dict[str, int]] = None) -> Optional[str]:
+        """
+        The single model call create_study_plan would make for these arguments
+        
+        Returns:
+            The prompt, or None when no such call is needed (the plan is cached)
+            or one call is not enough (the plan is generated in chunks)
+        """
+        if days_available > PLAN_CHUNKING_THRESHOLD_DAYS:
+            return None
+        curriculum, specs, topics_str, schedule, key = self._prepare(
+            subject, topics, days_available, additional_context, due_reviews)
+        if plan_templates.get(key) is not None:
+            return None
+        return self._single_plan_prompt(subject, topics_str, schedule, days_available,
+                                        additional_context, curriculum, specs)
+    
+    def _prepare(self, subject: str, topics: List[str], days_available: int,
+                 additional_context: str, due_reviews: Optional[Dict[str, int]]) -> Tuple[
+            Optional[CurriculumEntry], List[TopicSpec], str, List[DaySchedule], PlanKey]:
+        """Curriculum, topic specs, topic list text, schedule and template key of a plan"""
+        # Known subjects use the offline curriculum for topic order and effort
+        index = get_curriculum_index()
+        curriculum = index.lookup(subject) if index else None
+        if curriculum:
+            specs = curriculum.select_topics(topics)
+            topics_str = ", ".join(spec.name for spec in specs)
+        else:
+            # In the learner's order, which the schedule (and template key) follows
+            unique: Dict[str, str] = {}
+            for topic in topics or []:
+                if topic.strip():
+                    unique.setdefault(canonical_name(topic), topic)
+            names = list(unique.values())
+            specs = [TopicSpec(t) for t in names] if names else [TopicSpec(subject)]
+            topics_str = ", ".join(names) if names else "general curriculum"
+        
+        # Reviews the learner is due for, matched to this plan's topic names
+        due_by_name = {canonical_name(t): day for t, day in (due_reviews or {}).items()}
+        reviews = [(spec.name, due_by_name[canonical_name(spec.name)]) for spec in specs
+                   if canonical_name(spec.name) in due_by_name]
+        
+        # Time allocation is computed locally; the model only describes the blocks
+        schedule = allocate_schedule(specs, days_available, DEFAULT_STUDY_HOURS_PER_DAY,
+                                     due_reviews=reviews)
+        
+        # Plans are generated date-relative and shared by every learner with the
+        # same request; concrete dates are applied locally when rendering
+        key = make_plan_key(subject, [spec.name for spec in specs], days_available,
+                            DEFAULT_STUDY_HOURS_PER_DAY, additional_context, reviews)
+        return curriculum, specs, topics_str, schedule, key
+    
+    def _create_single_plan(self, subject: str, topics_str: str, schedule: List[DaySchedule],
+                            days_available: int, additional_context: str,
+                            curriculum: Optional[CurriculumEntry],
+                            specs: List[TopicSpec]) -> str:
+        """Describe the whole schedule in one model call (short horizons)"""
+        prompt = self._single_plan_prompt(subject, topics_str, schedule, days_available,
+                                          additional_context, curriculum, specs)
+        response = self.model.generate_content(
+            prompt,
+            generation_config={
+                'temperature': PLANNER_TEMPERATURE,
+                'candidate_count': 1,
+            }
+        )
+        return response.text
+    
+    def _single_plan_prompt(self, subject: str, topics_str: str, schedule: List[DaySchedule],
+                            days_available: int, additional_context: str,
+                            curriculum: Optional[CurriculumEntry],
+                            specs: List[TopicSpec]) -> str:
+        if curriculum:
+            system_prompt = self.indexed_system_prompt
+            first_step = ("1. Use this pre-ordered curriculum for subtopics (already verified):\n"
+                          + textwrap.indent(curriculum.describe(specs), "   "))
+        else:
+            system_prompt = self.system_prompt
+            first_step = f"1. First, verify the key topics and concepts typically covered in {subject} curriculum"
+        
+        prompt = f"""{system_prompt}
+
+STUDY PLAN REQUEST:
+Subject: {subject}
+Topics to Cover: {topics_str}
+Days Available: {days_available}
+Additional Context: {additional_context if additional_context else "None"}
+
+FIXED SCHEDULE (topic order and hours are already decided - do not change them):
+{format_schedule(schedule)}
+
+TASK:
+Write the {days_available}-day study plan for {subject} following the fixed schedule.
+
+{first_step}
+2. For each day of the schedule, keep the day number, topics and hours as given and specify:
+   - Specific subtopics and concepts for each block
+   - Learning objectives
+   - Recommended activities (reading, practice problems, video tutorials, etc.)
+   - What to go over in [review] and [revision] blocks
+   - Review checkpoints
+
+Refer to days only as "Day 1" to "Day {days_available}"; do not mention calendar dates.
+Make the plan specific, actionable, and motivating. Include study tips and strategies.
+"""
+        return prompt
+    
+    def _create_chunked_plan(self, subject: str, schedule: List[DaySchedule],
+                             days_available: int, additional_context: str,
+                             curriculum: Optional[CurriculumEntry],
+                             specs: List[TopicSpec]) -> str:
+        """
+        Describe a long schedule in week-sized chunks generated concurrently
+        and merged in day order.
+        """
+        chunks = [schedule[i:i + PLAN_CHUNK_DAYS]
+                  for i in range(0, len(schedule), PLAN_CHUNK_DAYS)]
+        
+        def generate(chunk: List[DaySchedule]) -> str:
+            chunk_notes = None
+            if curriculum:
+                chunk_topics = {b.topic for day in chunk for b in day.blocks}
+                chunk_notes = curriculum.describe([s for s in specs if s.name in chunk_topics])
+            return self._create_plan_chunk(
+                subject, chunk, days_available, additional_context, chunk_notes
+            )
+        
+        # Chunks are called in this plan's priority class and tenant
+        with ThreadPoolExecutor(max_workers=min(PLAN_MAX_WORKERS, len(chunks))) as pool:
+            parts = list(pool.map(carry_context(generate), chunks))
+        
+        header = f"{days_available}-DAY STUDY PLAN: {subject}"
+        sections = []
+        for week, (chunk, part) in enumerate(zip(chunks, parts), start=1):
+            week_topics = list(dict.fromkeys(b.topic for day in chunk for b in day.blocks))
+            sections.append(
+                f"WEEK {week} (Days {chunk[0].day}-{chunk[-1].day}): "
+                f"{', '.join(week_topics)}\n\n{part.strip()}"
+            )
+        return header + "\n\n" + "\n\n".join(sections)
+    
+    def _create_plan_chunk(self, subject: str, chunk: List[DaySchedule], days_available: int,
+                           additional_context: str, curriculum_notes: Optional[str] = None) -> str:
+        """Describe the day-by-day schedule for one chunk of a long plan"""
+        start_day, end_day = chunk[0].day, chunk[-1].day
+        system_prompt = self.indexed_system_prompt if curriculum_notes else self.system_prompt
+        curriculum_section = (f"\nCURRICULUM FOR THIS CHUNK (pre-ordered, already verified):\n"
+                              f"{curriculum_notes}\n" if curriculum_notes else "")
+        
+        prompt = f"""{system_prompt}
+
+STUDY PLAN CHUNK REQUEST:
+Subject: {subject}
+This chunk covers Days {start_day}-{end_day} of a {days_available}-day plan
+Additional Context: {additional_context if additional_context else "None"}
+
+FIXED SCHEDULE (topic order and hours are already decided - do not change them):
+{format_schedule(chunk)}
+{curriculum_section}
+TASK:
+Write ONLY the day-by-day plan for Days {start_day}-{end_day}. For each day, keep the
+day number, topics and hours as given and specify subtopics, learning objectives,
+recommended activities, what to go over in [review] and [revision] blocks, and review
+checkpoints. Refer to days only as "Day N" and do not mention calendar dates.
+Do not add an introduction or closing remarks.
+"""
+        response = self.model.generate_content(
+            prompt,
+            generation_config={
+                'temperature': PLANNER_TEMPERATURE,
+                'candidate_count': 1,
+            }
+        )
+        return response.text
+    
     def refine_plan(self, original_plan: str, user_feedback: str) -> str:
         """
         Refine an existing study plan based on user feedback
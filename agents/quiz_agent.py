@@ -2,9 +2,20 @@
 Quiz Agent - Active Recall Specialist
 Generates questions, grades answers, and provides feedback
 """
-import google.generativeai as genai
+import json
+import re
 from typing import List, Dict, Optional
-from config import GEMINI_API_KEY, QUIZ_MODEL, QUIZ_TEMPERATURE, MAX_QUIZ_QUESTIONS
+from config import QUIZ_MODEL, QUIZ_TEMPERATURE, MAX_QUIZ_QUESTIONS
+from llm_backend import ModelBackend, create_backend
+from grading_memo import grading_memo, make_question_id
+
+# Hint tiers, weakest first; generated with the question so "hint" costs no call
+HINT_TIERS = (
+    "a gentle nudge towards the idea to use",
+    "a stronger hint that narrows down the approach",
+    "nearly the answer, without stating it",
+)
+_HINT_LINE = re.compile(r"^\s*HINT\s*(\d+)\s*:\s*(.*?)\s*$", re.I | re.M)
 
 
 class QuizAgent:
@@ -14,9 +25,9 @@ class QuizAgent:
     detailed feedback with corrections.
     """
     
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(QUIZ_MODEL)
+    def __init__(self, backend: Optional[ModelBackend] = None):
+        self.model = backend or create_backend(QUIZ_MODEL)
+        self.memo = grading_memo
         
         self.system_prompt = """You are the Quiz Agent for EduQuest, an expert educational assessor.
 
@@ -61,9 +72,34 @@ Keep responses focused and educational."""
         Returns:
             Dictionary with question details
         """
+        prompt = self.question_prompt(topic, difficulty, question_number, total_questions,
+                                      previous_topics)
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config={
+                    'temperature': QUIZ_TEMPERATURE,
+                    'candidate_count': 1,
+                }
+            )
+            return self.parse_question(response.text, topic, difficulty, question_number)
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "question": f"Error generating question: {str(e)}"
+            }
+    
+    def question_prompt(self, topic: str, difficulty: str = "medium",
+                        question_number: int = 1, total_questions: int = 10,
+                        previous_topics: List[str] = None) -> str:
+        """The prompt generate_question sends for these arguments"""
         previous_context = ""
         if previous_topics:
             previous_context = f"\nPreviously asked about: {', '.join(previous_topics)}"
+        hint_lines = "\n".join(f"HINT {i}: [One sentence: {tier}]"
+                               for i, tier in enumerate(HINT_TIERS, start=1))
         
         prompt = f"""{self.system_prompt}
 
@@ -87,40 +123,30 @@ QUESTION: [Your question here]
 TYPE: [MCQ/Short Answer/Conceptual/Application]
 DIFFICULTY: {difficulty}
 [If MCQ, include options A, B, C, D on separate lines]
+{hint_lines}
 
 Make the question clear, specific, and educational.
 For MCQs, ensure all options are plausible.
+Each HINT must be a single line and must not reveal the answer.
 REMEMBER: Only test {topic} - no other mathematical operations or concepts!
 """
-
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    'temperature': QUIZ_TEMPERATURE,
-                    'candidate_count': 1,
-                }
-            )
-            
-            question_text = response.text.strip()
-            
-            return {
-                "success": True,
-                "question": question_text,
-                "topic": topic,
-                "difficulty": difficulty,
-                "number": question_number
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "question": f"Error generating question: {str(e)}"
-            }
+        return prompt
+    
+    def parse_question(self, text: str, topic: str, difficulty: str = "medium",
+                       question_number: int = 1) -> Dict:
+        """Question details from a reply to question_prompt(), hints split off the question"""
+        return {
+            "success": True,
+            "question": _HINT_LINE.sub("", text).strip(),
+            "hints": _parse_hints(text),
+            "topic": topic,
+            "difficulty": difficulty,
+            "number": question_number
+        }
     
     def evaluate_answer(self, question: str, user_answer: str, 
-                       topic: str, question_type: str = "general") -> Dict:
+                       topic: str, question_type: str = "general",
+                       question_id: Optional[str] = None) -> Dict:
         """
         Evaluate a user's answer to a quiz question
         
@@ -129,10 +155,17 @@ REMEMBER: Only test {topic} - no other mathematical operations or concepts!
             user_answer: The user's response
             topic: The topic being tested
             question_type: Type of question (MCQ, Short Answer, etc.)
+            question_id: Bank id of the question; derived from its text if omitted
             
         Returns:
-            Dictionary with evaluation results
+            Dictionary with evaluation results ("memo" is set when a stored
+            verdict for the same or a near-identical answer was reused)
         """
+        question_id = question_id or make_question_id(question)
+        memoized = self.memo.lookup(question_id, user_answer)
+        if memoized is not None:
+            return memoized
+        
         prompt = f"""{self.system_prompt}
 
 ANSWER EVALUATION REQUEST:
@@ -175,13 +208,15 @@ Make feedback educational and encouraging.
             is_correct = "VERDICT: CORRECT" in evaluation_text
             is_partial = "PARTIALLY CORRECT" in evaluation_text
             
-            return {
+            result = {
                 "success": True,
                 "is_correct": is_correct,
                 "is_partial": is_partial,
                 "evaluation": evaluation_text,
                 "topic": topic
             }
+            self.memo.store(question_id, user_answer, result)
+            return result
             
         except Exception as e:
             return {
@@ -190,18 +225,142 @@ Make feedback educational and encouraging.
                 "evaluation": f"Error evaluating answer: {str(e)}"
             }
     
-    def generate_quiz_intro(self, topics: List[str], num_questions: int) -> str:
+    def evaluate_answers_batch(self, items: List[Dict]) -> List[Dict]:
+        """
+        Evaluate several answers in one structured model call (exam mode)
+        
+        Args:
+            items: Dicts with "question", "user_answer" and "topic" keys and
+                an optional "question_id"
+            
+        Returns:
+            One evaluation per item, in order, shaped like evaluate_answer's
+            result; items the batch response leaves out are graded individually
+        """
+        graded: Dict[int, Dict] = {}
+        question_ids = [item.get("question_id") or make_question_id(item["question"])
+                        for item in items]
+        for i, item in enumerate(items):
+            memoized = self.memo.lookup(question_ids[i], item["user_answer"])
+            if memoized is not None:
+                graded[i] = memoized
+        
+        # Only answers without a reusable verdict go to the model
+        to_grade = [i for i in range(len(items)) if i not in graded]
+        if to_grade:
+            graded.update(self._grade_batch([items[i] for i in to_grade], to_grade))
+            for i in to_grade:
+                if i in graded:
+                    self.memo.store(question_ids[i], items[i]["user_answer"], graded[i])
+        
+        results = []
+        for i, item in enumerate(items):
+            if i not in graded:
+                graded[i] = self.evaluate_answer(item["question"], item["user_answer"],
+                                                 item["topic"], question_id=question_ids[i])
+            results.append(graded[i])
+        return results
+    
+    def _grade_batch(self, items: List[Dict], positions: List[int]) -> Dict[int, Dict]:
+        """
+        Grade items in one JSON-structured call
+        
+        Returns:
+            Results keyed by the matching entry of positions; items the
+            response leaves out or garbles are missing
+        """
+        blocks = []
+        for i, item in enumerate(items, start=1):
+            blocks.append(f"""ITEM {i}
+Topic: {item["topic"]}
+QUESTION:
+{item["question"]}
+STUDENT'S ANSWER:
+{item["user_answer"]}""")
+        items_text = "\n\n".join(blocks)
+        
+        prompt = f"""{self.system_prompt}
+
+BATCH ANSWER EVALUATION REQUEST:
+Evaluate each of the following {len(items)} answers independently.
+
+{items_text}
+
+RESPOND ONLY WITH A JSON ARRAY, one object per item, in order:
+[
+  {{
+    "item": 1,
+    "verdict": "CORRECT" | "PARTIALLY CORRECT" | "INCORRECT",
+    "score": number from 0 to 10,
+    "correct_answer": "The complete correct answer",
+    "feedback": "What was right/wrong and why",
+    "key_concepts": "Main concepts the student should understand"
+  }}
+]
+
+Be fair in evaluation. Accept alternative correct phrasings.
+Make feedback educational and encouraging.
+"""
+        
+        graded: Dict[int, Dict] = {}
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config={
+                    'temperature': 0.3,  # Lower temperature for consistent evaluation
+                    'candidate_count': 1,
+                }
+            )
+            
+            response_text = response.text.strip()
+            if response_text.startswith('```json'):
+                response_text = response_text[7:]
+            if response_text.startswith('```'):
+                response_text = response_text[3:]
+            if response_text.endswith('```'):
+                response_text = response_text[:-3]
+            
+            for position, entry in enumerate(json.loads(response_text.strip()), start=1):
+                index = int(entry.get("item", position)) - 1
+                if not 0 <= index < len(items) or positions[index] in graded:
+                    continue
+                verdict = str(entry.get("verdict", "INCORRECT")).upper().strip()
+                evaluation_text = (
+                    f"VERDICT: {verdict}\n"
+                    f"SCORE: {entry.get('score', 0)}/10 points\n"
+                    f"CORRECT ANSWER: {entry.get('correct_answer', '')}\n"
+                    f"FEEDBACK: {entry.get('feedback', '')}\n"
+                    f"KEY CONCEPTS: {entry.get('key_concepts', '')}"
+                )
+                graded[positions[index]] = {
+                    "success": True,
+                    "is_correct": verdict == "CORRECT",
+                    "is_partial": verdict == "PARTIALLY CORRECT",
+                    "evaluation": evaluation_text,
+                    "correct_answer": str(entry.get("correct_answer", "")),
+                    "topic": items[index]["topic"]
+                }
+        except Exception as e:
+            print(f"Error in batch evaluation, grading individually: {e}")
+        
+        return graded
+    
+    def generate_quiz_intro(self, topics: List[str], num_questions: int,
+                            exam_mode: bool = False) -> str:
         """
         Generate an introduction for the quiz session
         
         Args:
             topics: List of topics to be covered
             num_questions: Number of questions in the quiz
+            exam_mode: Whether answers are graded together at the end
             
         Returns:
             Introduction text
         """
         topics_str = ", ".join(topics)
+        feedback_line = ("All answers are graded together at the end" if exam_mode
+                         else "You'll receive immediate feedback")
         
         return f"""
 ╔═══════════════════════════════════════════════════════════╗
@@ -214,7 +373,7 @@ Questions: {num_questions}
 INSTRUCTIONS:
 • Read each question carefully
 • Type your answer and press Enter
-• You'll receive immediate feedback
+• {feedback_line}
 • Try to explain your reasoning when possible
 • Learn from the explanations provided
 
@@ -271,30 +430,53 @@ Topics Covered: {", ".join(topics)}
         
         return summary
     
-    def get_hint(self, question: str, topic: str) -> str:
+    def get_hints(self, question: str, topic: str) -> List[str]:
         """
-        Generate a hint for a question without giving away the answer
+        Generate tiered hints for a question without giving away the answer
+        
+        Only needed for questions asked without their hints (e.g. reviews of
+        earlier questions); all tiers come from one call.
         
         Args:
             question: The question
             topic: The topic
             
         Returns:
-            Hint text
+            Hints from weakest to strongest
         """
-        prompt = f"""Provide a helpful hint for this question without revealing the answer:
+        tiers = "\n".join(f"HINT {i}: [{tier}]" for i, tier in enumerate(HINT_TIERS, start=1))
+        prompt = f"""Provide hints for this question without revealing the answer:
 
 Question: {question}
 Topic: {topic}
 
-Give a hint that guides thinking without giving away the answer directly.
-Keep it brief (1-2 sentences)."""
+Give {len(HINT_TIERS)} hints, each one sentence on its own line, from weakest to strongest:
+{tiers}"""
 
         try:
             response = self.model.generate_content(
                 prompt,
                 generation_config={'temperature': 0.5}
             )
-            return f"Hint: {response.text.strip()}"
+            return _parse_hints(response.text) or [" ".join(response.text.split())]
         except Exception as e:
-            return "Hint: Think about the fundamental concepts of this topic."
+            return ["Think about the fundamental concepts of this topic."]
+    
+    def get_hint(self, question: str, topic: str) -> str:
+        """
+        Generate a hint for a question without giving away the answer
+        
+        Args:
+            question: The question
+            topic: The topic
+            
+        Returns:
+            Hint text
+        """
+        return f"Hint: {self.get_hints(question, topic)[0]}"
+
+
+def _parse_hints(text: str) -> List[str]:
+    """HINT n: lines of a reply, in tier order"""
+    hints = sorted((int(n), hint) for n, hint in _HINT_LINE.findall(text) if hint)
+    return [hint for _, hint in hints]
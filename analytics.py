@@ -0,0 +1,576 @@
+"""
+Quiz-History Analytics for EduQuest
+Columnar store of every graded answer with vectorized NumPy queries
+
+Each row is one answer: learner id, topic id, difficulty, verdict, latency
+(seconds the learner took), timestamp and question key. On disk every column is a raw
+little-endian file that is appended to in place and memory-mapped for
+queries, so millions of rows are scanned with a handful of bincounts.
+Learner and topic names are kept in names.json; topics are keyed by
+curriculum.canonical_name().
+
+The process-wide history (ShardedHistory) splits learners over
+ANALYTICS_SHARDS such stores by a hash of the learner id, so every answer
+a learner gives lands in the same store whichever process records it.
+Processes share a store through a lock file: appends are serialized and
+queries first pick up rows the other processes appended.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, so keep to one process per directory
+    fcntl = None
+
+from config import ANALYTICS_DIR, ANALYTICS_HALF_LIFE_DAYS, ANALYTICS_SHARDS, WEAK_AREA_THRESHOLD
+from curriculum import canonical_name
+from grading_memo import make_question_id
+
+COLUMNS = (
+    ("learner", np.dtype("<i4")),
+    ("topic", np.dtype("<i4")),
+    ("difficulty", np.dtype("i1")),   # -1 unknown, 0 easy, 1 medium, 2 hard
+    ("verdict", np.dtype("i1")),      # INCORRECT, PARTIAL, CORRECT, SKIPPED
+    ("latency", np.dtype("<f4")),     # NaN when unknown
+    ("timestamp", np.dtype("<u4")),   # unix seconds
+    ("question", np.dtype("<u8")),    # question_key(text), 0 when unknown
+)
+
+DIFFICULTIES = {"easy": 0, "medium": 1, "hard": 2}
+_DIFFICULTY_NAMES = {code: name for name, code in DIFFICULTIES.items()}
+INCORRECT, PARTIAL, CORRECT, SKIPPED = 0, 1, 2, 3
+VERDICT_SCORE = np.array([0.0, 0.5, 1.0, 0.0])
+_PRESENCE_LIMIT = 64 * 1024 * 1024  # cells in the topic x learner grid before falling back to a sort
+
+# One answer: (learner, topic, difficulty, verdict, latency seconds, unix timestamp, question key)
+Row = Tuple[str, str, Optional[str], int, Optional[float], int, int]
+
+
+def question_key(question: str) -> int:
+    """64-bit key of a question's normalized text (never 0)"""
+    return int(make_question_id(question), 16) or 1
+
+
+def verdict_of(question) -> Optional[int]:
+    """Verdict code for a graded QuizQuestion, None if it has not been graded"""
+    if question.is_correct is None:
+        return None
+    if question.user_answer == "[Skipped]":
+        return SKIPPED
+    if question.is_correct:
+        return CORRECT
+    return PARTIAL if question.is_partial else INCORRECT
+
+
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock on path, held against other processes until the block exits"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+@dataclass
+class Snapshot:
+    """Names and columns of a history at one point, consistent with each other"""
+    learners: List[str]                 # indexed by the learner column
+    topics: List[str]                   # indexed by the topic column
+    columns: Dict[str, np.ndarray]
+    rows: List[int]                     # rows of each store covered, see learner_answers(since=...)
+
+    def topic_difficulty(self, min_answers: int = 1) -> List[Dict]:
+        """See QuizHistory.topic_difficulty"""
+        cols = self.columns
+        topics = cols["topic"].astype(np.intp)
+        if not len(topics):
+            return []
+        size = len(self.topics)
+        # One bincount over (topic, verdict) cells gives both answer counts and scores
+        by_verdict = np.bincount(topics * 4 + cols["verdict"], minlength=size * 4).reshape(size, 4)
+        answers = by_verdict.sum(axis=1)
+        scores = by_verdict @ VERDICT_SCORE
+
+        latency = cols["latency"]
+        timed = ~np.isnan(latency)
+        latency_sum = np.bincount(topics, weights=np.where(timed, latency, 0.0), minlength=size)
+        latency_count = np.bincount(topics, weights=timed, minlength=size)
+
+        learners = self._distinct_learners(topics, cols["learner"], size)
+
+        rows = [
+            {"topic": self.topics[t], "mastery": float(scores[t] / answers[t]),
+             "answers": int(answers[t]), "learners": int(learners[t]),
+             "mean_latency": float(latency_sum[t] / latency_count[t]) if latency_count[t] else None}
+            for t in np.flatnonzero(answers >= max(min_answers, 1))
+        ]
+        return sorted(rows, key=lambda r: r["mastery"])
+
+    def _distinct_learners(self, topics: np.ndarray, learners: np.ndarray, size: int) -> np.ndarray:
+        """Number of distinct learners per topic"""
+        width = max(len(self.learners), 1)
+        pairs = topics * width + learners
+        if size * width <= _PRESENCE_LIMIT:
+            # Scatter into a topic x learner presence grid: linear, no sort
+            seen = np.zeros(size * width, dtype=bool)
+            seen[pairs] = True
+            return seen.reshape(size, width).sum(axis=1)
+        return np.bincount(np.unique(pairs) // width, minlength=size)
+
+
+class QuizHistory:
+    """
+    Append-only answer history, in memory or persisted under a directory
+
+    Writers append whole quizzes at a time; queries see a consistent prefix.
+    Several processes may append to one directory.
+    """
+
+    shards = 1  # stores, and so entries of Snapshot.rows (see ShardedHistory)
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._learners: List[str] = []
+        self._topics: List[str] = []
+        self._learner_ids: Dict[str, int] = {}
+        self._topic_ids: Dict[str, int] = {}
+        self._rows = 0
+        self._columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+        self._maps: Optional[Dict[str, np.ndarray]] = None
+        self._names_stamp: Optional[Tuple[int, int]] = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            with self._file_lock():
+                self._repair()
+
+    # ----- storage -----
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".col")
+
+    def _file_lock(self):
+        return _locked(os.path.join(self.directory, ".lock"))
+
+    def _sizes(self) -> Dict[str, int]:
+        return {name: os.path.getsize(self._path(name)) // dtype.itemsize
+                for name, dtype in COLUMNS if os.path.exists(self._path(name))}
+
+    def _load_names(self):
+        try:
+            f = open(os.path.join(self.directory, "names.json"), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._names_stamp:
+                return
+            names = json.load(f)
+        self._names_stamp = stamp
+        self._learners = names.get("learners", [])
+        self._topics = names.get("topics", [])
+        self._learner_ids = {name: i for i, name in enumerate(self._learners)}
+        self._topic_ids = {canonical_name(name): i for i, name in enumerate(self._topics)}
+
+    def _repair(self):
+        # Caller holds the file lock, so no other process is mid-append
+        self._load_names()
+        # A crash mid-append can leave columns of different lengths; keep the common prefix.
+        # Columns added after the store was written are zero-filled (unknown).
+        sizes = self._sizes()
+        rows = min(sizes.values()) if sizes else 0
+        for name, dtype in COLUMNS:
+            if sizes.get(name, -1) != rows:
+                with open(self._path(name), "r+b" if name in sizes else "wb") as f:
+                    f.truncate(rows * dtype.itemsize)
+        if rows != self._rows:
+            self._rows = rows
+            self._maps = None
+
+    def _catch_up(self):
+        # Caller holds _lock. Another process may be mid-append, so only
+        # rows present in every column count; their names were saved first.
+        sizes = self._sizes()
+        rows = min(sizes.values()) if len(sizes) == len(COLUMNS) else 0
+        if rows > self._rows:
+            self._load_names()
+            self._rows = rows
+            self._maps = None
+
+    def _save_names(self):
+        path = os.path.join(self.directory, "names.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"learners": self._learners, "topics": self._topics}, f)
+        os.replace(path + ".tmp", path)
+        stat = os.stat(path)
+        self._names_stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def _id(self, ids: Dict[str, int], names: List[str], name: str, key: str) -> int:
+        index = ids.get(key)
+        if index is None:
+            index = ids[key] = len(names)
+            names.append(name)
+        return index
+
+    def append(self, rows: Sequence[Row]):
+        """Add answers (see Row); names are assigned ids on first use"""
+        if not rows:
+            return
+        with self._lock, (self._file_lock() if self.directory else nullcontext()):
+            if self.directory:
+                self._repair()
+            known = (len(self._learners), len(self._topics))
+            data = {
+                "learner": [self._id(self._learner_ids, self._learners, r[0], r[0]) for r in rows],
+                "topic": [self._id(self._topic_ids, self._topics, r[1], canonical_name(r[1]))
+                          for r in rows],
+                "difficulty": [DIFFICULTIES.get(r[2] or "", -1) for r in rows],
+                "verdict": [r[3] for r in rows],
+                "latency": [np.nan if r[4] is None else r[4] for r in rows],
+                "timestamp": [r[5] for r in rows],
+                "question": [r[6] for r in rows],
+            }
+            arrays = {name: np.asarray(data[name], dtype) for name, dtype in COLUMNS}
+
+            if self.directory:
+                # Names first, so every id in a column file can be resolved
+                if (len(self._learners), len(self._topics)) != known:
+                    self._save_names()
+                for name, _ in COLUMNS:
+                    with open(self._path(name), "ab") as f:
+                        f.write(arrays[name].tobytes())
+                self._maps = None
+            else:
+                needed = self._rows + len(rows)
+                for name, dtype in COLUMNS:
+                    column = self._columns[name]
+                    if needed > len(column):
+                        grown = np.empty(max(needed, 2 * len(column), 1024), dtype)
+                        grown[:self._rows] = column[:self._rows]
+                        self._columns[name] = column = grown
+                    column[self._rows:needed] = arrays[name]
+            self._rows += len(rows)
+
+    def record_quiz(self, learner: str, quiz, latencies: Optional[Dict[int, float]] = None,
+                    timestamp: Optional[int] = None):
+        """Append every graded question of a QuizSession"""
+        now = int(timestamp or time.time())
+        latencies = latencies or {}
+        rows = []
+        for i, q in enumerate(quiz.questions):
+            verdict = verdict_of(q)
+            if verdict is not None:
+                rows.append((learner, q.topic, q.difficulty, verdict, latencies.get(i), now,
+                             question_key(q.question)))
+        self.append(rows)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self.directory:
+                self._catch_up()
+            return self._rows
+
+    def learner_names(self) -> List[str]:
+        """Learner names indexed by the ids in the learner column"""
+        with self._lock:
+            return list(self._learners)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only arrays of every row appended so far (by any process)"""
+        with self._lock:
+            if not self.directory:
+                return {name: self._columns[name][:self._rows] for name, _ in COLUMNS}
+            self._catch_up()
+            if self._maps is None:
+                self._maps = {
+                    name: (np.memmap(self._path(name), dtype, mode="r", shape=(self._rows,))
+                           if self._rows else np.empty(0, dtype))
+                    for name, dtype in COLUMNS
+                }
+            return self._maps
+
+    def snapshot(self) -> Snapshot:
+        """Names and columns of every row appended so far"""
+        cols = self.columns()
+        with self._lock:
+            # Names are saved before the rows that use them, so these cover cols
+            return Snapshot(list(self._learners), list(self._topics), cols, [len(cols["learner"])])
+
+    # ----- queries -----
+
+    def learner_answers(self, learner: str, since: Sequence[int] = ()) -> List[Tuple]:
+        """
+        Every answer by one learner, oldest first
+
+        Args:
+            since: Snapshot.rows of an earlier snapshot; only answers after it
+
+        Returns:
+            [(topic, question key, verdict, latency, timestamp, difficulty), ...]
+        """
+        cols = self.columns()
+        learner_id = self._learner_ids.get(learner)
+        if learner_id is None:
+            return []
+        start = since[0] if since else 0
+        rows = start + np.flatnonzero(cols["learner"][start:] == learner_id)
+        latency = cols["latency"][rows]
+        return [
+            (self._topics[t], int(qk), int(v), None if np.isnan(l) else float(l), int(ts),
+             _DIFFICULTY_NAMES.get(int(d)))
+            for t, qk, v, l, ts, d in zip(cols["topic"][rows], cols["question"][rows],
+                                          cols["verdict"][rows], latency, cols["timestamp"][rows],
+                                          cols["difficulty"][rows])
+        ]
+
+    @staticmethod
+    def _decay(timestamps: np.ndarray, half_life_days: Optional[float],
+               now: Optional[float]) -> np.ndarray:
+        if not half_life_days:
+            return np.ones(len(timestamps))
+        age_days = ((now or time.time()) - timestamps.astype(np.float64)) / 86400.0
+        return np.exp2(-np.maximum(age_days, 0.0) / half_life_days)
+
+    def topic_mastery(self, learner: str, half_life_days: Optional[float] = ANALYTICS_HALF_LIFE_DAYS,
+                      now: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Recency-weighted mastery per topic for one learner
+
+        Returns:
+            {topic: {"mastery": 0..1, "answers": count}}
+        """
+        cols = self.columns()
+        learner_id = self._learner_ids.get(learner)
+        if learner_id is None:
+            return {}
+        mask = cols["learner"] == learner_id
+        topics = cols["topic"][mask]
+        if not len(topics):
+            return {}
+        weights = self._decay(cols["timestamp"][mask], half_life_days, now)
+        scores = VERDICT_SCORE[cols["verdict"][mask]]
+        size = len(self._topics)
+        weight_sum = np.bincount(topics, weights=weights, minlength=size)
+        score_sum = np.bincount(topics, weights=weights * scores, minlength=size)
+        answers = np.bincount(topics, minlength=size)
+        return {
+            self._topics[t]: {"mastery": float(score_sum[t] / weight_sum[t]), "answers": int(answers[t])}
+            for t in np.flatnonzero(answers)
+        }
+
+    def weak_areas(self, learner: str, threshold: float = WEAK_AREA_THRESHOLD,
+                   min_answers: int = 1, limit: Optional[int] = None, **kwargs) -> List[str]:
+        """Topics whose mastery is below threshold, weakest first"""
+        mastery = self.topic_mastery(learner, **kwargs)
+        weak = [(m["mastery"], topic) for topic, m in mastery.items()
+                if m["answers"] >= min_answers and m["mastery"] < threshold]
+        return [topic for _, topic in sorted(weak)][:limit]
+
+    def mastery_trend(self, learner: str, topic: Optional[str] = None,
+                      bucket_days: float = 7) -> List[Dict]:
+        """
+        Unweighted mastery per time bucket for one learner (optionally one topic)
+
+        Returns:
+            [{"start": unix seconds, "mastery": 0..1, "answers": count}, ...] oldest first
+        """
+        cols = self.columns()
+        learner_id = self._learner_ids.get(learner)
+        if learner_id is None:
+            return []
+        mask = cols["learner"] == learner_id
+        if topic is not None:
+            topic_id = self._topic_ids.get(canonical_name(topic))
+            if topic_id is None:
+                return []
+            mask &= cols["topic"] == topic_id
+        timestamps = cols["timestamp"][mask].astype(np.int64)
+        if not len(timestamps):
+            return []
+        bucket_seconds = int(bucket_days * 86400)
+        origin = int(timestamps.min()) // bucket_seconds * bucket_seconds
+        buckets = (timestamps - origin) // bucket_seconds
+        answers = np.bincount(buckets)
+        scores = np.bincount(buckets, weights=VERDICT_SCORE[cols["verdict"][mask]])
+        return [
+            {"start": origin + int(b) * bucket_seconds,
+             "mastery": float(scores[b] / answers[b]), "answers": int(answers[b])}
+            for b in np.flatnonzero(answers)
+        ]
+
+    def topic_difficulty(self, min_answers: int = 1) -> List[Dict]:
+        """
+        Cohort-level difficulty of every topic, hardest (lowest mastery) first
+
+        Returns:
+            [{"topic", "mastery", "answers", "learners", "mean_latency"}, ...]
+        """
+        return self.snapshot().topic_difficulty(min_answers)
+
+
+class ShardedHistory:
+    """
+    Quiz history split over QuizHistory stores by a hash of the learner id
+
+    A learner's answers all live in one store, so the history of every
+    learner is complete in whichever process serves them, and processes can
+    come and go without moving any of it. Cohort-wide reads (snapshot,
+    topic_difficulty) merge the stores. The stores are opened on first use
+    under <directory>/shards; the number of them is fixed when that
+    directory is created. Stores written before sharding (directly under
+    directory, or one per cluster worker beneath it) are merged into the
+    shards and moved to <directory>/migrated.
+    """
+
+    def __init__(self, directory: Optional[str] = None, shards: int = ANALYTICS_SHARDS):
+        self.directory = directory
+        self._lock = threading.Lock()
+        if directory:
+            root = os.path.join(directory, "shards")
+            os.makedirs(root, exist_ok=True)
+            with _locked(os.path.join(root, ".lock")):
+                layout = os.path.join(root, "layout.json")
+                if os.path.exists(layout):
+                    with open(layout, "r", encoding="utf-8") as f:
+                        shards = json.load(f)["shards"]
+                else:
+                    with open(layout + ".tmp", "w", encoding="utf-8") as f:
+                        json.dump({"shards": shards}, f)
+                    os.replace(layout + ".tmp", layout)
+                self.shards = shards
+                self._stores: List[Optional[QuizHistory]] = [None] * shards
+                self._migrate()
+        else:
+            self.shards = shards
+            self._stores = [None] * shards
+
+    def shard_of(self, learner: str) -> int:
+        """Index of the store holding learner's answers"""
+        return int(hashlib.md5(learner.encode("utf-8")).hexdigest()[:8], 16) % self.shards
+
+    def _store(self, index: int) -> QuizHistory:
+        with self._lock:
+            store = self._stores[index]
+            if store is None:
+                path = os.path.join(self.directory, "shards", f"{index:03d}") if self.directory else None
+                store = self._stores[index] = QuizHistory(path)
+            return store
+
+    def _migrate(self):
+        # Caller holds the shards lock, so one process migrates and the others find nothing left
+        retired = os.path.join(self.directory, "migrated")
+        for name in [""] + sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name in ("shards", "migrated") or not os.path.exists(os.path.join(path, "names.json")):
+                continue
+            old = QuizHistory(path).snapshot()
+            cols = old.columns
+            self.append([
+                (old.learners[l], old.topics[t], _DIFFICULTY_NAMES.get(int(d)), int(v),
+                 None if np.isnan(lat) else float(lat), int(ts), int(qk))
+                for l, t, d, v, lat, ts, qk in zip(*(cols[column] for column, _ in COLUMNS))
+            ])
+            os.makedirs(retired, exist_ok=True)
+            if name:
+                os.replace(path, os.path.join(retired, name))
+            else:
+                os.makedirs(os.path.join(retired, "root"), exist_ok=True)
+                for file in ["names.json", ".lock"] + [column + ".col" for column, _ in COLUMNS]:
+                    if os.path.exists(os.path.join(path, file)):
+                        shutil.move(os.path.join(path, file), os.path.join(retired, "root", file))
+
+    def append(self, rows: Sequence[Row]):
+        """Add answers (see Row), each to its learner's store"""
+        by_shard: Dict[int, List[Row]] = {}
+        for row in rows:
+            by_shard.setdefault(self.shard_of(row[0]), []).append(row)
+        for index, shard_rows in by_shard.items():
+            self._store(index).append(shard_rows)
+
+    def record_quiz(self, learner: str, quiz, latencies: Optional[Dict[int, float]] = None,
+                    timestamp: Optional[int] = None):
+        """See QuizHistory.record_quiz"""
+        self._store(self.shard_of(learner)).record_quiz(learner, quiz, latencies, timestamp)
+
+    def __len__(self) -> int:
+        return sum(len(self._store(i)) for i in range(self.shards))
+
+    def snapshot(self) -> Snapshot:
+        """Every store merged, learner and topic ids renumbered across them"""
+        learners: List[str] = []
+        topics: List[str] = []
+        topic_ids: Dict[str, int] = {}
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name, _ in COLUMNS}
+        rows = []
+        for i in range(self.shards):
+            part = self._store(i).snapshot()
+            remap = []
+            for topic in part.topics:
+                key = canonical_name(topic)
+                if key not in topic_ids:
+                    topic_ids[key] = len(topics)
+                    topics.append(topic)
+                remap.append(topic_ids[key])
+            remap = np.array(remap, dtype=np.intp)
+            for name, dtype in COLUMNS:
+                column = part.columns[name]
+                if name == "learner":
+                    column = (column + len(learners)).astype(dtype)
+                elif name == "topic" and len(column):
+                    column = remap[column]
+                parts[name].append(column)
+            learners.extend(part.learners)
+            rows.extend(part.rows)
+        return Snapshot(learners, topics, {name: np.concatenate(parts[name]).astype(dtype, copy=False)
+                                           for name, dtype in COLUMNS}, rows)
+
+    def learner_answers(self, learner: str, since: Sequence[int] = ()) -> List[Tuple]:
+        """See QuizHistory.learner_answers; since has one entry per store"""
+        index = self.shard_of(learner)
+        return self._store(index).learner_answers(learner, since[index:index + 1])
+
+    def topic_mastery(self, learner: str, *args, **kwargs) -> Dict[str, Dict]:
+        """See QuizHistory.topic_mastery"""
+        return self._store(self.shard_of(learner)).topic_mastery(learner, *args, **kwargs)
+
+    def weak_areas(self, learner: str, *args, **kwargs) -> List[str]:
+        """See QuizHistory.weak_areas"""
+        return self._store(self.shard_of(learner)).weak_areas(learner, *args, **kwargs)
+
+    def mastery_trend(self, learner: str, *args, **kwargs) -> List[Dict]:
+        """See QuizHistory.mastery_trend"""
+        return self._store(self.shard_of(learner)).mastery_trend(learner, *args, **kwargs)
+
+    def topic_difficulty(self, min_answers: int = 1) -> List[Dict]:
+        """See QuizHistory.topic_difficulty"""
+        return self.snapshot().topic_difficulty(min_answers)
+
+
+_history: Optional[ShardedHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_quiz_history() -> ShardedHistory:
+    """Process-wide history sharded under ANALYTICS_DIR (in memory if that is unusable)"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            try:
+                _history = ShardedHistory(ANALYTICS_DIR)
+            except (OSError, ValueError, KeyError):
+                _history = ShardedHistory()
+        return _history
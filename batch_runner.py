@@ -0,0 +1,151 @@
+"""
+Headless Batch Runner for EduQuest
+Drives the full agent stack from a JSONL file of requests, without prompts
+
+Each input line is a request such as:
+    {"id": "alice-plan", "learner_id": "alice", "message": "I have a Java exam in 10 days",
+     "days": 10, "topics": ["OOPs", "Threads"],
+     "num_questions": 3, "exam_mode": false, "answers": ["...", "skip", "..."]}
+
+"message" is routed through ManagerAgent exactly as in the interactive app.
+Follow-up questions (days, topics, number of questions, ...) are answered
+from the pre-filled fields, and "answers" are fed as the following turns,
+which starts a quiz after a plan. Results are written as JSONL with
+per-turn timing.
+
+Usage:
+    python batch_runner.py requests.jsonl -o results.jsonl --concurrency 8
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List
+
+from config import BATCH_CONCURRENCY
+from grade_batch import read_records
+from session_state import SessionState
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def _prefilled_answers(record: Dict) -> Dict[str, str]:
+    """Map each follow-up prompt field to the record's pre-filled value"""
+    topics = record.get("topics") or []
+    if isinstance(topics, str):
+        topics = [topics]
+    answers = record.get("answers") or []
+    return {
+        "days": str(record.get("days") or ""),
+        "topics": ", ".join(topics),
+        "quiz_topics": ", ".join(topics),
+        "start_quiz": "yes" if answers else "no",
+        "num_questions": str(record.get("num_questions") or len(answers) or ""),
+        "exam_mode": "yes" if record.get("exam_mode") else "no",
+    }
+
+
+def run_record(record: Dict, manager, planner, quizzer) -> Dict:
+    """Run one request through a fresh session and collect its results"""
+    from eduquest import EduQuest
+
+    state = SessionState(str(record.get("learner_id") or record.get("id") or "batch"))
+    output: List[str] = []
+    prefilled = _prefilled_answers(record)
+    app = EduQuest(manager, planner, quizzer, state=state,
+                   ask=lambda field, prompt: prefilled.get(field, ""),
+                   output=lambda text="": output.append(_ANSI.sub("", str(text))))
+
+    turns = []
+    error = None
+    started = time.perf_counter()
+    try:
+        for user_input in [record["message"]] + list(record.get("answers") or []):
+            turn_start = time.perf_counter()
+            app.handle_input(user_input)
+            turns.append({"input": user_input,
+                          "seconds": round(time.perf_counter() - turn_start, 4)})
+    except Exception as e:
+        error = str(e)
+
+    result = {
+        "id": record.get("id"),
+        "success": error is None,
+        "error": error,
+        "intent": app.last_intent,
+        "turns": turns,
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "output": "\n".join(output),
+    }
+    plan = state.current_study_plan
+    if plan:
+        result["plan"] = {"subject": plan.subject, "topics": plan.topics,
+                          "days_available": plan.days_available,
+                          "schedule": plan.daily_schedule}
+    quiz = state.quiz_session
+    if quiz:
+        result["quiz"] = {"score": quiz.score, "questions": len(quiz.questions),
+                          "complete": quiz.is_complete()}
+    return result
+
+
+def run_batch(input_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY,
+              manager=None, planner=None, quizzer=None) -> Dict:
+    """
+    Run every request in input_path, concurrency at a time
+
+    Agents are shared across requests; each request gets its own session.
+    Results are appended to output_path in completion order.
+    """
+    from agents.manager_agent import ManagerAgent
+    from agents.planner_agent import PlannerAgent
+    from agents.quiz_agent import QuizAgent
+
+    manager = manager or ManagerAgent()
+    planner = planner or PlannerAgent()
+    quizzer = quizzer or QuizAgent()
+
+    write_lock = threading.Lock()
+    stats = {"records": 0, "failed": 0}
+    start = time.perf_counter()
+
+    def run(record: Dict) -> Dict:
+        result = run_record(record, manager, planner, quizzer)
+        with write_lock:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            stats["records"] += 1
+            stats["failed"] += 0 if result["success"] else 1
+        return result
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+        for _, record in read_records(input_path):
+            if len(pending) >= 2 * concurrency:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending.add(pool.submit(run, record))
+        wait(pending)
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["records_per_second"] = round(stats["records"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run EduQuest requests headlessly")
+    parser.add_argument("input", help="JSONL file of requests")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    args = parser.parse_args()
+
+    stats = run_batch(args.input, args.output, args.concurrency)
+    print(json.dumps(stats, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+Benchmarks Package
+Offline performance measurements for EduQuest (run with python -m benchmarks.<name>)
+"""
@@ -0,0 +1,95 @@
+"""
+Session Memory Benchmark for EduQuest
+Measures bytes held per idle SessionState after a typical session
+
+Each session gets a 14-day study plan, a finished 10-question quiz with
+feedback, and 40 history messages, built through the public SessionState
+API (no model calls). Memory is measured with tracemalloc, both as left
+after the last turn and after SessionState.compact() (what the server does
+to idle sessions).
+
+Usage:
+    python -m benchmarks.bench_memory --sessions 2000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_state import SessionState, StudyPlan  # noqa: E402
+
+TOPICS = ["OOPs", "Threads", "Collections", "Exceptions", "Generics"]
+FEEDBACK = ("VERDICT: PARTIALLY CORRECT\nSCORE: 6/10\n\nCORRECT ANSWER:\n"
+            "A thread is the smallest unit of execution scheduled by the operating "
+            "system. Threads share the heap of their process, so access to shared "
+            "state must be synchronized.\n\nFEEDBACK:\nYou correctly said that threads "
+            "run concurrently, but you missed why shared memory makes that risky. "
+            "Two threads incrementing one counter can lose updates because the "
+            "read-modify-write is not atomic. Mention locks, synchronized blocks or "
+            "atomic classes, and give a tiny example such as a bank balance being "
+            "updated from two tellers at once.\n\nKEY CONCEPTS TO REVIEW:\n"
+            "- Race conditions\n- Synchronization and monitors\n- java.util.concurrent atomics\n")
+QUESTION = ("Question {n} of 10 (medium):\nExplain how {topic} behaves when several "
+            "parts of a program use it at once, and give a short example of a "
+            "common mistake learners make with it.")
+
+
+def build_session(seed: int, compact: bool = False) -> SessionState:
+    """A session in the state it would idle in after a plan and a quiz"""
+    state = SessionState()
+    schedule = [
+        {"day": day, "blocks": [{"topic": TOPICS[(day + i) % len(TOPICS)], "hours": 1.5,
+                                 "kind": "study" if i == 0 else "review"} for i in range(2)]}
+        for day in range(1, 15)
+    ]
+    state.set_study_plan(StudyPlan(subject="Java", topics=list(TOPICS[:3]),
+                                   days_available=14, exam_date="in 14 days",
+                                   daily_schedule=schedule))
+
+    state.start_quiz(list(TOPICS[:3]), 10)
+    quiz = state.quiz_session
+    for n in range(10):
+        topic = TOPICS[n % 3]
+        quiz.add_question(QUESTION.format(n=n + 1, topic=topic) + f" [{seed}]", topic)
+        quiz.record_answer(f"My answer {seed}-{n}: it runs code concurrently and shares memory",
+                           is_correct=n % 3 == 0, correct_answer="See feedback above",
+                           feedback=FEEDBACK + f"({seed}-{n})")
+    state.end_quiz()
+
+    for n in range(20):
+        state.add_to_history("user", f"Can you explain topic {n} again for session {seed}?")
+        state.add_to_history("assistant", f"Sure - here is a short recap of topic {n}. " * 4)
+    if compact:
+        state.compact()
+    return state
+
+
+def measure(count: int, compact: bool = False) -> float:
+    """Average traced bytes per session over count live sessions"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions = [build_session(i, compact) for i in range(count)]
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del sessions
+    return held / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per idle EduQuest session")
+    parser.add_argument("--sessions", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps({"sessions": args.sessions,
+                      "bytes_per_session": round(measure(args.sessions), 1),
+                      "bytes_per_compacted_session": round(measure(args.sessions, True), 1)},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+End-to-end Session Benchmarks for EduQuest
+Drives scripted sessions through EduQuest against the stub model backend
+
+Reports per-turn latency percentiles, model calls, prompt tokens and CPU time
+per turn, and peak RSS for each scenario. Each scenario runs in a fresh
+process, so its peak RSS is its own rather than the largest so far. Results
+can be saved as a baseline and later runs compared against it to flag
+regressions.
+
+Usage:
+    python -m benchmarks.bench_sessions --latency 0.05 --tokens-per-second 200
+    python -m benchmarks.bench_sessions --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_sessions --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backend import StubBackend  # noqa: E402
+from session_state import SessionState  # noqa: E402
+
+# Metrics compared against a baseline; higher is worse for all of them
+GATED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "calls_per_turn",
+                 "prompt_tokens_per_turn", "cpu_ms_per_turn", "peak_rss_mb")
+
+
+def _answers(n: int) -> List[str]:
+    return [f"My answer number {i} explains the core idea with an example" for i in range(n)]
+
+
+# Each scenario: prefilled follow-up answers and the scripted user turns
+SCENARIOS: Dict[str, Dict] = {
+    "plan": {
+        "prefilled": {"start_quiz": "no"},
+        "turns": ["I have a Java exam in 5 days covering OOPs and Threads"],
+    },
+    "long_plan": {
+        "prefilled": {"start_quiz": "no"},
+        "turns": ["I have a Data Structures exam in 60 days, help me prepare"],
+    },
+    "quiz_10": {
+        "prefilled": {"num_questions": "10", "exam_mode": "no"},
+        "turns": ["Quiz me on Python decorators"] + _answers(10),
+    },
+    "exam_10": {
+        "prefilled": {"num_questions": "10", "exam_mode": "yes"},
+        "turns": ["Quiz me on Python generators"] + _answers(10),
+    },
+    "quiz_hints_skips": {
+        "prefilled": {"num_questions": "6", "exam_mode": "no"},
+        "turns": ["Quiz me on Java threads", "hint", "skip", "hint", "hint",
+                  "A thread is a unit of execution", "skip", "hint",
+                  "Synchronization prevents races", "skip", "skip"],
+    },
+    "conversation_100": {
+        "prefilled": {},
+        "turns": [f"Hello again, tell me something about studying ({i})" for i in range(100)],
+    },
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct * len(ordered) / 100.0))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 2)
+
+
+def _reset_caches():
+    from grading_memo import grading_memo
+    from plan_cache import plan_templates
+    grading_memo.clear()
+    plan_templates.clear()
+
+
+def run_scenario(name: str, backend: StubBackend, repeat: int = 1,
+                 warm_caches: bool = False) -> Dict:
+    """Run one scenario repeat times and summarize its turns"""
+    from agents.manager_agent import ManagerAgent
+    from agents.planner_agent import PlannerAgent
+    from agents.quiz_agent import QuizAgent
+    from analytics import QuizHistory
+    from eduquest import EduQuest
+
+    scenario = SCENARIOS[name]
+    manager, planner, quizzer = ManagerAgent(backend), PlannerAgent(backend), QuizAgent(backend)
+    latencies, calls, tokens, cpu = [], [], [], []
+
+    for _ in range(repeat):
+        if not warm_caches:
+            _reset_caches()
+        prefilled = scenario["prefilled"]
+        app = EduQuest(manager, planner, quizzer, state=SessionState(),
+                       ask=lambda field, prompt: prefilled.get(field, ""),
+                       output=lambda text="": None, history=QuizHistory())
+        for user_input in scenario["turns"]:
+            calls_before, tokens_before = backend.calls, backend.prompt_tokens
+            cpu_before = time.process_time()
+            start = time.perf_counter()
+            app.handle_input(user_input)
+            latencies.append((time.perf_counter() - start) * 1000)
+            cpu.append((time.process_time() - cpu_before) * 1000)
+            calls.append(backend.calls - calls_before)
+            tokens.append(backend.prompt_tokens - tokens_before)
+
+    turns = len(latencies)
+    return {
+        "turns": turns,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "calls_per_turn": round(sum(calls) / turns, 3),
+        "prompt_tokens_per_turn": round(sum(tokens) / turns, 1),
+        "cpu_ms_per_turn": round(sum(cpu) / turns, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_isolated(name: str, latency: float, tokens_per_second: Optional[float],
+                  repeat: int, warm_caches: bool) -> Dict:
+    # Entry point of the per-scenario process
+    backend = StubBackend(latency=latency, tokens_per_second=tokens_per_second)
+    return run_scenario(name, backend, repeat, warm_caches)
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """List metrics that got worse than baseline by more than tolerance"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in GATED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            # Small absolute slack so near-zero metrics do not flap
+            if new > old * (1 + tolerance) + 0.5:
+                regressions.append(f"{name}.{metric}: {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduQuest end-to-end session benchmarks")
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS),
+                        choices=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Stub model latency per call (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=None,
+                        help="Stub model output throughput")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="Keep plan/grading caches between repeats")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--save-baseline", help="Write results as a baseline JSON")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative increase before flagging a regression")
+    args = parser.parse_args()
+
+    # One fresh process per scenario (ru_maxrss only ever grows)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        scenarios = {name: pool.apply(_run_isolated, (name, args.latency, args.tokens_per_second,
+                                                      args.repeat, args.warm_caches))
+                     for name in args.scenarios}
+    results = {
+        "config": {"latency": args.latency, "tokens_per_second": args.tokens_per_second,
+                   "repeat": args.repeat, "warm_caches": args.warm_caches},
+        "scenarios": scenarios,
+    }
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
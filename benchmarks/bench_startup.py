@@ -0,0 +1,184 @@
+"""
+Startup Benchmark for EduQuest
+Measures cold start of the CLI and the server in fresh interpreters
+
+Each scenario starts a new Python process (stub backend, throwaway data
+directories) and takes the median wall time over --repeat runs:
+
+    interpreter      python -c pass, the floor for everything else
+    import_eduquest  import eduquest, as tools and server workers do
+    import_server    import server
+    cli_banner       python eduquest.py until the welcome banner is printed
+    cli_first_reply  ... until the reply to the first message (agents loaded)
+    server_listen    python server.py --stub until it is accepting connections
+
+The slowest modules behind `import eduquest` (python -X importtime) are
+listed too, to show where a regression came from.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --save-baseline startup.json
+    python -m benchmarks.bench_startup --compare startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GATED_SCENARIOS = ("import_eduquest", "import_server", "cli_banner", "cli_first_reply", "server_listen")
+
+
+def _environment(data_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "EDUQUEST_BACKEND": "stub",
+        "EDUQUEST_ANALYTICS_DIR": os.path.join(data_dir, "analytics"),
+        "PYTHONUNBUFFERED": "1",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def _time_command(args: Sequence[str], env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def _read_until(stream, marker: bytes) -> bool:
+    """Read stream until marker appears; False if it ends first"""
+    seen = b""
+    while marker not in seen:
+        chunk = os.read(stream.fileno(), 65536)
+        if not chunk:
+            return False
+        seen = seen[-len(marker):] + chunk
+    return True
+
+
+def _time_cli(env: Dict[str, str]) -> Dict[str, float]:
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "eduquest.py"], cwd=ROOT, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    try:
+        if not _read_until(process.stdout, b"Welcome to EduQuest"):
+            raise RuntimeError("CLI exited before showing its banner")
+        banner = (time.perf_counter() - start) * 1000
+        process.stdin.write(b"hello\n")
+        process.stdin.flush()
+        if not _read_until(process.stdout, b"EduQuest:"):
+            raise RuntimeError("CLI exited before replying")
+        reply = (time.perf_counter() - start) * 1000
+        process.stdin.write(b"exit\n")
+        process.stdin.flush()
+        process.wait(timeout=30)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    return {"cli_banner": banner, "cli_first_reply": reply}
+
+
+def _time_server(env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "server.py", "--stub", "--port", "0",
+                                "--session-dir", ""],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE)
+    try:
+        if not _read_until(process.stderr, b"serving on"):
+            raise RuntimeError("Server exited before listening")
+        return (time.perf_counter() - start) * 1000
+    finally:
+        process.kill()
+        process.wait()
+
+
+def slowest_imports(env: Dict[str, str], limit: int = 8) -> List[Dict]:
+    """Modules with the largest cumulative import time under `import eduquest`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import eduquest"],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            modules.append({"module": parts[2].strip(), "cumulative_ms": int(parts[1]) / 1000})
+    modules.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+    return [dict(m, cumulative_ms=round(m["cumulative_ms"], 1)) for m in modules[:limit]]
+
+
+def run(repeat: int) -> Dict:
+    samples: Dict[str, List[float]] = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = _environment(data_dir)
+        # One unmeasured run of each so every scenario sees warm OS file caches
+        _time_command(["-c", "import eduquest, server"], env)
+        for _ in range(repeat):
+            samples.setdefault("interpreter", []).append(_time_command(["-c", "pass"], env))
+            samples.setdefault("import_eduquest", []).append(_time_command(["-c", "import eduquest"], env))
+            samples.setdefault("import_server", []).append(_time_command(["-c", "import server"], env))
+            for name, value in _time_cli(env).items():
+                samples.setdefault(name, []).append(value)
+            samples.setdefault("server_listen", []).append(_time_server(env))
+        imports = slowest_imports(env)
+    return {
+        "config": {"repeat": repeat, "python": sys.version.split()[0]},
+        "scenarios": {name: {"median_ms": round(statistics.median(values), 1),
+                             "max_ms": round(max(values), 1)}
+                      for name, values in samples.items()},
+        "slowest_imports": imports,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Scenarios whose median got slower than baseline by more than tolerance"""
+    regressions = []
+    for name in GATED_SCENARIOS:
+        old = baseline.get("scenarios", {}).get(name, {}).get("median_ms")
+        new = results["scenarios"].get(name, {}).get("median_ms")
+        # Small absolute slack so process start-up noise does not flap
+        if old is not None and new is not None and new > old * (1 + tolerance) + 10:
+            regressions.append(f"{name}.median_ms: {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure EduQuest CLI and server cold start")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--save-baseline", help="Write results as a baseline JSON")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative increase before flagging a regression")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    text = json.dumps(results, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
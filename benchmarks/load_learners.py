@@ -0,0 +1,285 @@
+"""
+Concurrent-Learner Load Generator for EduQuest
+Simulates N virtual learners with think times against EduQuest
+
+Each virtual learner repeatedly opens a session and runs a planning, quiz
+or plan-then-quiz flow, pausing for an exponentially distributed think time
+between turns. Concurrency is ramped through --levels; each level reports
+throughput versus turn latency, event-loop lag and memory per session.
+
+In-process mode drives the real SessionState/QuizSession objects through
+EduQuest.handle_input with a stub backend of tunable latency. HTTP mode
+drives a running server.py instead.
+
+Usage:
+    python -m benchmarks.load_learners --levels 1 4 16 64 --duration 10 --latency 0.2
+    python server.py --stub --stub-latency 0.2 &
+    python -m benchmarks.load_learners --url http://127.0.0.1:8080 --levels 1 8 32
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_sessions import percentile  # noqa: E402
+from server import peak_rss_bytes  # noqa: E402
+
+SUBJECTS = {
+    "Java": ["OOPs", "Threads", "Collections", "Exceptions"],
+    "Python": ["Decorators", "Generators", "Context Managers"],
+    "Data Structures": ["Trees", "Graphs", "Heaps", "Hash Tables"],
+    "Databases": ["Normalization", "Indexes", "Transactions"],
+}
+
+ANSWERS = [
+    "It lets several tasks make progress at the same time",
+    "A structure that keeps items ordered so lookups are fast",
+    "It wraps a function to add behaviour without changing it",
+    "I am not sure, maybe it is about memory",
+    "b",
+]
+
+
+def make_flow(rng: random.Random) -> Tuple[List[str], Dict[str, str]]:
+    """A learner's scripted turns and the answers to follow-up prompts"""
+    subject = rng.choice(list(SUBJECTS))
+    topics = rng.sample(SUBJECTS[subject], k=min(2, len(SUBJECTS[subject])))
+    kind = rng.choice(["plan", "quiz", "plan_quiz"])
+    num_questions = rng.randint(3, 6)
+    answers = []
+    for _ in range(num_questions):
+        answers.extend(["hint"] if rng.random() < 0.15 else [])
+        answers.append("skip" if rng.random() < 0.1 else rng.choice(ANSWERS))
+
+    prefilled = {"topics": ", ".join(topics), "quiz_topics": ", ".join(topics),
+                 "num_questions": str(num_questions), "exam_mode": "no",
+                 "start_quiz": "yes" if kind == "plan_quiz" else "no"}
+    if kind == "quiz":
+        return [f"Quiz me on {topics[0]} in {subject}"] + answers, prefilled
+    days = rng.choice([3, 5, 7, 10, 21])
+    first = f"I have a {subject} exam in {days} days covering {' and '.join(topics)}"
+    return [first] + (answers if kind == "plan_quiz" else []), prefilled
+
+
+class InProcessTransport:
+    """Runs learners directly against shared agents in this process"""
+
+    name = "in-process"
+
+    def __init__(self, latency: float, tokens_per_second: Optional[float]):
+        from agents.manager_agent import ManagerAgent
+        from agents.planner_agent import PlannerAgent
+        from agents.quiz_agent import QuizAgent
+        from analytics import QuizHistory
+        from llm_backend import StubBackend, shared_backend
+
+        self.backend = StubBackend(latency=latency, tokens_per_second=tokens_per_second)
+        backend = shared_backend(self.backend, "stub")  # as server.py --stub does
+        self.agents = (ManagerAgent(backend), PlannerAgent(backend), QuizAgent(backend))
+        self.history = QuizHistory()  # in memory, like the rest of the benchmark
+        self.sessions: List = []  # kept alive until the level ends, like idle server sessions
+
+    def open(self, prefilled: Dict[str, str]):
+        from eduquest import EduQuest
+        from session_state import SessionState
+
+        app = EduQuest(*self.agents, state=SessionState(),
+                       ask=lambda field, prompt: prefilled.get(field, ""),
+                       output=lambda text="": None, history=self.history)
+        self.sessions.append(app)
+        return app
+
+    def turn(self, app, user_input: str, prefilled: Dict[str, str]):
+        app.handle_input(user_input)
+
+    def close(self, app):
+        pass
+
+    def session_count(self) -> int:
+        return len(self.sessions)
+
+    def release(self):
+        self.sessions = []
+
+
+class HttpTransport:
+    """Runs learners against a server.py instance"""
+
+    name = "http"
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.opened = 0
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return json.loads(response.read() or b"{}")
+
+    def open(self, prefilled: Dict[str, str]) -> str:
+        self.opened += 1
+        return self._request("POST", "/sessions", {})["session_id"]
+
+    def turn(self, session_id: str, user_input: str, prefilled: Dict[str, str]):
+        self._request("POST", f"/sessions/{session_id}/turn",
+                      {"input": user_input, "prefilled": prefilled})
+
+    def close(self, session_id: str):
+        pass  # left open: the server's session count is part of the measurement
+
+    def stats(self) -> Dict:
+        return self._request("GET", "/stats")
+
+    def session_count(self) -> int:
+        return self.opened
+
+    def release(self):
+        self.opened = 0
+
+
+async def _lag_ticker(interval: float, lags: List[float], stop: asyncio.Event):
+    """Measure how late the event loop wakes a periodic timer"""
+    loop = asyncio.get_event_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def _learner(transport, executor, rng: random.Random, think_time: float,
+                   deadline: float, latencies: List[float], errors: List[str]):
+    loop = asyncio.get_event_loop()
+    while loop.time() < deadline:
+        turns, prefilled = make_flow(rng)
+        try:
+            handle = await loop.run_in_executor(executor, transport.open, prefilled)
+            for user_input in turns:
+                if think_time:
+                    await asyncio.sleep(rng.expovariate(1.0 / think_time))
+                if loop.time() >= deadline:
+                    break
+                start = time.perf_counter()
+                await loop.run_in_executor(executor, transport.turn, handle, user_input, prefilled)
+                latencies.append((time.perf_counter() - start) * 1000)
+            transport.close(handle)
+        except Exception as e:
+            errors.append(str(e))
+
+
+async def run_level(transport, learners: int, duration: float, think_time: float,
+                    seed: int) -> Dict:
+    """Run one concurrency level and summarize it"""
+    loop = asyncio.get_event_loop()
+    latencies: List[float] = []
+    errors: List[str] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+    deadline = loop.time() + duration
+
+    # A dedicated pool so concurrency is not capped by the default executor size
+    with ThreadPoolExecutor(max_workers=learners) as executor:
+        ticker = asyncio.ensure_future(_lag_ticker(0.01, lags, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _learner(transport, executor, random.Random(seed * 100003 + i), think_time,
+                     deadline, latencies, errors)
+            for i in range(learners)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+
+    return {
+        "learners": learners,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "throughput_tps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 2),
+        "loop_lag_max_ms": round(max(lags), 2) if lags else 0.0,
+        "sessions": transport.session_count(),
+    }
+
+
+def _bytes_per_session(transport: InProcessTransport) -> Optional[float]:
+    """Traced memory released by dropping this level's sessions, per session"""
+    count = transport.session_count()
+    if not count or not tracemalloc.is_tracing():
+        return None
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    transport.release()
+    gc.collect()
+    return round((held - tracemalloc.get_traced_memory()[0]) / count, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent EduQuest learners")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="Concurrent learners per ramp step")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="Mean seconds a learner pauses between turns")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Stub model latency per call (in-process mode)")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--url", help="Drive a running server.py instead of in-process agents")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Measure bytes per session with tracemalloc (in-process, slower)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the latency/throughput curve as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        transport = InProcessTransport(args.latency, args.tokens_per_second)
+        if args.trace_memory:
+            tracemalloc.start()
+
+    curve = []
+    for level in args.levels:
+        rss_before = transport.stats()["peak_rss_bytes"] if args.url else peak_rss_bytes()
+        result = asyncio.get_event_loop().run_until_complete(
+            run_level(transport, level, args.duration, args.think_time, args.seed + level))
+        if args.url:
+            stats = transport.stats()
+            rss_after = stats["peak_rss_bytes"]
+            result["server_sessions"] = stats["sessions"]
+        else:
+            rss_after = peak_rss_bytes()
+            result["bytes_per_session"] = _bytes_per_session(transport)
+        if rss_before is not None and rss_after is not None and result["sessions"]:
+            result["rss_growth_per_session"] = round((rss_after - rss_before) / result["sessions"], 1)
+        transport.release()
+        curve.append(result)
+        print(f"{level:>5} learners  {result['throughput_tps']:>8.2f} turns/s  "
+              f"p50 {result['p50_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  "
+              f"loop lag p99 {result['loop_lag_p99_ms']:>6.1f} ms  errors {result['errors']}",
+              file=sys.stderr)
+
+    report = {"mode": transport.name, "duration": args.duration, "think_time": args.think_time,
+              "latency": None if args.url else args.latency, "curve": curve}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Call Scheduler for EduQuest
+Priority classes and bounded concurrency for every outbound model call
+
+All agents' model calls share one quota of SCHEDULER_MAX_CONCURRENT calls in
+flight. Each call runs in a priority class taken from the calling context:
+
+    interactive   a learner is waiting for this turn (the default)
+    speculative   work started before the routing that decides whether it is needed
+    prefetch      work for a turn the learner has not taken yet
+    background    refills and other upkeep with no learner waiting
+
+A class never has more than its SCHEDULER_CLASS_LIMITS calls in flight, and
+the lower classes only start a call while SCHEDULER_INTERACTIVE_RESERVE
+slots would stay free: they use spare capacity only, and a burst of
+learners finds slots waiting rather than queueing behind model calls that
+cannot be interrupted. When no slot is free, callers queue and are
+admitted highest class first; within a class, tenants are served by
+weighted fair queuing on the tokens they have used (see tenant_budget.py),
+FIFO per tenant. An interactive call that has to queue preempts every
+queued call of the optional classes: those raise CallPreempted at once
+instead of waiting behind rising interactive load, and their callers fall
+back (a speculation simply misses).
+
+Code that runs lower-priority work wraps it in `with call_priority(...)`.
+Thread pools do not inherit the context (priority and tenant), so work
+submitted to one is wrapped with carry_context().
+
+Metrics, per class:
+    scheduler.calls.<class>      calls admitted
+    scheduler.preempted.<class>  queued calls preempted
+    scheduler.running.<class>    gauge: calls in flight
+    scheduler.queued.<class>     gauge: calls waiting
+    scheduler.wait_ms.<class>    observation: time spent queued
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from config import SCHEDULER_MAX_CONCURRENT, SCHEDULER_CLASS_LIMITS, SCHEDULER_INTERACTIVE_RESERVE
+from metrics import metrics
+from tenant_budget import TenantLedger, WITHIN_SHARE, current_tenant, get_tenant_ledger
+
+
+@dataclass(frozen=True)
+class PriorityClass:
+    """A class of model calls; lower rank is served first"""
+    name: str
+    rank: int
+    preemptible: bool
+
+
+INTERACTIVE = PriorityClass("interactive", 0, False)
+SPECULATIVE = PriorityClass("speculative", 1, True)
+PREFETCH = PriorityClass("prefetch", 2, True)
+BACKGROUND = PriorityClass("background", 3, True)
+PRIORITY_CLASSES = (INTERACTIVE, SPECULATIVE, PREFETCH, BACKGROUND)
+
+
+class CallPreempted(RuntimeError):
+    """A queued call was dropped to make room for interactive calls"""
+
+
+class TenantOverShare(CallPreempted):
+    """An optional call was shed because its tenant is over its share or budget"""
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("call_priority", default=INTERACTIVE)
+
+
+def current_priority() -> PriorityClass:
+    """Priority class of model calls made from the current context"""
+    return _current.get()
+
+
+@contextmanager
+def call_priority(priority: PriorityClass) -> Iterator[None]:
+    """Run the model calls made inside the block in priority"""
+    token = _current.set(priority)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def with_priority(priority: PriorityClass, call: Callable[..., Any], *args, **kwargs) -> Any:
+    """call(*args, **kwargs) in priority"""
+    with call_priority(priority):
+        return call(*args, **kwargs)
+
+
+def carry_context(call: Callable[..., Any]) -> Callable[..., Any]:
+    """call, run in a copy of the current context wherever it is invoked (e.g. a pool thread)"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(call, *args, **kwargs)
+
+
+class _Ticket:
+    """A queued call"""
+
+    __slots__ = ("priority", "tenant", "cap", "admitted", "preempted", "queued_at")
+
+    def __init__(self, priority: PriorityClass, tenant: str, cap: Optional[int]):
+        self.priority = priority
+        self.tenant = tenant
+        self.cap = cap              # the tenant's in-flight limit while it is over its share
+        self.admitted = threading.Event()
+        self.preempted = False
+        self.queued_at = time.perf_counter()
+
+
+class CallScheduler:
+    """
+    Admission control for model calls
+
+    Args:
+        max_concurrent: Calls in flight across all classes
+        class_limits: Calls in flight per class name (missing: max_concurrent)
+        interactive_reserve: Slots only interactive calls may take
+        ledger: Tenant accounts for fair queuing and budgets (the process-wide one if omitted)
+    """
+
+    def __init__(self, max_concurrent: int = SCHEDULER_MAX_CONCURRENT,
+                 class_limits: Optional[Dict[str, int]] = None,
+                 interactive_reserve: int = SCHEDULER_INTERACTIVE_RESERVE,
+                 ledger: Optional[TenantLedger] = None):
+        limits = SCHEDULER_CLASS_LIMITS if class_limits is None else class_limits
+        self.max_concurrent = max_concurrent
+        self.interactive_reserve = min(interactive_reserve, max_concurrent - 1)
+        self.limits = {p.name: min(limits.get(p.name, max_concurrent), max_concurrent)
+                       for p in PRIORITY_CLASSES}
+        self.ledger = ledger if ledger is not None else get_tenant_ledger()
+        self._lock = threading.Lock()
+        self._running = {p.name: 0 for p in PRIORITY_CLASSES}
+        self._total = 0
+        # Per class, a FIFO per tenant with queued calls (empty ones are removed)
+        self._queues: Dict[str, Dict[str, Deque[_Ticket]]] = {p.name: {} for p in PRIORITY_CLASSES}
+        self._queued = {p.name: 0 for p in PRIORITY_CLASSES}
+
+    def _can_run(self, priority: PriorityClass) -> bool:
+        capacity = self.max_concurrent
+        if priority is not INTERACTIVE:
+            capacity -= self.interactive_reserve
+        return self._total < capacity and self._running[priority.name] < self.limits[priority.name]
+
+    def _start(self, priority: PriorityClass):
+        # Caller holds the lock
+        self._total += 1
+        self._running[priority.name] += 1
+        metrics.set_gauge(f"scheduler.running.{priority.name}", self._running[priority.name])
+        metrics.increment(f"scheduler.calls.{priority.name}")
+
+    def _next_ticket(self, priority: PriorityClass) -> Optional[_Ticket]:
+        # Caller holds the lock. Weighted fair queuing: the tenant that has used
+        # the fewest tokens per unit of weight goes first. A tenant at its cap is
+        # passed over, and only gets spare capacity nobody else is waiting for.
+        queues = self._queues[priority.name]
+        if not queues:
+            return None
+        order = sorted(queues, key=self.ledger.virtual_time)
+        chosen = next((t for t in order if queues[t][0].cap is None
+                       or self.ledger.in_flight(t) < queues[t][0].cap), None)
+        if chosen is None:
+            if self._total >= self.max_concurrent - self.interactive_reserve:
+                return None
+            chosen = order[0]
+        queue = queues[chosen]
+        ticket = queue.popleft()
+        if not queue:
+            del queues[chosen]
+        self._queued[priority.name] -= 1
+        return ticket
+
+    def _dispatch(self):
+        # Caller holds the lock; admit queued calls in class order while capacity lasts
+        for priority in PRIORITY_CLASSES:
+            while self._can_run(priority):
+                ticket = self._next_ticket(priority)
+                if ticket is None:
+                    break
+                self._start(priority)
+                self.ledger.dequeued(ticket.tenant, admitted=True)
+                ticket.admitted.set()
+            metrics.set_gauge(f"scheduler.queued.{priority.name}", self._queued[priority.name])
+            if self._total >= self.max_concurrent:
+                break
+
+    def _preempt_queued(self):
+        # Caller holds the lock
+        for priority in PRIORITY_CLASSES:
+            queues = self._queues[priority.name]
+            if not priority.preemptible or not queues:
+                continue
+            metrics.increment(f"scheduler.preempted.{priority.name}", self._queued[priority.name])
+            for queue in queues.values():
+                for ticket in queue:
+                    ticket.preempted = True
+                    self.ledger.dequeued(ticket.tenant, admitted=False)
+                    ticket.admitted.set()
+            queues.clear()
+            self._queued[priority.name] = 0
+            metrics.set_gauge(f"scheduler.queued.{priority.name}", 0)
+
+    def acquire(self, priority: Optional[PriorityClass] = None,
+                tenant: Optional[str] = None) -> Tuple[PriorityClass, str]:
+        """
+        Wait for a slot for one call
+
+        A tenant over its share or budget has its speculative and prefetch
+        calls shed, its background calls deferred to spare capacity, and its
+        interactive calls limited to its fair number of slots.
+
+        Returns:
+            (class, tenant) the slot was taken for, to pass to release()
+
+        Raises:
+            CallPreempted: A preemptible call was dropped while queued, or
+                shed (TenantOverShare) because its tenant is over its share
+        """
+        priority = priority or current_priority()
+        tenant = tenant or current_tenant()
+        cap = None
+        status = self.ledger.status(tenant)
+        if status != WITHIN_SHARE:
+            if priority is SPECULATIVE or priority is PREFETCH:
+                self.ledger.count(tenant, "shed")
+                raise TenantOverShare(f"{priority.name} model call shed: tenant {tenant} is {status}")
+            cap = self.ledger.fair_slots(tenant, self.max_concurrent) if priority is INTERACTIVE else 0
+
+        with self._lock:
+            # Anything queued in this class means the class is at its limit or
+            # waiting on fair queuing, so only an empty class may skip the queue
+            if (self._can_run(priority) and not self._queues[priority.name]
+                    and (cap is None or self.ledger.in_flight(tenant) < cap)):
+                self._start(priority)
+                self.ledger.started(tenant)
+                return priority, tenant
+            ticket = _Ticket(priority, tenant, cap)
+            self._queues[priority.name].setdefault(tenant, deque()).append(ticket)
+            self._queued[priority.name] += 1
+            self.ledger.started(tenant, queued=True)
+            if cap is not None:
+                self.ledger.count(tenant, "deferred")
+            if not priority.preemptible:
+                self._preempt_queued()
+            self._dispatch()
+
+        ticket.admitted.wait()
+        if ticket.preempted:
+            raise CallPreempted(f"{priority.name} model call preempted by interactive load")
+        metrics.observe(f"scheduler.wait_ms.{priority.name}",
+                        (time.perf_counter() - ticket.queued_at) * 1000)
+        return priority, tenant
+
+    def release(self, grant: Tuple[PriorityClass, str]):
+        """Free the slot taken by acquire()"""
+        priority, tenant = grant
+        with self._lock:
+            self._total -= 1
+            self._running[priority.name] -= 1
+            self.ledger.finished(tenant)
+            metrics.set_gauge(f"scheduler.running.{priority.name}", self._running[priority.name])
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: Optional[PriorityClass] = None,
+             tenant: Optional[str] = None) -> Iterator[Tuple[PriorityClass, str]]:
+        """Hold a slot for the duration of the block"""
+        grant = self.acquire(priority, tenant)
+        try:
+            yield grant
+        finally:
+            self.release(grant)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Calls running and queued per class"""
+        with self._lock:
+            return {p.name: {"running": self._running[p.name], "queued": self._queued[p.name]}
+                    for p in PRIORITY_CLASSES}
+
+
+_scheduler: Optional[CallScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_call_scheduler() -> CallScheduler:
+    """The scheduler shared by every agent in this process"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CallScheduler()
+        return _scheduler
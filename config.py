@@ -2,20 +2,49 @@
 Configuration module for EduQuest
 Handles API keys and model settings
 """
+import json
 import os
-from dotenv import load_dotenv
+
+
+def _load_env_file():
+    """Load the nearest .env above this file, importing python-dotenv only if there is one"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
 
 # Load environment variables
-load_dotenv()
+_load_env_file()
 
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError(
-        "GEMINI_API_KEY not found. Please create a .env file with your API key. "
-        "You can get one from https://makersuite.google.com/app/apikey"
-    )
+
+def require_api_key() -> str:
+    """Return the Gemini API key, raising if it is not configured"""
+    if not GEMINI_API_KEY:
+        raise ValueError(
+            "GEMINI_API_KEY not found. Please create a .env file with your API key. "
+            "You can get one from https://makersuite.google.com/app/apikey"
+        )
+    return GEMINI_API_KEY
+
+
+# Model backend: "gemini" for the real API, "stub" for offline runs,
+# "record"/"replay" to capture Gemini traffic to a cassette and serve it back
+MODEL_BACKEND = os.getenv("EDUQUEST_BACKEND", "gemini")
+CASSETTE_PATH = os.getenv("EDUQUEST_CASSETTE", "cassettes/eduquest.jsonl.gz")
+REPLAY_LATENCY = os.getenv("EDUQUEST_REPLAY_LATENCY", "recorded")  # recorded, synthetic, none
+STUB_LATENCY_SECONDS = 0.0
+STUB_TOKENS_PER_SECOND = None
 
 # Model configurations
 MANAGER_MODEL = "models/gemini-2.0-flash"
@@ -30,3 +59,125 @@ QUIZ_TEMPERATURE = 0.7
 # Session settings
 MAX_QUIZ_QUESTIONS = 10
 DEFAULT_STUDY_HOURS_PER_DAY = 3
+
+# Local schedule allocation granularity (hours)
+SCHEDULE_SLOT_HOURS = 0.5
+REVIEW_HOURS_PER_SLOT = 0.5
+
+# Offline curriculum index (compiled to a memory-mapped .idx next to the source)
+CURRICULUM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "curriculum.json")
+# Name of a shared memory block holding the compiled index; server_cluster.py
+# publishes one so its workers do not each load or compile it
+CURRICULUM_SHM = os.getenv("EDUQUEST_CURRICULUM_SHM")
+
+# Date-relative plan templates shared by learners with identical requests
+PLAN_TEMPLATE_TTL_SECONDS = 7 * 24 * 3600
+PLAN_TEMPLATE_MAX_ENTRIES = 512
+
+# Long-horizon planning
+# Hours are always allocated locally (study_scheduler.py); for plans longer
+# than PLAN_CHUNKING_THRESHOLD_DAYS the model describes that schedule in
+# PLAN_CHUNK_DAYS-sized chunks, PLAN_MAX_WORKERS at a time
+PLAN_CHUNKING_THRESHOLD_DAYS = 14
+PLAN_CHUNK_DAYS = 7
+PLAN_MAX_WORKERS = 4
+
+# Grading memo (reuse verdicts for repeated answers to the same question)
+GRADING_MEMO_MIN_SIMILARITY = 0.85
+GRADING_MEMO_MIN_TOKENS = 4
+GRADING_MEMO_MAX_QUESTIONS = 10000
+GRADING_MEMO_MAX_ANSWERS = 256
+
+# Bulk grading
+GRADING_BATCH_SIZE = 5
+GRADING_MAX_WORKERS = 4
+
+# Headless batch runner
+BATCH_CONCURRENCY = 4
+
+# HTTP server
+SERVER_HOST = os.getenv("EDUQUEST_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("EDUQUEST_PORT", "8080"))
+SESSION_IDLE_TIMEOUT_SECONDS = 30 * 60
+
+# Compact session storage: long text lives in per-session arenas whose
+# segments are zlib-compressed once they reach SESSION_ARENA_SEGMENT_BYTES
+SESSION_ARENA_SEGMENT_BYTES = 4096
+SESSION_INLINE_TEXT_CHARS = 32  # shorter strings are interned instead
+SESSION_COMPACT_AFTER_SECONDS = 60
+
+# Persistent session log (disabled unless EDUQUEST_SESSION_DIR is set)
+SESSION_STORE_DIR = os.getenv("EDUQUEST_SESSION_DIR")
+SESSION_SNAPSHOT_EVERY = 64         # events per session between snapshots
+SESSION_FLUSH_INTERVAL_SECONDS = 0.05  # fsync batching window (max data loss on crash)
+
+# Multi-process server (server_cluster.py): worker processes, virtual nodes per
+# worker on the consistent-hash ring, and seconds between worker health checks.
+# Each worker may have SCHEDULER_MAX_CONCURRENT // <starting worker count>
+# model calls in flight (at least one); workers added later get as many, so
+# the cluster total can exceed SCHEDULER_MAX_CONCURRENT
+CLUSTER_WORKERS = int(os.getenv("EDUQUEST_WORKERS", str(os.cpu_count() or 1)))
+CLUSTER_RING_REPLICAS = 128
+CLUSTER_HEALTH_INTERVAL_SECONDS = 1.0
+# Shared secret the dispatcher gives its workers; server.py only serves the
+# cluster endpoints (choosing session ids, handoff, adopt) to requests carrying it
+CLUSTER_TOKEN = os.getenv("EDUQUEST_CLUSTER_TOKEN")
+
+# Quiz-history analytics (columnar, memory-mapped)
+ANALYTICS_DIR = os.getenv("EDUQUEST_ANALYTICS_DIR",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "analytics"))
+ANALYTICS_SHARDS = 64           # stores keyed by a hash of the learner; fixed once a directory has them
+ANALYTICS_HALF_LIFE_DAYS = 14   # older answers count half as much every this many days
+WEAK_AREA_THRESHOLD = 0.7       # mastery below this marks a weak area
+
+# Spaced repetition (SM-2 per learner, rebuilt from the quiz history)
+SR_INITIAL_EASE = 2.5
+SR_MIN_EASE = 1.3
+SR_RELEARN_SECONDS = 120       # a missed item comes back this soon, even within a quiz
+SR_FAST_ANSWER_SECONDS = 20    # correct answers at least this fast count as perfect recall
+SR_MAX_LEARNERS = 1024         # memories kept in process; others are rebuilt on demand
+
+# Adaptive difficulty (Rasch model; re-fit offline with `python irt.py`)
+IRT_LEVEL_PRIORS = {"easy": -1.0, "medium": 0.0, "hard": 1.0}  # logits, before calibration
+IRT_LEARNING_RATE = 0.4    # online step for a learner's first answer
+IRT_RATE_DECAY = 0.05      # step shrinks as 1 / (1 + decay * answers so far)
+IRT_PRIOR_SD = 1.0         # Gaussian prior on abilities and question offsets
+IRT_ITERATIONS = 25        # Newton steps per calibration
+
+# Speculative routing: start the specialist call alongside ManagerAgent when
+# the local router is confident, and keep it only if the manager agrees
+SPECULATION_ENABLED = os.getenv("EDUQUEST_SPECULATION", "1") != "0"
+SPECULATION_MIN_CONFIDENCE = 0.85
+SPECULATION_MAX_WORKERS = 8
+
+# Request coalescing: concurrent identical model calls share one upstream call.
+# Calls at or below the temperature are shared by any number of callers,
+# sampled calls by at most SINGLEFLIGHT_CREATIVE_MAX_WAITERS more (0: never)
+SINGLEFLIGHT_ENABLED = os.getenv("EDUQUEST_SINGLEFLIGHT", "1") != "0"
+SINGLEFLIGHT_DETERMINISTIC_MAX_TEMPERATURE = 0.3
+SINGLEFLIGHT_CREATIVE_MAX_WAITERS = 8
+
+# Outbound call scheduling: model calls in flight across all agents, and the
+# most each priority class may hold (see call_scheduler.py)
+SCHEDULER_MAX_CONCURRENT = int(os.getenv("EDUQUEST_MAX_CONCURRENT_CALLS", "32"))
+SCHEDULER_CLASS_LIMITS = {"interactive": SCHEDULER_MAX_CONCURRENT, "speculative": 8,
+                          "prefetch": 4, "background": 2}
+SCHEDULER_INTERACTIVE_RESERVE = 8  # slots the other classes leave free
+
+# Tenants (schools, classes) sharing the quota: relative weights, optional
+# token budgets per window, the window of the recent-usage rate, and how far
+# past its fair share a tenant may go before its calls are throttled
+TENANT_WEIGHTS = json.loads(os.getenv("EDUQUEST_TENANT_WEIGHTS", "{}"))        # {"school-a": 2}
+TENANT_TOKEN_BUDGETS = json.loads(os.getenv("EDUQUEST_TENANT_BUDGETS", "{}"))  # {"school-a": 200000}
+TENANT_WINDOW_SECONDS = 60.0
+TENANT_OVERSHARE_FACTOR = 1.5
+
+# Fused routing: when the local router is confident, ask the manager to route
+# and answer the specialist prompt in one call (falls back to speculation)
+FUSED_ROUTING_ENABLED = os.getenv("EDUQUEST_FUSED_ROUTING", "1") != "0"
+
+# Intent analysis: the manager's reply is schema-constrained JSON read as it
+# streams; a reply that cannot be parsed (and has no usable intent) is asked
+# for again this many times before the turn falls back to a clarifying reply
+MANAGER_STREAM_ENABLED = os.getenv("EDUQUEST_MANAGER_STREAM", "1") != "0"
+MANAGER_PARSE_RETRIES = int(os.getenv("EDUQUEST_MANAGER_PARSE_RETRIES", "1"))
@@ -0,0 +1,263 @@
+"""
+Curriculum Index for EduQuest
+Offline, versioned subject -> topics -> subtopics index used by the planner
+
+The human-editable source is a JSON file. On first use it is compiled into a
+compact binary index next to the source and memory-mapped, so lookups read
+only the record they need and the index can be shared between processes.
+A process can also publish the index in shared memory (share()); processes
+started with EDUQUEST_CURRICULUM_SHM set to its name attach to that instead.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
+
+from config import CURRICULUM_PATH, CURRICULUM_SHM
+from study_scheduler import TopicSpec
+
+# Binary layout: header, sorted directory, key blob, record blob
+_MAGIC = b"EQCI"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHII")   # magic, format version, source version, entries
+_ENTRY = struct.Struct("<IHII")     # key offset, key length, record offset, record length
+
+
+def canonical_name(text: str) -> str:
+    """Normalize a subject or topic name for matching ("Data-Structures " -> "data structures")"""
+    return re.sub(r"[^\w+#]+", " ", text.lower()).strip()
+
+
+@dataclass(frozen=True)
+class CurriculumTopic:
+    """A topic with its subtopics, prerequisites and effort estimate (hours)"""
+    name: str
+    effort: float
+    prerequisites: Tuple[str, ...]
+    subtopics: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class CurriculumEntry:
+    """All indexed topics for one subject, in teaching order"""
+    subject: str
+    topics: Tuple[CurriculumTopic, ...]
+
+    def select_topics(self, requested: List[str]) -> List[TopicSpec]:
+        """
+        Build scheduler specs for the requested topics
+
+        Requested topics are matched to indexed topics by name or subtopic;
+        unmatched ones are kept with an average effort. With no requested
+        topics the whole subject is used.
+        """
+        if not requested:
+            chosen = list(self.topics)
+            extra: List[str] = []
+        else:
+            by_name = {canonical_name(t.name): t for t in self.topics}
+            by_subtopic = {canonical_name(s): t for t in self.topics for s in t.subtopics}
+            chosen, extra = [], []
+            for name in requested:
+                key = canonical_name(name)
+                topic = by_name.get(key) or by_subtopic.get(key)
+                if topic is None:
+                    extra.append(name)
+                elif topic not in chosen:
+                    chosen.append(topic)
+            # Keep the curriculum's teaching order for matched topics
+            chosen.sort(key=self.topics.index)
+
+        names = {t.name for t in chosen}
+        specs = [
+            TopicSpec(t.name, t.effort, tuple(p for p in t.prerequisites if p in names))
+            for t in chosen
+        ]
+        if extra:
+            average = sum(t.effort for t in self.topics) / len(self.topics)
+            specs.extend(TopicSpec(name, average) for name in extra)
+        return specs
+
+    def describe(self, specs: List[TopicSpec]) -> str:
+        """Render the selected topics with their subtopics for a prompt"""
+        subtopics = {t.name: t.subtopics for t in self.topics}
+        lines = []
+        for i, spec in enumerate(specs, start=1):
+            subs = subtopics.get(spec.name)
+            lines.append(f"{i}. {spec.name}" + (f": {', '.join(subs)}" if subs else ""))
+        return "\n".join(lines)
+
+
+def compile_curriculum(source: dict) -> bytes:
+    """Compile the JSON curriculum into the binary index format"""
+    records = []
+    for subject, data in source.get("subjects", {}).items():
+        record = json.dumps(
+            [subject, [[t["name"], t.get("effort", 1), t.get("prerequisites", []),
+                        t.get("subtopics", [])] for t in data.get("topics", [])]],
+            separators=(",", ":")
+        ).encode("utf-8")
+        for alias in [subject] + data.get("aliases", []):
+            records.append((canonical_name(alias).encode("utf-8"), record))
+    records.sort(key=lambda r: r[0])
+
+    # Aliases of one subject share a single record
+    record_offsets = {}
+    record_blob = bytearray()
+    key_blob = bytearray()
+    directory = bytearray()
+    for key, record in records:
+        if record not in record_offsets:
+            record_offsets[record] = len(record_blob)
+            record_blob += record
+        directory += _ENTRY.pack(len(key_blob), len(key), record_offsets[record], len(record))
+        key_blob += key
+
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, int(source.get("version", 0)), len(records))
+    key_base = _HEADER.size + len(directory)
+    record_base = key_base + len(key_blob)
+    # Directory offsets are stored relative to their blobs; rebase to absolute
+    rebased = bytearray()
+    for i in range(len(records)):
+        key_off, key_len, rec_off, rec_len = _ENTRY.unpack_from(directory, i * _ENTRY.size)
+        rebased += _ENTRY.pack(key_base + key_off, key_len, record_base + rec_off, rec_len)
+    return bytes(header + rebased + key_blob + record_blob)
+
+
+class CurriculumIndex:
+    """
+    Read-only view over a compiled curriculum index
+
+    Works on any buffer (mmap, bytes or shared memory); subject lookup is a
+    binary search over the directory and only the matching record is decoded.
+    """
+
+    def __init__(self, buffer: Union[bytes, memoryview, mmap.mmap]):
+        self._buffer = buffer
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Curriculum index is truncated")
+        magic, fmt, self.version, self._count = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or fmt != _FORMAT_VERSION:
+            raise ValueError("Not a compatible curriculum index")
+        self._lookup = lru_cache(maxsize=64)(self._decode)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def buffer(self):
+        """The underlying index bytes"""
+        return self._buffer
+
+    def _key(self, i: int) -> Tuple[bytes, int, int]:
+        key_off, key_len, rec_off, rec_len = _ENTRY.unpack_from(
+            self._buffer, _HEADER.size + i * _ENTRY.size)
+        return bytes(self._buffer[key_off:key_off + key_len]), rec_off, rec_len
+
+    def _decode(self, key: bytes) -> Optional[CurriculumEntry]:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, rec_off, rec_len = self._key(mid)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                subject, topics = json.loads(bytes(self._buffer[rec_off:rec_off + rec_len]))
+                return CurriculumEntry(subject, tuple(
+                    CurriculumTopic(name, float(effort), tuple(prereqs), tuple(subs))
+                    for name, effort, prereqs, subs in topics
+                ))
+        return None
+
+    def keys(self) -> List[str]:
+        """Every indexed subject name and alias, canonicalized"""
+        return [self._key(i)[0].decode("utf-8") for i in range(self._count)]
+
+    def lookup(self, subject: str) -> Optional[CurriculumEntry]:
+        """Find a subject by name or alias; None if it is not indexed"""
+        if not subject:
+            return None
+        return self._lookup(canonical_name(subject).encode("utf-8"))
+
+    @classmethod
+    def load(cls, source_path: str = CURRICULUM_PATH) -> "CurriculumIndex":
+        """
+        Load the index for a JSON source, compiling it first if the compiled
+        file is missing, unreadable or older than the source
+        """
+        index_path = os.path.splitext(source_path)[0] + ".idx"
+        try:
+            if os.path.getmtime(index_path) >= os.path.getmtime(source_path):
+                return cls._map(index_path)
+        except (OSError, ValueError):
+            pass
+
+        with open(source_path, "r", encoding="utf-8") as f:
+            compiled = compile_curriculum(json.load(f))
+        try:
+            tmp_path = f"{index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compiled)
+            os.replace(tmp_path, index_path)
+            return cls._map(index_path)
+        except OSError:
+            # Read-only install: keep the compiled index in memory
+            return cls(compiled)
+
+    @classmethod
+    def _map(cls, path: str) -> "CurriculumIndex":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def share(self):
+        """
+        Copy the index into a new shared memory block for other processes to attach()
+
+        Returns:
+            The multiprocessing.shared_memory.SharedMemory block; its creator
+            closes and unlinks it once the other processes are done
+        """
+        from multiprocessing import shared_memory
+
+        block = shared_memory.SharedMemory(create=True, size=len(self._buffer))
+        block.buf[:len(self._buffer)] = self._buffer
+        return block
+
+    @classmethod
+    def attach(cls, name: str) -> "CurriculumIndex":
+        """Index published with share() by another process"""
+        from multiprocessing import resource_tracker, shared_memory
+
+        block = shared_memory.SharedMemory(name=name)
+        # Only the publisher may unlink the block; an attaching process's
+        # resource tracker would otherwise remove it when that process exits
+        resource_tracker.unregister(block._name, "shared_memory")
+        index = cls(block.buf)
+        index._block = block  # keeps the mapping alive as long as the index
+        return index
+
+
+_index: Optional[CurriculumIndex] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_curriculum_index() -> Optional[CurriculumIndex]:
+    """Load the curriculum index once per process; None if no source is available"""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                try:
+                    _index = CurriculumIndex.attach(CURRICULUM_SHM) if CURRICULUM_SHM else CurriculumIndex.load()
+                except (OSError, ValueError) as e:
+                    print(f"Curriculum index unavailable: {e}")
+                _index_loaded = True
+    return _index
@@ -1,16 +1,34 @@
 """
 EduQuest - Main Application
 Multi-Agent Study Assistant
+
+The agents, the model SDK and the numpy-backed learner models are loaded on
+first use, so the CLI shows its welcome banner (and answers "help") while
+they load in the background.
 """
 import sys
-from typing import Optional
+import threading
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
 from colorama import init, Fore, Style
 
-from agents.manager_agent import ManagerAgent
-from agents.planner_agent import PlannerAgent
-from agents.quiz_agent import QuizAgent
-from session_state import session, StudyPlan
-from config import MAX_QUIZ_QUESTIONS
+from local_router import FusedPayload, Speculation, predict_route
+from messages import HELP_MESSAGE, WELCOME_MESSAGE
+from metrics import metrics
+from session_state import session, SessionState, StudyPlan
+from config import (
+    MAX_QUIZ_QUESTIONS, SPECULATION_ENABLED, SPECULATION_MIN_CONFIDENCE, FUSED_ROUTING_ENABLED,
+    PLANNER_TEMPERATURE, QUIZ_TEMPERATURE
+)
+
+if TYPE_CHECKING:
+    from agents.manager_agent import ManagerAgent
+    from agents.planner_agent import PlannerAgent
+    from agents.quiz_agent import QuizAgent
+    from analytics import QuizHistory
+    from irt import AbilityModel
+    from spaced_repetition import ReviewScheduler
 
 # Initialize colorama for cross-platform colored output
 init(autoreset=True)
@@ -22,86 +40,305 @@ class EduQuest:
     Orchestrates the multi-agent system
     """
     
-    def __init__(self):
-        print(f"{Fore.CYAN}Initializing EduQuest...{Style.RESET_ALL}")
-        
+    def __init__(self, manager: Optional["ManagerAgent"] = None,
+                 planner: Optional["PlannerAgent"] = None,
+                 quizzer: Optional["QuizAgent"] = None,
+                 state: Optional[SessionState] = None,
+                 ask: Optional[Callable[[str, str], str]] = None,
+                 output: Callable[[str], None] = print,
+                 history: Optional["QuizHistory"] = None,
+                 reviews: Optional["ReviewScheduler"] = None,
+                 abilities: Optional["AbilityModel"] = None):
+        """
+        Args:
+            manager, planner, quizzer: Shared agent instances (created on first use if omitted)
+            state: Session to drive (defaults to the global session)
+            ask: Answers follow-up prompts as ask(field, prompt); defaults to input()
+            output: Receives every line of output; defaults to print
+            history: Where quiz results are recorded (defaults to the persisted history)
+            reviews: Spaced-repetition memory choosing quiz topics and plan reviews
+                (defaults to the one shared by everything recording into history)
+            abilities: IRT model choosing question difficulty (shared like reviews)
+        """
+        self.session = state or session
+        self._ask = ask or (lambda field, prompt: input(prompt))
+        self._print = output
+        self.last_intent: Optional[str] = None
+        self._manager = manager
+        self._planner = planner
+        self._quizzer = quizzer
+        self._history = history
+        self._reviews = reviews
+        self._abilities = abilities
+        self._load_lock = threading.RLock()
+        self._load_failed = False
+        # Seconds the learner took per question index, measured from display to answer
+        self._asked_at = 0.0
+        self._answer_seconds: Dict[int, float] = {}
+        # Specialist call started alongside routing for the current turn, if any
+        self._speculation: Optional[Speculation] = None
+    
+    def _load(self, name: str, create: Callable[[], Any]) -> Any:
+        """The component stored in self._<name>, created on first use"""
+        value = getattr(self, f"_{name}")
+        if value is None:
+            with self._load_lock:
+                value = getattr(self, f"_{name}")
+                if value is None:
+                    value = create()
+                    setattr(self, f"_{name}", value)
+        return value
+    
+    def _agent(self, name: str, class_name: str) -> Any:
+        def create():
+            import agents
+            try:
+                return getattr(agents, class_name)()
+            except Exception as e:
+                # Reported once, whichever thread gets here first
+                if not self._load_failed:
+                    self._load_failed = True
+                    self._print(f"{Fore.RED}Error initializing agents: {e}{Style.RESET_ALL}")
+                    self._print(f"{Fore.YELLOW}Please check your .env file and API key{Style.RESET_ALL}")
+                sys.exit(1)
+        return self._load(name, create)
+    
+    @property
+    def manager(self) -> "ManagerAgent":
+        return self._agent("manager", "ManagerAgent")
+    
+    @property
+    def planner(self) -> "PlannerAgent":
+        return self._agent("planner", "PlannerAgent")
+    
+    @property
+    def quizzer(self) -> "QuizAgent":
+        return self._agent("quizzer", "QuizAgent")
+    
+    @property
+    def history(self) -> "QuizHistory":
+        from analytics import get_quiz_history
+        return self._load("history", get_quiz_history)
+    
+    @property
+    def reviews(self) -> "ReviewScheduler":
+        from spaced_repetition import get_review_scheduler
+        return self._load("reviews", lambda: get_review_scheduler(self.history))
+    
+    @property
+    def abilities(self) -> "AbilityModel":
+        from irt import get_ability_model
+        return self._load("abilities", lambda: get_ability_model(self.history))
+    
+    def warm_up(self):
+        """Load the agents and learner models now rather than on the first turn that needs them"""
         try:
-            self.manager = ManagerAgent()
-            self.planner = PlannerAgent()
-            self.quizzer = QuizAgent()
-            print(f"{Fore.GREEN}All agents initialized successfully{Style.RESET_ALL}\n")
-        except Exception as e:
-            print(f"{Fore.RED}Error initializing agents: {e}{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}Please check your .env file and API key{Style.RESET_ALL}")
-            sys.exit(1)
-    
-    def run(self):
-        """Main application loop"""
-        # Display welcome message
-        print(f"{Fore.WHITE}{self.manager.get_welcome_message()}{Style.RESET_ALL}")
+            for name in ("manager", "planner", "quizzer", "reviews", "abilities"):
+                getattr(self, name)
+        except SystemExit:
+            # Already reported; the main thread exits when it needs the agent
+            pass
+    
+    def run(self, welcome: bool = True):
+        """
+        Main application loop
+        
+        Args:
+            welcome: Show the welcome banner first (main() shows it before loading)
+        """
+        if welcome:
+            self._print(f"{Fore.WHITE}{WELCOME_MESSAGE}{Style.RESET_ALL}")
         
         while True:
             try:
                 # Get user input
                 user_input = input(f"\n{Fore.GREEN}You: {Style.RESET_ALL}").strip()
                 
-                if not user_input:
-                    continue
-                
-                # Check for exit commands
-                if user_input.lower() in ['exit', 'quit', 'bye', 'goodbye']:
-                    self._handle_exit()
+                if not self.handle_input(user_input):
                     break
                 
-                # Check for help
-                if user_input.lower() in ['help', '?', 'help me']:
-                    print(f"{Fore.CYAN}{self.manager.get_help_message()}{Style.RESET_ALL}")
-                    continue
-                
-                # Check if in quiz mode
-                if session.quiz_session and session.quiz_session.is_active:
-                    self._handle_quiz_interaction(user_input)
-                else:
-                    # Route through manager
-                    self._handle_manager_routing(user_input)
-                
             except KeyboardInterrupt:
-                print(f"\n{Fore.YELLOW}Interrupted by user{Style.RESET_ALL}")
+                self._print(f"\n{Fore.YELLOW}Interrupted by user{Style.RESET_ALL}")
                 self._handle_exit()
                 break
             except Exception as e:
-                print(f"{Fore.RED}An error occurred: {e}{Style.RESET_ALL}")
-                print(f"{Fore.YELLOW}Let's try again.{Style.RESET_ALL}")
+                self._print(f"{Fore.RED}An error occurred: {e}{Style.RESET_ALL}")
+                self._print(f"{Fore.YELLOW}Let's try again.{Style.RESET_ALL}")
+    
+    def handle_input(self, user_input: str) -> bool:
+        """
+        Process one user turn
+        
+        Returns:
+            False when the user asked to exit, True otherwise
+        """
+        user_input = user_input.strip()
+        if not user_input:
+            return True
+        
+        # Check for exit commands
+        if user_input.lower() in ['exit', 'quit', 'bye', 'goodbye']:
+            self._handle_exit()
+            return False
+        
+        # Check for help
+        if user_input.lower() in ['help', '?', 'help me']:
+            self._print(f"{Fore.CYAN}{HELP_MESSAGE}{Style.RESET_ALL}")
+            return True
+        
+        # Check if in quiz mode
+        if self.session.quiz_session and self.session.quiz_session.is_active:
+            self._handle_quiz_interaction(user_input)
+        else:
+            # Route through manager
+            self._handle_manager_routing(user_input)
+        return True
     
     def _handle_manager_routing(self, user_input: str):
         """Handle routing through the manager agent"""
         # Build conversation context
         context = self._get_conversation_context()
         
-        # Analyze intent
-        print(f"{Fore.CYAN}Analyzing your request...{Style.RESET_ALL}")
-        result = self.manager.analyze_intent(user_input, context)
-        
-        intent = result.get("intent", "MANAGER")
-        extracted_info = result.get("extracted_info", {})
-        user_message = result.get("user_message", "")
-        
-        # Display manager's understanding
-        if user_message:
-            print(f"\n{Fore.BLUE}EduQuest: {user_message}{Style.RESET_ALL}\n")
+        # Analyze intent, with the likely specialist call already running
+        self._print(f"{Fore.CYAN}Analyzing your request...{Style.RESET_ALL}")
+        likely = self._likely_call(user_input)
+        try:
+            result = self._fused_route(user_input, context, likely) if FUSED_ROUTING_ENABLED else None
+            shown = None
+            if result is None:
+                if SPECULATION_ENABLED:
+                    self._speculation = self._speculate(likely)
+                shown = []
+                result = self.manager.analyze_intent(
+                    user_input, context, on_field=lambda name, value: self._on_routing_field(name, value, shown))
+            
+            intent = result.get("intent", "MANAGER")
+            self.last_intent = intent
+            extracted_info = result.get("extracted_info", {})
+            user_message = result.get("user_message", "")
+            if self._speculation and self._speculation.intent != intent:
+                self._speculation.discard()
+            
+            # Display manager's understanding (unless it was shown as it streamed in)
+            if user_message and not shown:
+                self._print(f"\n{Fore.BLUE}EduQuest: {user_message}{Style.RESET_ALL}\n")
+            
+            # Route to appropriate agent
+            if intent == "PLANNER":
+                self._handle_planning(extracted_info)
+            elif intent == "QUIZZER":
+                self._handle_quiz_start(extracted_info)
+            else:
+                # Stay in manager mode - general conversation
+                pass
+        finally:
+            if self._speculation:
+                self._speculation.discard()
+                self._speculation = None
         
-        # Route to appropriate agent
+        # Add to history
+        self.session.add_to_history("user", user_input)
+        self.session.add_to_history("assistant", user_message)
+    
+    def _on_routing_field(self, name: str, value, shown: list):
+        """
+        Act on a field of the manager's routing as soon as it streams in
+        
+        The intent settles the speculation before the rest of the reply is
+        generated, and the manager's message is shown while it extracts details.
+        """
+        if name == "intent":
+            if self._speculation and self._speculation.intent != value:
+                self._speculation.discard()
+        elif name == "user_message" and value:
+            self._print(f"\n{Fore.BLUE}EduQuest: {value}{Style.RESET_ALL}\n")
+            shown.append(value)
+    
+    def _likely_call(self, user_input: str) -> Optional[tuple]:
+        """
+        (intent, request) of the specialist call the manager will most likely ask for
+        
+        Only when the local router is confident and already has everything the
+        call needs, so no follow-up prompt could change it. Returns None when
+        the first question would be a review rather than a generation.
+        """
+        prediction = predict_route(user_input)
+        if prediction.confidence < SPECULATION_MIN_CONFIDENCE:
+            return None
+        info = prediction.info
+        learner = self.session.learner_id
+        
+        if prediction.intent == "PLANNER" and info["days_available"] and info["topics"]:
+            return "PLANNER", self._plan_request(info["subject"] or "General Studies", info["topics"],
+                                                 info["days_available"], info["exam_date"],
+                                                 info["additional_context"])
+        
+        if prediction.intent == "QUIZZER" and info["topics"]:
+            topic = self.reviews.next_topic(learner, info["topics"])
+            if self.reviews.due_question(learner, topic):
+                return None
+            return "QUIZZER", {"topic": topic, "difficulty": self.abilities.pick_difficulty(learner)}
+        return None
+    
+    def _speculate(self, likely: Optional[tuple]) -> Optional[Speculation]:
+        """Start the likely specialist call alongside the manager's routing"""
+        if likely is None:
+            return None
+        intent, request = likely
         if intent == "PLANNER":
-            self._handle_planning(extracted_info)
-        elif intent == "QUIZZER":
-            self._handle_quiz_start(extracted_info)
+            return Speculation(intent, request, self.planner.create_study_plan, **request)
+        return Speculation(intent, request, self.quizzer.generate_question,
+                           question_number=1, **request)
+    
+    def _fused_route(self, user_input: str, context: str, likely: Optional[tuple]) -> Optional[dict]:
+        """
+        Route and do the likely specialist task in a single manager call
+        
+        The task's output is kept as this turn's FusedPayload; it is used only
+        if the routing agrees with the request it was made for, and the
+        routing half of the reply is used either way.
+        
+        Returns:
+            The manager's routing, or None when there is no single call to fuse
+            (no confident prediction, a plan that is cached or chunked)
+        """
+        if likely is None:
+            return None
+        intent, request = likely
+        if intent == "PLANNER":
+            prompt = self.planner.plan_prompt(request["subject"], request["topics"],
+                                              request["days_available"], request["additional_context"],
+                                              request["due_reviews"])
         else:
-            # Stay in manager mode - general conversation
-            pass
-        
-        # Add to history
-        session.add_to_history("user", user_input)
-        session.add_to_history("assistant", user_message)
+            prompt = self.quizzer.question_prompt(request["topic"], request["difficulty"], 1)
+        if prompt is None:
+            return None
+        
+        # At the specialist's temperature: the plan goes into the shared template
+        # cache, and a question must not be shared as if it were deterministic
+        temperature = PLANNER_TEMPERATURE if intent == "PLANNER" else QUIZ_TEMPERATURE
+        result = self.manager.route_and_act(user_input, context, intent, prompt, temperature)
+        payload = result.pop("payload", None)
+        if payload:
+            if intent == "PLANNER":
+                self._speculation = FusedPayload(intent, request, self.planner.create_study_plan,
+                                                 template=payload, **request)
+            else:
+                self._speculation = FusedPayload(intent, request, self.quizzer.parse_question,
+                                                 text=payload, question_number=1, **request)
+        return result
+    
+    def _plan_request(self, subject: str, topics: list, days: int, exam_date: Optional[str],
+                      context: str) -> dict:
+        """Arguments for PlannerAgent.create_study_plan"""
+        return {
+            "subject": subject,
+            "topics": topics,
+            "days_available": days,
+            "exam_date": exam_date,
+            "additional_context": context,
+            "due_reviews": self.reviews.due_days(self.session.learner_id, days)
+        }
     
     def _handle_planning(self, info: dict):
         """Handle study plan creation"""
@@ -113,57 +350,55 @@ class EduQuest:
         
         # Validate inputs
         if not days:
-            print(f"{Fore.YELLOW}How many days do you have until your exam?{Style.RESET_ALL}")
-            days_input = input(f"{Fore.GREEN}Days: {Style.RESET_ALL}").strip()
+            self._print(f"{Fore.YELLOW}How many days do you have until your exam?{Style.RESET_ALL}")
+            days_input = self._ask("days", f"{Fore.GREEN}Days: {Style.RESET_ALL}").strip()
             try:
                 days = int(days_input)
             except ValueError:
-                print(f"{Fore.RED}Invalid number. Using default of 7 days.{Style.RESET_ALL}")
+                self._print(f"{Fore.RED}Invalid number. Using default of 7 days.{Style.RESET_ALL}")
                 days = 7
         
         if not topics:
-            print(f"{Fore.YELLOW}What specific topics should I include? (comma-separated){Style.RESET_ALL}")
-            topics_input = input(f"{Fore.GREEN}Topics: {Style.RESET_ALL}").strip()
+            self._print(f"{Fore.YELLOW}What specific topics should I include? (comma-separated){Style.RESET_ALL}")
+            topics_input = self._ask("topics", f"{Fore.GREEN}Topics: {Style.RESET_ALL}").strip()
             if topics_input:
                 topics = [t.strip() for t in topics_input.split(',')]
         
         # Create the study plan
-        print(f"\n{Fore.CYAN}Creating your personalized study plan...{Style.RESET_ALL}")
-        print(f"{Fore.CYAN}(Using Google Search to verify curriculum details...){Style.RESET_ALL}\n")
-        
-        plan_result = self.planner.create_study_plan(
-            subject=subject,
-            topics=topics,
-            days_available=days,
-            exam_date=exam_date,
-            additional_context=context
-        )
+        self._print(f"\n{Fore.CYAN}Creating your personalized study plan...{Style.RESET_ALL}")
+        self._print(f"{Fore.CYAN}(Using Google Search to verify curriculum details...){Style.RESET_ALL}\n")
+        
+        request = self._plan_request(subject, topics, days, exam_date, context)
+        plan_result = self._speculative_result("PLANNER", request)
+        if plan_result is None:
+            plan_result = self.planner.create_study_plan(**request)
         
         if plan_result.get("success"):
             # Display the plan
-            print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
-            print(f"{Fore.WHITE}{plan_result['plan']}{Style.RESET_ALL}")
-            print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
+            self._print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
+            self._print(f"{Fore.WHITE}{plan_result['plan']}{Style.RESET_ALL}")
+            self._print(f"{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
             
             # Store in session
             study_plan = StudyPlan(
                 subject=subject,
                 topics=topics,
                 days_available=days,
-                exam_date=exam_date
+                exam_date=exam_date,
+                daily_schedule=plan_result.get("schedule", [])
             )
-            session.set_study_plan(study_plan)
+            self.session.set_study_plan(study_plan)
             
             # Ask if they want to start quizzing
-            print(f"\n{Fore.CYAN}Would you like to quiz yourself on any of these topics? (yes/no){Style.RESET_ALL}")
-            quiz_response = input(f"{Fore.GREEN}Answer: {Style.RESET_ALL}").strip().lower()
+            self._print(f"\n{Fore.CYAN}Would you like to quiz yourself on any of these topics? (yes/no){Style.RESET_ALL}")
+            quiz_response = self._ask("start_quiz", f"{Fore.GREEN}Answer: {Style.RESET_ALL}").strip().lower()
             
             if quiz_response in ['yes', 'y', 'yeah', 'sure']:
                 # Start quiz with the topics from the study plan
                 self._handle_quiz_start({"topics": topics, "subject": subject})
             
         else:
-            print(f"{Fore.RED}Error creating plan: {plan_result.get('message')}{Style.RESET_ALL}")
+            self._print(f"{Fore.RED}Error creating plan: {plan_result.get('message')}{Style.RESET_ALL}")
     
     def _handle_quiz_start(self, info: dict):
         """Handle quiz session initialization"""
@@ -175,17 +410,22 @@ class EduQuest:
             topics = [subject]
         
         if not topics:
-            print(f"{Fore.YELLOW}What topics would you like to be quizzed on? (comma-separated){Style.RESET_ALL}")
-            topics_input = input(f"{Fore.GREEN}Topics: {Style.RESET_ALL}").strip()
+            due = self.reviews.due_topics(self.session.learner_id, limit=3)
+            self._print(f"{Fore.YELLOW}What topics would you like to be quizzed on? (comma-separated){Style.RESET_ALL}")
+            if due:
+                self._print(f"{Fore.CYAN}Press Enter to review what is due: {', '.join(due)}{Style.RESET_ALL}")
+            topics_input = self._ask("quiz_topics", f"{Fore.GREEN}Topics: {Style.RESET_ALL}").strip()
             if topics_input:
                 topics = [t.strip() for t in topics_input.split(',')]
+            elif due:
+                topics = due
             else:
-                print(f"{Fore.RED}No topics specified. Returning to main menu.{Style.RESET_ALL}")
+                self._print(f"{Fore.RED}No topics specified. Returning to main menu.{Style.RESET_ALL}")
                 return
         
         # Ask for number of questions
-        print(f"{Fore.CYAN}How many questions? (default: 5, max: {MAX_QUIZ_QUESTIONS}){Style.RESET_ALL}")
-        num_input = input(f"{Fore.GREEN}Number: {Style.RESET_ALL}").strip()
+        self._print(f"{Fore.CYAN}How many questions? (default: 5, max: {MAX_QUIZ_QUESTIONS}){Style.RESET_ALL}")
+        num_input = self._ask("num_questions", f"{Fore.GREEN}Number: {Style.RESET_ALL}").strip()
         
         try:
             num_questions = int(num_input) if num_input else 5
@@ -193,11 +433,17 @@ class EduQuest:
         except ValueError:
             num_questions = 5
         
+        # Exam mode grades every answer in one call at the end
+        self._print(f"{Fore.CYAN}Exam mode? All answers are graded together at the end (yes/no, default: no){Style.RESET_ALL}")
+        exam_input = self._ask("exam_mode", f"{Fore.GREEN}Exam mode: {Style.RESET_ALL}").strip().lower()
+        exam_mode = exam_input in ['yes', 'y', 'yeah', 'sure']
+        
         # Start quiz session
-        session.start_quiz(topics, num_questions)
+        self.session.start_quiz(topics, num_questions, exam_mode)
+        self._answer_seconds = {}
         
         # Display intro
-        print(f"{Fore.WHITE}{self.quizzer.generate_quiz_intro(topics, num_questions)}{Style.RESET_ALL}")
+        self._print(f"{Fore.WHITE}{self.quizzer.generate_quiz_intro(topics, num_questions, exam_mode)}{Style.RESET_ALL}")
         
         # Generate and ask first question
         self._ask_next_question()
@@ -209,68 +455,83 @@ class EduQuest:
             self._provide_hint()
             return
         elif user_input.lower() == 'skip':
-            print(f"{Fore.YELLOW}Skipping this question...{Style.RESET_ALL}")
+            self._print(f"{Fore.YELLOW}Skipping this question...{Style.RESET_ALL}")
+            self._note_answer_time()
             self._record_skip()
-            self._ask_next_question()
+            if self.session.quiz_session.is_complete():
+                self._end_quiz()
+            else:
+                self._ask_next_question()
             return
         elif user_input.lower() == 'quit quiz':
             self._end_quiz()
             return
         
         # This is an answer to the current question
-        self._evaluate_answer(user_input)
+        self._note_answer_time()
+        if self.session.quiz_session.exam_mode:
+            self.session.quiz_session.defer_answer(user_input)
+        else:
+            self._evaluate_answer(user_input)
         
         # Check if quiz is complete
-        if session.quiz_session.is_complete():
+        if self.session.quiz_session.is_complete():
             self._end_quiz()
         else:
             self._ask_next_question()
     
     def _ask_next_question(self):
         """Generate and display the next quiz question"""
-        quiz = session.quiz_session
-        
-        # Determine difficulty based on progress
-        progress = quiz.current_question_index / quiz.total_questions
-        if progress < 0.3:
-            difficulty = "easy"
-        elif progress < 0.7:
-            difficulty = "medium"
-        else:
-            difficulty = "hard"
+        quiz = self.session.quiz_session
         
-        # Pick a topic (rotate through topics)
-        topic_index = quiz.current_question_index % len(quiz.topics)
-        topic = quiz.topics[topic_index]
+        # Ask at the level closest to the learner's estimated ability
+        learner = self.session.learner_id
+        difficulty = self.abilities.pick_difficulty(learner)
+        
+        # Pick the topic the learner is most overdue on (exam answers awaiting
+        # grading push their topic back so the quiz still spreads out)
+        pending = Counter(q.topic for q in quiz.questions if q.is_correct is None)
+        topic = self.reviews.next_topic(learner, quiz.topics, pending)
         
         # Get previously covered topics for variety
         previous_topics = [q.topic for q in quiz.questions]
         
-        # Generate question
-        print(f"\n{Fore.CYAN}Generating question...{Style.RESET_ALL}\n")
-        
-        q_result = self.quizzer.generate_question(
-            topic=topic,
-            difficulty=difficulty,
-            question_number=quiz.current_question_index + 1,
-            total_questions=quiz.total_questions,
-            previous_topics=previous_topics if previous_topics else None
-        )
+        # Ask a due question again as is, otherwise generate a new one
+        review = self.reviews.due_question(learner, topic, exclude=[q.question for q in quiz.questions])
+        if review:
+            self._print(f"\n{Fore.CYAN}Reviewing a question you have seen before...{Style.RESET_ALL}\n")
+            q_result = {"success": True, "question": review}
+        else:
+            self._print(f"\n{Fore.CYAN}Generating question...{Style.RESET_ALL}\n")
+            
+            # The first question may already be under way from routing
+            q_result = None
+            if not quiz.questions:
+                q_result = self._speculative_result("QUIZZER", {"topic": topic, "difficulty": difficulty})
+            if q_result is None:
+                q_result = self.quizzer.generate_question(
+                    topic=topic,
+                    difficulty=difficulty,
+                    question_number=quiz.current_question_index + 1,
+                    total_questions=quiz.total_questions,
+                    previous_topics=previous_topics if previous_topics else None
+                )
         
         if q_result.get("success"):
             question_text = q_result["question"]
             
             # Add to session
-            quiz.add_question(question_text, topic)
+            quiz.add_question(question_text, topic, difficulty, q_result.get("hints"))
             
             # Display question
-            print(f"{Fore.YELLOW}{'─'*60}{Style.RESET_ALL}")
-            print(f"{Fore.WHITE}{question_text}{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}{'─'*60}{Style.RESET_ALL}")
-            print(f"{Fore.CYAN}(Type 'hint' for a hint, 'skip' to skip, 'quit quiz' to end){Style.RESET_ALL}\n")
+            self._print(f"{Fore.YELLOW}{'─'*60}{Style.RESET_ALL}")
+            self._print(f"{Fore.WHITE}{question_text}{Style.RESET_ALL}")
+            self._print(f"{Fore.YELLOW}{'─'*60}{Style.RESET_ALL}")
+            self._print(f"{Fore.CYAN}(Type 'hint' for a hint, 'skip' to skip, 'quit quiz' to end){Style.RESET_ALL}\n")
+            self._asked_at = time.monotonic()
         else:
-            print(f"{Fore.RED}Error generating question. Skipping...{Style.RESET_ALL}")
-            quiz.current_question_index += 1
+            self._print(f"{Fore.RED}Error generating question. Skipping...{Style.RESET_ALL}")
+            quiz.advance()
             if not quiz.is_complete():
                 self._ask_next_question()
             else:
@@ -278,13 +539,13 @@ class EduQuest:
     
     def _evaluate_answer(self, user_answer: str):
         """Evaluate the user's answer"""
-        quiz = session.quiz_session
+        quiz = self.session.quiz_session
         current_q = quiz.get_current_question()
         
         if not current_q:
             return
         
-        print(f"\n{Fore.CYAN}Evaluating your answer...{Style.RESET_ALL}\n")
+        self._print(f"\n{Fore.CYAN}Evaluating your answer...{Style.RESET_ALL}\n")
         
         eval_result = self.quizzer.evaluate_answer(
             question=current_q.question,
@@ -299,69 +560,157 @@ class EduQuest:
             
             # Display evaluation
             if is_correct:
-                print(f"{Fore.GREEN}CORRECT!{Style.RESET_ALL}\n")
+                self._print(f"{Fore.GREEN}CORRECT!{Style.RESET_ALL}\n")
             elif is_partial:
-                print(f"{Fore.YELLOW}PARTIALLY CORRECT{Style.RESET_ALL}\n")
+                self._print(f"{Fore.YELLOW}PARTIALLY CORRECT{Style.RESET_ALL}\n")
             else:
-                print(f"{Fore.RED}INCORRECT{Style.RESET_ALL}\n")
+                self._print(f"{Fore.RED}INCORRECT{Style.RESET_ALL}\n")
             
-            print(f"{Fore.WHITE}{evaluation}{Style.RESET_ALL}\n")
+            self._print(f"{Fore.WHITE}{evaluation}{Style.RESET_ALL}\n")
             
             # Record in session
+            index = quiz.current_question_index
             quiz.record_answer(
                 user_answer=user_answer,
                 is_correct=is_correct,
                 correct_answer="See feedback above",
-                feedback=evaluation
+                feedback=evaluation,
+                is_partial=is_partial
             )
+            self._remember(index)
         else:
-            print(f"{Fore.RED}Error evaluating answer.{Style.RESET_ALL}")
-            quiz.current_question_index += 1
+            self._print(f"{Fore.RED}Error evaluating answer.{Style.RESET_ALL}")
+            quiz.advance()
+    
+    def _grade_exam(self):
+        """Grade all deferred exam-mode answers in one batched call"""
+        quiz = self.session.quiz_session
+        pending = quiz.pending_answers()
+        
+        if not pending:
+            return
+        
+        self._print(f"\n{Fore.CYAN}Grading your {len(pending)} answers...{Style.RESET_ALL}\n")
+        
+        items = [
+            {
+                "question": quiz.questions[i].question,
+                "user_answer": quiz.questions[i].user_answer,
+                "topic": quiz.questions[i].topic
+            }
+            for i in pending
+        ]
+        results = self.quizzer.evaluate_answers_batch(items)
+        
+        for i, item, eval_result in zip(pending, items, results):
+            self._print(f"{Fore.YELLOW}{'─'*60}{Style.RESET_ALL}")
+            self._print(f"{Fore.WHITE}Question {i + 1}{Style.RESET_ALL}")
+            
+            if not eval_result.get("success"):
+                self._print(f"{Fore.RED}Error evaluating answer.{Style.RESET_ALL}\n")
+                quiz.record_answer(
+                    user_answer=item["user_answer"],
+                    is_correct=False,
+                    correct_answer="Not graded",
+                    feedback=eval_result.get("evaluation", ""),
+                    question_index=i
+                )
+                self._remember(i)
+                continue
+            
+            if eval_result["is_correct"]:
+                self._print(f"{Fore.GREEN}CORRECT!{Style.RESET_ALL}\n")
+            elif eval_result["is_partial"]:
+                self._print(f"{Fore.YELLOW}PARTIALLY CORRECT{Style.RESET_ALL}\n")
+            else:
+                self._print(f"{Fore.RED}INCORRECT{Style.RESET_ALL}\n")
+            
+            self._print(f"{Fore.WHITE}{eval_result['evaluation']}{Style.RESET_ALL}\n")
+            
+            quiz.record_answer(
+                user_answer=item["user_answer"],
+                is_correct=eval_result["is_correct"],
+                correct_answer=eval_result.get("correct_answer") or "See feedback above",
+                feedback=eval_result["evaluation"],
+                question_index=i,
+                is_partial=eval_result.get("is_partial", False)
+            )
+            self._remember(i)
     
     def _provide_hint(self):
         """Provide a hint for the current question"""
-        quiz = session.quiz_session
+        quiz = self.session.quiz_session
         current_q = quiz.get_current_question()
         
         if current_q:
-            hint = self.quizzer.get_hint(current_q.question, current_q.topic)
-            print(f"\n{Fore.CYAN}{hint}{Style.RESET_ALL}\n")
+            # Hints normally came with the question; a reviewed question fetches all tiers once
+            hints = None
+            if not current_q.hints:
+                hints = self.quizzer.get_hints(current_q.question, current_q.topic)
+                metrics.increment("quiz.hints_fetched")
+            shown = quiz.show_hint(hints)
+            if shown:
+                tier, hint = shown
+                metrics.increment("quiz.hints_shown")
+                self._print(f"\n{Fore.CYAN}Hint {tier}/{len(current_q.hints)}: {hint}{Style.RESET_ALL}\n")
+    
+    def _note_answer_time(self):
+        """Remember how long the learner took on the current question"""
+        quiz = self.session.quiz_session
+        if self._asked_at:
+            self._answer_seconds[quiz.current_question_index] = time.monotonic() - self._asked_at
+    
+    def _speculative_result(self, intent: str, request: dict):
+        """Result of this turn's speculation if it matches request, else None"""
+        if self._speculation is None:
+            return None
+        result = self._speculation.take(intent, request)
+        if result is None:
+            self._speculation.discard()
+        self._speculation = None
+        return result
+    
+    def _remember(self, index: int):
+        """Feed a graded question to the spaced-repetition memory and ability model"""
+        from analytics import verdict_of
+        
+        questions = self.session.quiz_session.questions
+        if index >= len(questions):
+            return
+        q = questions[index]
+        verdict = verdict_of(q)
+        if verdict is not None:
+            self.reviews.record(self.session.learner_id, q.topic, verdict,
+                                self._answer_seconds.get(index), q.question)
+            self.abilities.update(self.session.learner_id, verdict, q.difficulty, q.question)
     
     def _record_skip(self):
         """Record a skipped question"""
-        quiz = session.quiz_session
+        quiz = self.session.quiz_session
+        index = quiz.current_question_index
         quiz.record_answer(
             user_answer="[Skipped]",
             is_correct=False,
             correct_answer="Question was skipped",
             feedback="You chose to skip this question."
         )
+        self._remember(index)
     
     def _end_quiz(self):
         """End the quiz session and show summary"""
-        quiz = session.quiz_session
+        quiz = self.session.quiz_session
         
         if not quiz:
             return
         
-        summary_info = quiz.get_summary()
-        
-        # Identify weak areas
-        weak_topics = []
-        topic_scores = {}
+        if quiz.exam_mode:
+            self._grade_exam()
         
-        for q in quiz.questions:
-            if q.topic not in topic_scores:
-                topic_scores[q.topic] = {"correct": 0, "total": 0}
-            topic_scores[q.topic]["total"] += 1
-            if q.is_correct:
-                topic_scores[q.topic]["correct"] += 1
+        summary_info = quiz.get_summary()
         
-        for topic, scores in topic_scores.items():
-            if scores["total"] > 0:
-                percentage = (scores["correct"] / scores["total"]) * 100
-                if percentage < 70:
-                    weak_topics.append(topic)
+        # Record results, then identify weak areas across all of this learner's quizzes
+        self.history.record_quiz(self.session.learner_id, quiz, self._answer_seconds)
+        weak_topics = self.history.weak_areas(self.session.learner_id, limit=5)
         
         # Display summary
         summary = self.quizzer.generate_quiz_summary(
@@ -371,18 +720,18 @@ class EduQuest:
             weak_areas=weak_topics if weak_topics else None
         )
         
-        print(f"{Fore.WHITE}{summary}{Style.RESET_ALL}")
+        self._print(f"{Fore.WHITE}{summary}{Style.RESET_ALL}")
         
         # End session
-        session.end_quiz()
+        self.session.end_quiz()
     
     def _get_conversation_context(self) -> str:
         """Build conversation context from history"""
-        if not session.conversation_history:
+        if not self.session.conversation_history:
             return ""
         
         # Get last 5 exchanges
-        recent = session.conversation_history[-10:]
+        recent = self.session.conversation_history[-10:]
         context_parts = []
         
         for msg in recent:
@@ -394,15 +743,18 @@ class EduQuest:
     
     def _handle_exit(self):
         """Handle application exit"""
-        print(f"\n{Fore.CYAN}Thank you for using EduQuest! Keep up the great work!{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}Remember: Consistent study beats cramming every time!{Style.RESET_ALL}\n")
+        self._print(f"\n{Fore.CYAN}Thank you for using EduQuest! Keep up the great work!{Style.RESET_ALL}")
+        self._print(f"{Fore.YELLOW}Remember: Consistent study beats cramming every time!{Style.RESET_ALL}\n")
 
 
 def main():
     """Main entry point"""
     try:
+        print(f"{Fore.WHITE}{WELCOME_MESSAGE}{Style.RESET_ALL}")
         app = EduQuest()
-        app.run()
+        # Agents and the model SDK load while the learner reads the banner
+        threading.Thread(target=app.warm_up, name="warm-up", daemon=True).start()
+        app.run(welcome=False)
     except Exception as e:
         print(f"{Fore.RED}Fatal error: {e}{Style.RESET_ALL}")
         sys.exit(1)
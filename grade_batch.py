@@ -0,0 +1,233 @@
+"""
+Bulk Grading for EduQuest
+Grades a class's submissions offline from a JSONL or CSV file
+
+Each input record needs "student", "question" and "answer"; "topic" and "id"
+are optional. Several answers are packed into each grading prompt, batches
+run on a bounded worker pool, results are streamed to a JSONL file and a
+checkpoint allows an interrupted run to resume. A record that cannot be
+graded (a missing field, a line that is not a JSON object, a failed
+grading call) gets a result with "success": false and an "error", and the
+run goes on.
+
+Usage:
+    python grade_batch.py submissions.jsonl -o results.jsonl
+    python grade_batch.py submissions.csv -o results.jsonl --workers 8 --stub
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import GRADING_BATCH_SIZE, GRADING_MAX_WORKERS, QUIZ_MODEL
+from metrics import metrics
+
+
+def read_records(path: str) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """Stream (line number, record) pairs from a JSONL or CSV file (None for invalid JSON)"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for number, row in enumerate(csv.DictReader(f)):
+                yield number, row
+        else:
+            number = 0
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    yield number, record
+                    number += 1
+
+
+def record_error(record) -> Optional[str]:
+    """Why a record cannot be graded, or None if it can"""
+    if not isinstance(record, dict):
+        return "not a JSON object"
+    for field in ("question", "answer"):
+        if record.get(field) is None:
+            return f"missing {field}"
+    return None
+
+
+class Checkpoint:
+    """
+    Compact resume state: every record below `next` is done, plus the few
+    finished out of order above it. Rewritten atomically after each batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.next = 0
+        self.done: Set[int] = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.next = state.get("next", 0)
+            self.done = set(state.get("done", []))
+
+    def is_done(self, number: int) -> bool:
+        return number < self.next or number in self.done
+
+    def mark(self, numbers: List[int]):
+        with self._lock:
+            self.done.update(numbers)
+            while self.next in self.done:
+                self.done.remove(self.next)
+                self.next += 1
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"next": self.next, "done": sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+
+def _batches(records: Iterator[Tuple[int, Dict]], checkpoint: Checkpoint,
+             size: int) -> Iterator[List[Tuple[int, Dict]]]:
+    batch = []
+    for number, record in records:
+        if checkpoint.is_done(number):
+            continue
+        batch.append((number, record))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def grade_file(input_path: str, output_path: str, quizzer, workers: int = GRADING_MAX_WORKERS,
+               batch_size: int = GRADING_BATCH_SIZE, checkpoint_path: str = None,
+               progress_every: int = 100) -> Dict:
+    """
+    Grade every record in input_path and append results to output_path
+
+    At most 2 * workers batches are in memory at once. Results are written
+    before the checkpoint advances, so a crash can repeat (never lose) the
+    last few batches.
+
+    Returns:
+        Run statistics (graded, errors, elapsed seconds, answers per second)
+    """
+    checkpoint = Checkpoint(checkpoint_path or output_path + ".ckpt")
+    write_lock = threading.Lock()
+    stats = {"graded": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def error_line(number: int, record, error: str) -> str:
+        record = record if isinstance(record, dict) else {}
+        return json.dumps({
+            "id": record.get("id") or f"{record.get('student', '')}:{number}",
+            "student": record.get("student"),
+            "question": record.get("question"),
+            "success": False,
+            "error": error,
+        })
+
+    def grade(batch: List[Tuple[int, Dict]]) -> int:
+        lines: Dict[int, str] = {}  # by record number, written in input order
+        errors = 0
+        valid = []
+        for number, record in batch:
+            error = record_error(record)
+            if error:
+                lines[number] = error_line(number, record, error)
+                errors += 1
+            else:
+                valid.append((number, record))
+        items = [
+            {
+                "question": record["question"],
+                "user_answer": record["answer"],
+                "topic": record.get("topic") or "General",
+                "question_id": record.get("question_id")
+            }
+            for _, record in valid
+        ]
+        try:
+            results = quizzer.evaluate_answers_batch(items) if items else []
+        except Exception as e:
+            metrics.increment("grade_batch.batch_errors")
+            results = [{"success": False, "error": f"grading failed: {e}"}] * len(valid)
+        for (number, record), result in zip(valid, results):
+            if result.get("error") and not result.get("success"):
+                lines[number] = error_line(number, record, result["error"])
+                errors += 1
+                continue
+            lines[number] = json.dumps({
+                "id": record.get("id") or f"{record.get('student', '')}:{number}",
+                "student": record.get("student"),
+                "question": record["question"],
+                "success": result.get("success", False),
+                "is_correct": result.get("is_correct"),
+                "is_partial": result.get("is_partial"),
+                "evaluation": result.get("evaluation"),
+                "memo": result.get("memo"),
+            })
+            if not result.get("success"):
+                errors += 1
+        with write_lock:
+            out.write("\n".join(lines[number] for number, _ in batch) + "\n")
+            out.flush()
+            stats["errors"] += errors
+        checkpoint.mark([number for number, _ in batch])
+        return len(batch)
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        reported = 0
+        for batch in _batches(read_records(input_path), checkpoint, batch_size):
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                stats["graded"] += sum(f.result() for f in finished)
+            pending.add(pool.submit(grade, batch))
+            if stats["graded"] - reported >= progress_every:
+                reported = stats["graded"]
+                rate = reported / (time.perf_counter() - start)
+                print(f"  graded {reported} answers ({rate:.1f}/s)", file=sys.stderr)
+        for future in pending:
+            stats["graded"] += future.result()
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["answers_per_second"] = round(stats["graded"] / elapsed, 2) if elapsed else 0.0
+    stats["memo_hits"] = (metrics.get("grading_memo.hits.exact")
+                          + metrics.get("grading_memo.hits.similar"))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade class submissions offline")
+    parser.add_argument("input", help="JSONL or CSV with student, question, answer[, topic, id]")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--checkpoint", help="Resume file (default: <output>.ckpt)")
+    parser.add_argument("--workers", type=int, default=GRADING_MAX_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=GRADING_BATCH_SIZE,
+                        help="Answers packed into one grading prompt")
+    parser.add_argument("--stub", action="store_true", help="Use the local stub backend")
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="Seconds of simulated latency per stub call")
+    args = parser.parse_args()
+
+    from agents.quiz_agent import QuizAgent
+    from llm_backend import StubBackend, create_backend
+
+    backend = StubBackend(latency=args.stub_latency) if args.stub else create_backend(QUIZ_MODEL)
+    stats = grade_file(args.input, args.output, QuizAgent(backend),
+                       workers=args.workers, batch_size=args.batch_size,
+                       checkpoint_path=args.checkpoint)
+    if args.stub:
+        stats["model_calls"] = backend.calls
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Grading Memo for EduQuest
+Reuses verdicts for repeated (question, answer) pairs across learners
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from config import (
+    GRADING_MEMO_MIN_SIMILARITY, GRADING_MEMO_MIN_TOKENS,
+    GRADING_MEMO_MAX_QUESTIONS, GRADING_MEMO_MAX_ANSWERS
+)
+from metrics import metrics
+
+_MCQ_PATTERN = re.compile(r"^(?:option|answer)?\s*\(?([a-d])\)?[.):]?$")
+
+
+def make_question_id(question: str) -> str:
+    """Stable id for a question from its whitespace-normalized text"""
+    normalized = " ".join(question.split()).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_answer(answer: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace; "Option (B)." -> "b" """
+    text = " ".join(re.sub(r"[^\w\s.+\-*/=']", " ", answer.lower().replace("\u2019", "'")).split()).strip(" .")
+    match = _MCQ_PATTERN.match(text)
+    return match.group(1) if match else text
+
+
+_NEGATIONS = frozenset(["not", "no", "never", "none", "cannot", "can't", "isn't", "doesn't",
+                        "don't", "won't", "false", "true", "without"])
+
+
+def _shingles(normalized: str) -> FrozenSet[str]:
+    """Character trigrams used for near-duplicate matching (tolerates typos)"""
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _key_tokens(normalized: str) -> Tuple[str, ...]:
+    """Tokens that flip meaning with one character: numbers and negations"""
+    words = normalized.split()
+    return tuple(w for w in words if w in _NEGATIONS or re.fullmatch(r"[\d.]+", w))
+
+
+@dataclass
+class MemoEntry:
+    """A stored verdict for one normalized answer"""
+    result: Dict
+    shingles: FrozenSet[str]
+    key_tokens: Tuple[str, ...]
+    gradings: int = 1
+    reuses: int = 0
+    contested: bool = False  # independent gradings disagreed
+
+
+class ReusePolicy:
+    """
+    Decides when a stored verdict may be reused instead of regrading
+
+    - Exact matches are reused unless the verdict was contested
+    - Near matches need high similarity, a long enough answer, the same
+      numbers and negations, and a clear (not partially correct) verdict
+    - Every regrade_every-th lookup of an entry is regraded to keep it honest
+    """
+
+    def __init__(self, min_similarity: float = GRADING_MEMO_MIN_SIMILARITY,
+                 min_tokens: int = GRADING_MEMO_MIN_TOKENS,
+                 regrade_every: int = 50):
+        self.min_similarity = min_similarity
+        self.min_tokens = min_tokens
+        self.regrade_every = regrade_every
+
+    def regrade_due(self, entry: MemoEntry) -> bool:
+        """Whether the next lookup of entry is its periodic regrade"""
+        return bool(self.regrade_every) and (entry.reuses + 1) % self.regrade_every == 0
+
+    def reuse_exact(self, entry: MemoEntry) -> bool:
+        return not entry.contested and not self.regrade_due(entry)
+
+    def similar_enough(self, entry: MemoEntry, similarity: float,
+                       answer_tokens: int, key_tokens_match: bool) -> bool:
+        """Whether a near match may stand in for entry, regrades aside"""
+        if entry.result.get("is_partial") or answer_tokens < self.min_tokens:
+            return False
+        return key_tokens_match and similarity >= self.min_similarity
+
+    def reuse_similar(self, entry: MemoEntry, similarity: float,
+                      answer_tokens: int, key_tokens_match: bool) -> bool:
+        return (self.similar_enough(entry, similarity, answer_tokens, key_tokens_match)
+                and self.reuse_exact(entry))
+
+
+class GradingMemo:
+    """
+    Thread-safe memo of grading results keyed on (question id, normalized answer)
+
+    Questions are kept in LRU order; each holds at most max_answers answers.
+    """
+
+    def __init__(self, policy: Optional[ReusePolicy] = None,
+                 max_questions: int = GRADING_MEMO_MAX_QUESTIONS,
+                 max_answers: int = GRADING_MEMO_MAX_ANSWERS):
+        self.policy = policy or ReusePolicy()
+        self.max_questions = max_questions
+        self.max_answers = max_answers
+        self._questions: "OrderedDict[str, Dict[str, MemoEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, question_id: str, answer: str) -> Optional[Dict]:
+        """
+        Return a stored result for this answer, or None to regrade
+
+        The returned dict is a copy of the original result with a "memo" key
+        set to "exact" or "similar".
+        """
+        normalized = normalize_answer(answer)
+        with self._lock:
+            answers = self._questions.get(question_id)
+            if not answers:
+                metrics.increment("grading_memo.misses")
+                return None
+            self._questions.move_to_end(question_id)
+
+            entry = answers.get(normalized)
+            if entry is not None:
+                reuse = self.policy.reuse_exact(entry)
+                # Regrades count as uses too, so the lookups after one are hits again
+                entry.reuses += 1
+                if reuse:
+                    metrics.increment("grading_memo.hits.exact")
+                    return dict(entry.result, memo="exact")
+                metrics.increment("grading_memo.regrades")
+                return None
+
+            shingles = _shingles(normalized)
+            key_tokens = _key_tokens(normalized)
+            best, best_similarity = None, 0.0
+            for candidate in answers.values():
+                union = len(shingles | candidate.shingles)
+                similarity = len(shingles & candidate.shingles) / union if union else 0.0
+                if similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+
+            if best is not None and self.policy.similar_enough(
+                    best, best_similarity, len(normalized.split()), key_tokens == best.key_tokens):
+                reuse = self.policy.reuse_exact(best)
+                best.reuses += 1
+                if reuse:
+                    metrics.increment("grading_memo.hits.similar")
+                    return dict(best.result, memo="similar")
+                metrics.increment("grading_memo.regrades")
+                return None
+
+        metrics.increment("grading_memo.misses")
+        return None
+
+    def store(self, question_id: str, answer: str, result: Dict):
+        """Remember a fresh grading result; disagreeing regrades mark the entry contested"""
+        if not result.get("success"):
+            return
+        normalized = normalize_answer(answer)
+        stored = {k: v for k, v in result.items() if k != "memo"}
+        with self._lock:
+            answers = self._questions.setdefault(question_id, {})
+            self._questions.move_to_end(question_id)
+
+            entry = answers.get(normalized)
+            if entry is not None:
+                same = (entry.result.get("is_correct") == stored.get("is_correct")
+                        and entry.result.get("is_partial") == stored.get("is_partial"))
+                entry.contested = entry.contested or not same
+                entry.gradings += 1
+                entry.result = stored
+            elif len(answers) < self.max_answers:
+                answers[normalized] = MemoEntry(stored, _shingles(normalized), _key_tokens(normalized))
+
+            while len(self._questions) > self.max_questions:
+                self._questions.popitem(last=False)
+        metrics.increment("grading_memo.stores")
+
+    def clear(self):
+        with self._lock:
+            self._questions.clear()
+
+
+# Process-wide memo shared by all quiz agents
+grading_memo = GradingMemo()
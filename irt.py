@@ -0,0 +1,302 @@
+"""
+Adaptive Difficulty for EduQuest
+Rasch (1PL item response theory) model of learner ability and question difficulty
+
+P(correct) = 1 / (1 + exp(difficulty - ability)), both in logits; partial
+credit counts as half a correct answer and a skip as a wrong one.
+
+Live, every graded answer nudges the learner's ability and the question's
+difficulty with an Elo-style step that shrinks as answers accumulate, and
+the next question is asked at the level (easy/medium/hard) closest to the
+learner's ability, where it tells us the most. Offline, calibrate() re-fits
+every ability and difficulty jointly from the whole quiz history with
+vectorized Newton steps:
+
+    python irt.py                      # fit every shard under ANALYTICS_DIR, write irt.npz there
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from analytics import DIFFICULTIES, VERDICT_SCORE, QuizHistory, ShardedHistory, question_key
+from config import (
+    ANALYTICS_DIR, IRT_LEVEL_PRIORS, IRT_LEARNING_RATE, IRT_RATE_DECAY, IRT_PRIOR_SD,
+    IRT_ITERATIONS, SR_MAX_LEARNERS
+)
+
+PARAMS_FILE = "irt.npz"
+LEVELS = ("easy", "medium", "hard")
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+@dataclass
+class IRTParams:
+    """Result of a calibration over the first `rows` rows of each store of a quiz history"""
+    learners: List[str]
+    abilities: np.ndarray            # per learner, same order as learners
+    learner_answers: np.ndarray
+    question_keys: np.ndarray        # sorted analytics.question_key values
+    question_difficulty: np.ndarray
+    question_answers: np.ndarray
+    level_difficulty: Dict[str, float]
+    rows: List[int]                  # Snapshot.rows of the history fitted
+
+    def save(self, path: str):
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, learners=np.array(self.learners, dtype=str), abilities=self.abilities,
+                     learner_answers=self.learner_answers, question_keys=self.question_keys,
+                     question_difficulty=self.question_difficulty,
+                     question_answers=self.question_answers,
+                     meta=np.array(json.dumps({"levels": self.level_difficulty, "rows": self.rows})))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "IRTParams":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            rows = meta["rows"]
+            return cls(learners=data["learners"].tolist(), abilities=data["abilities"],
+                       learner_answers=data["learner_answers"], question_keys=data["question_keys"],
+                       question_difficulty=data["question_difficulty"],
+                       question_answers=data["question_answers"],
+                       level_difficulty=meta["levels"],
+                       rows=[rows] if isinstance(rows, int) else rows)
+
+
+def calibrate(history: Union[QuizHistory, ShardedHistory], iterations: int = IRT_ITERATIONS,
+              prior_sd: float = IRT_PRIOR_SD) -> IRTParams:
+    """
+    Jointly fit every learner's ability and every question's difficulty
+
+    Newton steps on the penalized likelihood, each one pass of predictions
+    and a few bincounts over all rows. Question difficulties are shrunk
+    towards the mean of their level, which is re-estimated every iteration;
+    answers to questions without a key count towards a per-level
+    pseudo-question.
+
+    Args:
+        history: Quiz history to fit
+        iterations: Newton steps over abilities and difficulties
+        prior_sd: Standard deviation of the Gaussian priors, in logits
+    """
+    snapshot = history.snapshot()
+    names = snapshot.learners
+    cols = snapshot.columns
+    rows = len(cols["learner"])
+    learners = cols["learner"].astype(np.intp)
+    levels = cols["difficulty"].astype(np.intp) + 1   # 0 unknown, 1 easy, 2 medium, 3 hard
+    score = VERDICT_SCORE[cols["verdict"]]
+
+    known = cols["question"] != 0
+    keys, inverse = np.unique(cols["question"][known], return_inverse=True)
+    items = np.empty(rows, np.intp)
+    items[known] = inverse
+    items[~known] = len(keys) + levels[~known]
+    n_items = len(keys) + 4
+    item_level = np.empty(n_items, np.intp)
+    item_level[items] = levels
+    item_level[len(keys):] = np.arange(4)
+
+    level_prior = np.array([IRT_LEVEL_PRIORS["medium"]] + [IRT_LEVEL_PRIORS[lvl] for lvl in LEVELS])
+    precision = 1.0 / prior_sd ** 2
+    theta = np.zeros(len(names))
+    b = level_prior[item_level]
+    answered = np.bincount(items, minlength=n_items) > 0
+    level_count = np.bincount(item_level, weights=answered, minlength=4)
+    level_mean = level_prior
+
+    for _ in range(iterations):
+        # Both steps share one pass of predictions (Jacobi rather than Gauss-Seidel)
+        p = _sigmoid(theta[learners] - b[items])
+        residual = score - p
+        information = p * (1 - p)
+
+        level_sum = np.bincount(item_level, weights=np.where(answered, b, 0.0), minlength=4)
+        level_mean = np.where(level_count > 0, level_sum / np.maximum(level_count, 1), level_prior)
+        theta += ((np.bincount(learners, residual, len(names)) - precision * theta)
+                  / (np.bincount(learners, information, len(names)) + precision))
+        b += ((-np.bincount(items, residual, n_items) - precision * (b - level_mean[item_level]))
+              / (np.bincount(items, information, n_items) + precision))
+
+    return IRTParams(
+        learners=names,
+        abilities=theta,
+        learner_answers=np.bincount(learners, minlength=len(names)),
+        question_keys=keys,
+        question_difficulty=b[:len(keys)],
+        question_answers=np.bincount(items, minlength=n_items)[:len(keys)],
+        level_difficulty={lvl: float(level_mean[DIFFICULTIES[lvl] + 1]) for lvl in LEVELS},
+        rows=snapshot.rows,
+    )
+
+
+class AbilityModel:
+    """
+    Live ability and difficulty estimates, seeded from the last calibration
+
+    Answers recorded after that calibration are replayed from the history
+    the first time a learner is looked up.
+    """
+
+    def __init__(self, history: Optional[QuizHistory] = None, params: Optional[IRTParams] = None,
+                 max_learners: int = SR_MAX_LEARNERS):
+        self.history = history
+        self.max_learners = max_learners
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.load(params)
+
+    @property
+    def params_path(self) -> Optional[str]:
+        directory = self.history.directory if self.history is not None else None
+        return os.path.join(directory, PARAMS_FILE) if directory else None
+
+    def load(self, params: Optional[IRTParams]):
+        """Start over from params (or from the priors)"""
+        with self._lock:
+            self.params = params
+            self.levels = dict(IRT_LEVEL_PRIORS)
+            if params:
+                self.levels.update(params.level_difficulty)
+            self._learner_index = {name: i for i, name in enumerate(params.learners)} if params else {}
+            self._learners: "OrderedDict[str, List[float]]" = OrderedDict()  # [ability, answers]
+            self._questions: Dict[int, List[float]] = {}                     # [difficulty, answers]
+
+    def refresh(self):
+        """Pick up a newer calibration written next to the history"""
+        path = self.params_path
+        try:
+            mtime = os.path.getmtime(path) if path else None
+        except OSError:
+            return
+        if mtime is not None and mtime != self._mtime:
+            self._mtime = mtime
+            params = IRTParams.load(path)
+            # Fitted on another shard layout, it cannot tell which answers it already counted
+            if len(params.rows) == self.history.shards:
+                self.load(params)
+
+    def _learner(self, learner: str) -> List[float]:
+        # Caller holds the lock
+        state = self._learners.get(learner)
+        if state is not None:
+            self._learners.move_to_end(learner)
+            return state
+        i = self._learner_index.get(learner)
+        if i is None:
+            state = [0.0, 0]
+        else:
+            state = [float(self.params.abilities[i]), int(self.params.learner_answers[i])]
+        if self.history is not None:
+            since = self.params.rows if self.params else ()
+            for _, key, verdict, _, _, difficulty in self.history.learner_answers(learner, since):
+                self._step(state, verdict, difficulty, key)
+        self._learners[learner] = state
+        if len(self._learners) > self.max_learners:
+            self._learners.popitem(last=False)
+        return state
+
+    def _question(self, key: int, difficulty: Optional[str]) -> List[float]:
+        # Caller holds the lock
+        state = self._questions.get(key) if key else None
+        if state is not None:
+            return state
+        state = [self.levels.get(difficulty or "medium", self.levels["medium"]), 0]
+        if key and self.params is not None and len(self.params.question_keys):
+            j = int(np.searchsorted(self.params.question_keys, key))
+            if j < len(self.params.question_keys) and self.params.question_keys[j] == key:
+                state = [float(self.params.question_difficulty[j]), int(self.params.question_answers[j])]
+        if key:
+            self._questions[key] = state
+        return state
+
+    def _step(self, learner: List[float], verdict: int, difficulty: Optional[str], key: int):
+        question = self._question(key, difficulty)
+        residual = VERDICT_SCORE[verdict] - 1.0 / (1.0 + math.exp(question[0] - learner[0]))
+        learner[0] += IRT_LEARNING_RATE / (1 + IRT_RATE_DECAY * learner[1]) * residual
+        learner[1] += 1
+        if key:
+            question[0] -= IRT_LEARNING_RATE / (1 + IRT_RATE_DECAY * question[1]) * residual
+            question[1] += 1
+
+    def update(self, learner: str, verdict: int, difficulty: Optional[str] = None,
+               question: Optional[str] = None):
+        """Apply one graded answer (see analytics.verdict_of)"""
+        with self._lock:
+            self._step(self._learner(learner), verdict, difficulty,
+                       question_key(question) if question else 0)
+
+    def forget(self, learner: str):
+        """Drop learner's live estimate; the next lookup replays it from the history"""
+        with self._lock:
+            self._learners.pop(learner, None)
+
+    def ability(self, learner: str) -> float:
+        """Current ability estimate in logits (0 for a new learner)"""
+        with self._lock:
+            return self._learner(learner)[0]
+
+    def probability(self, learner: str, difficulty: str) -> float:
+        """Predicted chance that learner answers a question of this level correctly"""
+        return 1.0 / (1.0 + math.exp(self.levels[difficulty] - self.ability(learner)))
+
+    def pick_difficulty(self, learner: str) -> str:
+        """
+        The level that is most informative about this learner
+
+        A Rasch item's Fisher information p(1 - p) peaks where its difficulty
+        equals the ability, so this is the level nearest to the ability.
+        """
+        ability = self.ability(learner)
+        return min(LEVELS, key=lambda lvl: abs(self.levels[lvl] - ability))
+
+
+_models: "weakref.WeakKeyDictionary[QuizHistory, AbilityModel]" = weakref.WeakKeyDictionary()
+_models_lock = threading.Lock()
+
+
+def get_ability_model(history: QuizHistory) -> AbilityModel:
+    """The model shared by everything recording into history, on its latest calibration"""
+    with _models_lock:
+        model = _models.get(history)
+        if model is None:
+            model = _models[history] = AbilityModel(history)
+    model.refresh()
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-fit EduQuest's IRT model from the quiz history")
+    parser.add_argument("--dir", default=ANALYTICS_DIR, help="Quiz-history directory")
+    parser.add_argument("--iterations", type=int, default=IRT_ITERATIONS)
+    args = parser.parse_args()
+
+    history = ShardedHistory(args.dir)
+    start = time.perf_counter()
+    params = calibrate(history, args.iterations)
+    elapsed = time.perf_counter() - start
+    params.save(os.path.join(args.dir, PARAMS_FILE))
+    print(json.dumps({
+        "rows": sum(params.rows),
+        "learners": len(params.learners),
+        "questions": len(params.question_keys),
+        "levels": {lvl: round(b, 3) for lvl, b in params.level_difficulty.items()},
+        "seconds": round(elapsed, 3),
+    }, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Incremental JSON Parsing for EduQuest
+Reads a JSON object as it streams in and reports each top-level field once complete
+
+Models wrap JSON in markdown fences or a sentence now and then; the parser
+skips everything before the first "{" and after the matching "}". Each
+top-level value is decoded with json.loads as soon as its last character
+arrives, so a caller can act on "intent" while "extracted_info" is still
+being generated:
+
+    parser = JsonStreamParser()
+    for chunk in chunks:
+        for key, value in parser.feed(chunk):
+            ...
+    result = parser.close()       # the whole object; raises JsonStreamError if incomplete
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JsonStreamError(ValueError):
+    """The stream did not contain one complete, valid JSON object"""
+
+
+# Parser states between top-level tokens
+_BEFORE = 0        # before the opening brace
+_KEY = 1           # expecting a key (or the closing brace)
+_COLON = 2         # after a key
+_VALUE = 3         # expecting a value
+_IN_VALUE = 4      # inside a value
+_AFTER = 5         # after a value: "," or "}"
+_DONE = 6
+
+
+class JsonStreamParser:
+    """
+    Push parser for a single JSON object, one top-level field at a time
+
+    Nested values are only scanned for their end (strings, escapes and
+    bracket depth), then decoded in one go, so feeding text is linear in its
+    length however it is chunked.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._state = _BEFORE
+        self._buffer: List[str] = []   # text of the key or value being read
+        self._key: Optional[str] = None
+        self._depth = 0                 # bracket depth inside the current value
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the closing brace of the object has been read"""
+        return self._state == _DONE
+
+    def _finish_value(self) -> Tuple[str, Any]:
+        text = "".join(self._buffer).strip()
+        self._buffer = []
+        try:
+            value = json.loads(text)
+        except ValueError as e:
+            raise JsonStreamError(f"Invalid value for {self._key!r}: {text[:40]!r}") from e
+        self.fields[self._key] = value
+        return self._key, value
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Consume the next chunk of the stream
+
+        Returns:
+            (key, value) of every top-level field completed by this chunk
+
+        Raises:
+            JsonStreamError: The stream cannot be a JSON object
+        """
+        completed = []
+        for ch in text:
+            state = self._state
+            if state == _DONE:
+                break
+
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if state == _KEY:
+                        self._key = json.loads("".join(self._buffer))
+                        self._buffer = []
+                        self._state = _COLON
+                    elif self._depth == 0:
+                        completed.append(self._finish_value())
+                        self._state = _AFTER
+                continue
+
+            if state == _BEFORE:
+                if ch == "{":
+                    self._state = _KEY
+            elif ch in " \t\r\n":
+                if state == _IN_VALUE and self._depth:
+                    self._buffer.append(ch)
+                elif state == _IN_VALUE:
+                    # A scalar such as a number or null ends at whitespace
+                    completed.append(self._finish_value())
+                    self._state = _AFTER
+            elif state == _KEY:
+                if ch == '"':
+                    self._in_string = True
+                    self._buffer = [ch]
+                elif ch == "}" and not self.fields:
+                    self._state = _DONE
+                else:
+                    raise JsonStreamError(f"Expected a key, got {ch!r}")
+            elif state == _COLON:
+                if ch != ":":
+                    raise JsonStreamError(f"Expected ':', got {ch!r}")
+                self._state = _VALUE
+            elif state == _VALUE:
+                self._buffer = [ch]
+                if ch == '"':
+                    self._in_string = True
+                    self._state = _IN_VALUE
+                elif ch in "{[":
+                    self._depth = 1
+                    self._state = _IN_VALUE
+                else:
+                    self._state = _IN_VALUE
+            elif state == _IN_VALUE:
+                if self._depth:
+                    self._buffer.append(ch)
+                    if ch == '"':
+                        self._in_string = True
+                    elif ch in "{[":
+                        self._depth += 1
+                    elif ch in "}]":
+                        self._depth -= 1
+                        if not self._depth:
+                            completed.append(self._finish_value())
+                            self._state = _AFTER
+                elif ch in ",}":
+                    completed.append(self._finish_value())
+                    self._state = _KEY if ch == "," else _DONE
+                else:
+                    self._buffer.append(ch)
+            elif state == _AFTER:
+                if ch == ",":
+                    self._state = _KEY
+                elif ch == "}":
+                    self._state = _DONE
+                else:
+                    raise JsonStreamError(f"Expected ',' or '}}', got {ch!r}")
+        return completed
+
+    def close(self) -> Dict[str, Any]:
+        """
+        The complete object
+
+        Raises:
+            JsonStreamError: The stream ended before the object was complete
+        """
+        if self._state != _DONE:
+            raise JsonStreamError("JSON object is incomplete")
+        return self.fields
+
+
+def parse_object(text: str) -> Dict[str, Any]:
+    """The first JSON object in text (fences and surrounding prose are ignored)"""
+    parser = JsonStreamParser()
+    parser.feed(text)
+    return parser.close()
@@ -0,0 +1,532 @@
+"""
+Model Backends for EduQuest
+Pluggable implementations of the generate_content call used by every agent
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import (
+    MODEL_BACKEND, STUB_LATENCY_SECONDS, STUB_TOKENS_PER_SECOND, require_api_key,
+    CASSETTE_PATH, REPLAY_LATENCY, SINGLEFLIGHT_ENABLED, SINGLEFLIGHT_DETERMINISTIC_MAX_TEMPERATURE,
+    SINGLEFLIGHT_CREATIVE_MAX_WAITERS
+)
+from call_scheduler import current_priority, get_call_scheduler
+from singleflight import SingleFlight
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class UsageMetadata:
+    """Token counts in the shape of the Gemini SDK's usage_metadata"""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class BackendResponse:
+    """Minimal response object exposing .text and .usage_metadata"""
+
+    def __init__(self, text: str, usage_metadata: Optional[UsageMetadata] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class ModelBackend:
+    """
+    Interface between agents and a model provider
+
+    Agents only call generate_content(prompt, generation_config=...) and read
+    .text from the result, which is exactly the GenerativeModel API.
+    stream_content() yields the same text in chunks as it is generated, for
+    callers that act on the start of a reply before it is complete.
+    """
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        raise NotImplementedError
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        """Text of the reply in chunks (backends that cannot stream yield it whole)"""
+        yield self.generate_content(prompt, generation_config=generation_config).text
+
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _configured_genai():
+    """google.generativeai, imported and configured once per process on first use"""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            api_key = require_api_key()
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _genai = genai
+        return _genai
+
+
+class GeminiBackend(ModelBackend):
+    """Calls Gemini through google-generativeai"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = _configured_genai().GenerativeModel(model_name)
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        return self._model.generate_content(prompt, generation_config=generation_config,
+                                            **kwargs)
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        for chunk in self._model.generate_content(prompt, generation_config=generation_config,
+                                                  stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+def _stable_hash(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+_STUB_HINTS = ("HINT 1: Think about the definition first.\n"
+               "HINT 2: Consider what problem it was designed to solve.\n"
+               "HINT 3: Describe how it behaves in a small example.")
+
+
+def default_stub_responder(prompt: str) -> str:
+    """
+    Produce a well-formed, deterministic reply for each agent prompt type
+
+    Good enough to drive every EduQuest code path without a real model.
+    """
+    if "<<<TASK\n" in prompt and "TASK>>>" in prompt:
+        # Fused route-and-act: route as the manager, then answer the embedded task
+        head, rest = prompt.split("<<<TASK\n", 1)
+        task, tail = rest.split("TASK>>>", 1)
+        routing = default_stub_responder(head + tail)
+        marker = re.search(r"containing only (\S+)", tail)
+        intent = re.search(r"If the intent is (\w+)", head)
+        if not marker or not intent or json.loads(routing).get("intent") != intent.group(1):
+            return routing
+        return f"{routing}\n{marker.group(1)}\n{default_stub_responder(task)}"
+    if "BATCH ANSWER EVALUATION REQUEST" in prompt:
+        answers = re.findall(r"STUDENT'S ANSWER:\n(.*?)(?:\n\nITEM \d+|\n\nRESPOND)", prompt, re.S)
+        verdicts = ["CORRECT", "PARTIALLY CORRECT", "INCORRECT"]
+        return json.dumps([
+            {
+                "item": i,
+                "verdict": verdicts[_stable_hash(answer) % 3],
+                "score": [10, 5, 0][_stable_hash(answer) % 3],
+                "correct_answer": "Stub correct answer",
+                "feedback": "Stub feedback",
+                "key_concepts": "Stub concepts"
+            }
+            for i, answer in enumerate(answers, start=1)
+        ])
+    if "ANSWER EVALUATION REQUEST" in prompt:
+        answer = prompt.split("STUDENT'S ANSWER:", 1)[-1].split("TASK:", 1)[0]
+        verdict = ["CORRECT", "PARTIALLY CORRECT", "INCORRECT"][_stable_hash(answer) % 3]
+        return (f"VERDICT: {verdict}\nSCORE: 5/10 points\nCORRECT ANSWER: Stub correct answer\n"
+                f"FEEDBACK: Stub feedback\nKEY CONCEPTS: Stub concepts")
+    if "QUESTION GENERATION REQUEST" in prompt:
+        topic = re.search(r"Topic: (.*)", prompt)
+        difficulty = re.search(r"Difficulty Level: (.*)", prompt)
+        topic = topic.group(1) if topic else "the topic"
+        difficulty = difficulty.group(1) if difficulty else "medium"
+        return (f"QUESTION: Explain one key idea of {topic}.\nTYPE: Conceptual\n"
+                f"DIFFICULTY: {difficulty}\n" + _STUB_HINTS)
+    if "User Input:" in prompt and "intent" in prompt:
+        user_input = prompt.rsplit("User Input:", 1)[-1].split("\n\n", 1)[0].strip()
+        lowered = user_input.lower()
+        days = re.search(r"(\d+)\s*days?", lowered)
+        topics = re.search(r"\b(?:on|covering|about)\s+(.+)$", user_input, re.I)
+        subject = re.search(r"\b(?:a|an|my)\s+(.+?)\s+(?:exam|final|test)\b", user_input, re.I)
+        if any(w in lowered for w in ("quiz", "test me", "practice", "question")):
+            intent = "QUIZZER"
+        elif any(w in lowered for w in ("exam", "plan", "prepare", "schedule")):
+            intent = "PLANNER"
+        else:
+            intent = "MANAGER"
+        return json.dumps({
+            "intent": intent,
+            "user_message": "Stub manager reply.",
+            "extracted_info": {
+                "subject": (subject.group(1) if subject
+                            else topics.group(1).split(" and ")[0] if topics else ""),
+                "topics": [t.strip() for t in re.split(r",| and ", topics.group(1))] if topics else [],
+                "days_available": int(days.group(1)) if days else None,
+                "exam_date": None,
+                "additional_context": ""
+            }
+        })
+    if "FIXED SCHEDULE" in prompt:
+        days = re.findall(r"^Day (\d+):", prompt, re.M)
+        return "\n".join(f"Day {d}: Stub plan for this day." for d in days) or "Stub plan."
+    if "hint" in prompt.lower():
+        return _STUB_HINTS
+    return "Stub response."
+
+
+class StubBackend(ModelBackend):
+    """
+    Local stand-in for a model with configurable latency and throughput
+
+    Sleeps latency + output_tokens / tokens_per_second per call and counts
+    calls and tokens, so tools can run and be measured offline. Streams
+    sleep the latency before the first chunk, then the output time of each
+    chunk before yielding it.
+    """
+
+    stream_chunk_chars = 16
+
+    def __init__(self, responder: Callable[[str], str] = default_stub_responder,
+                 latency: float = STUB_LATENCY_SECONDS,
+                 tokens_per_second: Optional[float] = STUB_TOKENS_PER_SECOND):
+        self.responder = responder
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        text = self.responder(prompt)
+        usage = UsageMetadata(estimate_tokens(prompt), estimate_tokens(text))
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += usage.candidates_token_count / self.tokens_per_second
+        if delay > 0:
+            time.sleep(delay)
+        self._count(usage)
+        return BackendResponse(text, usage)
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        text = self.responder(prompt)
+        self._count(UsageMetadata(estimate_tokens(prompt), estimate_tokens(text)))
+        if self.latency > 0:
+            time.sleep(self.latency)
+        for start in range(0, len(text), self.stream_chunk_chars):
+            chunk = text[start:start + self.stream_chunk_chars]
+            if self.tokens_per_second:
+                time.sleep(len(chunk) / 4 / self.tokens_per_second)
+            yield chunk
+
+    def _count(self, usage: UsageMetadata):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage.prompt_token_count
+            self.output_tokens += usage.candidates_token_count
+
+
+def request_key(model_name: str, prompt: str, generation_config: Optional[Dict]) -> str:
+    """Cassette key for a call: hash of model, prompt and generation config"""
+    payload = json.dumps([model_name, prompt, generation_config or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class _CassetteWriter:
+    """Append-only gzip JSONL writer shared by every backend recording to one path"""
+
+    _writers: Dict[str, "_CassetteWriter"] = {}
+    _writers_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Appending adds a new gzip member; gzip readers handle multi-member files
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: str) -> "_CassetteWriter":
+        with cls._writers_lock:
+            if path not in cls._writers:
+                cls._writers[path] = cls(path)
+                atexit.register(cls._writers[path].close)
+            return cls._writers[path]
+
+    def write(self, record: Dict):
+        with self._lock:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingBackend(ModelBackend):
+    """
+    Passes calls through to another backend and records each exchange
+
+    Cassette records are compact: the request is stored as a hash key plus
+    the generation config; the response text, latency and token usage are
+    stored in full.
+    """
+
+    def __init__(self, inner: ModelBackend, model_name: str, path: str = CASSETTE_PATH):
+        self.inner = inner
+        self.model_name = model_name
+        self._writer = _CassetteWriter.for_path(path)
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        start = time.perf_counter()
+        response = self.inner.generate_content(prompt, generation_config=generation_config,
+                                               **kwargs)
+        latency = time.perf_counter() - start
+        usage = getattr(response, "usage_metadata", None)
+        self._writer.write({
+            "k": request_key(self.model_name, prompt, generation_config),
+            "m": self.model_name,
+            "t": response.text,
+            "l": round(latency, 4),
+            "u": [getattr(usage, "prompt_token_count", estimate_tokens(prompt)),
+                  getattr(usage, "candidates_token_count", estimate_tokens(response.text))],
+        })
+        return response
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        # Recorded whole once the stream ends; replays serve it as one chunk
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self.inner.stream_content(prompt, generation_config=generation_config):
+            chunks.append(chunk)
+            yield chunk
+        text = "".join(chunks)
+        self._writer.write({
+            "k": request_key(self.model_name, prompt, generation_config),
+            "m": self.model_name,
+            "t": text,
+            "l": round(time.perf_counter() - start, 4),
+            "u": [estimate_tokens(prompt), estimate_tokens(text)],
+        })
+
+
+class ReplayBackend(ModelBackend):
+    """
+    Serves calls from a cassette without touching the network
+
+    Args:
+        model_name: Model the agent would have called (part of the key)
+        path: Cassette file written by RecordingBackend
+        latency: "recorded" replays each call's latency, "synthetic" samples a
+            log-normal fitted to all recorded latencies, "none" returns at once
+        speed: Divides every latency (2.0 replays twice as fast)
+        strict: Raise on requests missing from the cassette instead of
+            answering them with the stub responder
+        seed: Seed for synthetic latencies, for reproducible load tests
+
+    Repeated identical requests cycle through their recorded responses in order.
+    """
+
+    _cassettes: Dict[str, Dict[str, List[Dict]]] = {}
+    _cassettes_lock = threading.Lock()
+
+    def __init__(self, model_name: str, path: str = CASSETTE_PATH,
+                 latency: str = REPLAY_LATENCY, speed: float = 1.0,
+                 strict: bool = True, seed: int = 0):
+        self.model_name = model_name
+        self.latency = latency
+        self.speed = speed
+        self.strict = strict
+        self._records = self._load(path)
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.misses = 0
+
+        logs = [math.log(r["l"]) for rs in self._records.values() for r in rs if r["l"] > 0]
+        self._log_mean = sum(logs) / len(logs) if logs else 0.0
+        self._log_std = (math.sqrt(sum((x - self._log_mean) ** 2 for x in logs) / len(logs))
+                         if logs else 0.0)
+        self._has_latencies = bool(logs)  # a log-mean of 0 is a 1 s geometric mean, not "none"
+
+    @classmethod
+    def _load(cls, path: str) -> Dict[str, List[Dict]]:
+        with cls._cassettes_lock:
+            if path not in cls._cassettes:
+                records: Dict[str, List[Dict]] = {}
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    try:
+                        for line in f:
+                            if line.strip():
+                                record = json.loads(line)
+                                records.setdefault(record["k"], []).append(record)
+                    except (EOFError, zlib.error, json.JSONDecodeError):
+                        # A recorder that is still open or crashed leaves an
+                        # unterminated gzip member; every flushed record is usable
+                        pass
+                cls._cassettes[path] = records
+            return cls._cassettes[path]
+
+    def _delay(self, record: Optional[Dict]) -> float:
+        if self.latency == "recorded" and record:
+            return record["l"] / self.speed
+        if self.latency == "synthetic" and self._has_latencies:
+            with self._lock:
+                return math.exp(self._random.gauss(self._log_mean, self._log_std)) / self.speed
+        return 0.0
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        key = request_key(self.model_name, prompt, generation_config)
+        recorded = self._records.get(key)
+        with self._lock:
+            self.calls += 1
+            record = None
+            if recorded:
+                position = self._positions.get(key, 0)
+                record = recorded[position % len(recorded)]
+                self._positions[key] = position + 1
+            else:
+                self.misses += 1
+
+        if record is None:
+            if self.strict:
+                raise KeyError(f"Request {key} for {self.model_name} is not in the cassette")
+            text = default_stub_responder(prompt)
+            usage = UsageMetadata(estimate_tokens(prompt), estimate_tokens(text))
+        else:
+            text = record["t"]
+            usage = UsageMetadata(*record["u"])
+
+        delay = self._delay(record)
+        if delay > 0:
+            time.sleep(delay)
+        return BackendResponse(text, usage)
+
+
+# Process-wide, so agents with separate backends for the same model coalesce too
+_deterministic_flights = SingleFlight("singleflight.deterministic")
+_creative_flights = SingleFlight("singleflight.creative", SINGLEFLIGHT_CREATIVE_MAX_WAITERS)
+
+
+class CoalescingBackend(ModelBackend):
+    """
+    Shares one upstream call among concurrent identical requests
+
+    Requests are identical when model, prompt and generation config match
+    (request_key). Low-temperature calls (grading, routing) would give every
+    caller the same answer anyway, so any number of callers share one.
+    Sampled calls (questions, tips, plans) are shared by at most
+    SINGLEFLIGHT_CREATIVE_MAX_WAITERS extra callers, which keeps some
+    variety within a class that starts together.
+    """
+
+    def __init__(self, inner: ModelBackend, model_name: str):
+        self.inner = inner
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        if kwargs:
+            # Streaming and other options are not safe to share
+            return self.inner.generate_content(prompt, generation_config=generation_config, **kwargs)
+        temperature = (generation_config or {}).get("temperature", 1.0)
+        flights = (_deterministic_flights if temperature <= SINGLEFLIGHT_DETERMINISTIC_MAX_TEMPERATURE
+                   else _creative_flights)
+        # Callers only share within a priority class, so an interactive caller
+        # never waits on a speculative call that may be preempted (the tokens
+        # are charged to the tenant of the caller that made the call)
+        response, _ = flights.do(
+            (current_priority().name, request_key(self.model_name, prompt, generation_config)),
+            lambda: self.inner.generate_content(prompt, generation_config=generation_config))
+        return response
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        # A stream is consumed by one caller as it arrives, so it is never shared
+        return self.inner.stream_content(prompt, generation_config=generation_config)
+
+
+def coalesce(backend: ModelBackend, model_name: str) -> ModelBackend:
+    """backend behind a CoalescingBackend, unless SINGLEFLIGHT_ENABLED is off"""
+    return CoalescingBackend(backend, model_name) if SINGLEFLIGHT_ENABLED else backend
+
+
+class ScheduledBackend(ModelBackend):
+    """
+    Admits every call through the process-wide CallScheduler
+
+    Calls run in the caller's priority class, and their token usage is
+    charged to the caller's tenant.
+    """
+
+    def __init__(self, inner: ModelBackend):
+        self.inner = inner
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None,
+                         **kwargs):
+        scheduler = get_call_scheduler()
+        with scheduler.slot() as (_, tenant):
+            response = self.inner.generate_content(prompt, generation_config=generation_config,
+                                                   **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        scheduler.ledger.record(
+            tenant,
+            getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt),
+            getattr(usage, "candidates_token_count", None) or estimate_tokens(response.text))
+        return response
+
+    def stream_content(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        # The slot is held until the stream is exhausted or closed
+        scheduler = get_call_scheduler()
+        output = 0
+        with scheduler.slot() as (_, tenant):
+            try:
+                for chunk in self.inner.stream_content(prompt, generation_config=generation_config):
+                    output += len(chunk)
+                    yield chunk
+            finally:
+                scheduler.ledger.record(tenant, estimate_tokens(prompt), max(1, output // 4))
+
+
+def shared_backend(backend: ModelBackend, model_name: str) -> ModelBackend:
+    """
+    backend as agents serving many learners use it
+
+    Calls are scheduled by priority class, and concurrent identical calls
+    coalesce before they take a slot.
+    """
+    return coalesce(ScheduledBackend(backend), model_name)
+
+
+def create_backend(model_name: str) -> ModelBackend:
+    """
+    Build the backend selected by MODEL_BACKEND
+
+    "gemini" calls the API, "stub" answers locally, "record" calls Gemini and
+    writes every exchange to CASSETTE_PATH, "replay" serves from that cassette.
+    Live backends are scheduled by priority and coalesce concurrent identical
+    requests (see shared_backend).
+    """
+    if MODEL_BACKEND == "stub":
+        return shared_backend(StubBackend(), model_name)
+    if MODEL_BACKEND == "gemini":
+        return shared_backend(GeminiBackend(model_name), model_name)
+    if MODEL_BACKEND == "record":
+        return shared_backend(RecordingBackend(GeminiBackend(model_name), model_name), model_name)
+    if MODEL_BACKEND == "replay":
+        # Replays stay one-to-one with the cassette's recorded calls
+        return ReplayBackend(model_name)
+    raise ValueError(f"Unknown model backend: {MODEL_BACKEND}")
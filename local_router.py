@@ -0,0 +1,232 @@
+"""
+Local Intent Router for EduQuest
+Cheap keyword prediction of ManagerAgent's routing, used to start specialist work early
+
+predict_route() guesses the intent and a provisional extracted_info from
+cue words, "N days/weeks" and the offline curriculum, in microseconds and
+without a model call. When it is confident, EduQuest either asks the
+manager to route and do the first specialist task in one call (a
+FusedPayload), or starts the planner call (or the first quiz question) as a
+Speculation running alongside ManagerAgent.analyze_intent. Either way the
+result is kept only if the manager's routing leads to the same request.
+"""
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from call_scheduler import SPECULATIVE, carry_context, with_priority
+from config import SPECULATION_MAX_WORKERS
+from curriculum import canonical_name, get_curriculum_index
+from metrics import metrics
+
+_QUIZ_CUES = re.compile(r"\b(quiz|test me|test my|practi[cs]e|ask me|drill me)\b")
+_PLAN_CUES = re.compile(r"\b(exams?|finals?|midterms?|study plan|schedule|prepare|preparing|revise|revision)\b")
+_SPAN = re.compile(r"\b(\d{1,3})\s*(days?|weeks?)\b")
+_TOPIC_PHRASE = re.compile(r"\b(?:covering|on|about|including)\s+(.+?)\s*[.!?]?$", re.I)
+_TOPIC_SPLIT = re.compile(r"\s*(?:,|\band\b|&)\s*", re.I)
+_TOPIC_TAIL = re.compile(r"\s+(?:for|before|by)\s+(?:my|the|an?|next)\b.*$", re.I)
+
+
+@dataclass(frozen=True)
+class RoutePrediction:
+    """A guess at ManagerAgent's routing; info has the same shape as its extracted_info"""
+    intent: str
+    confidence: float
+    info: Dict = field(default_factory=dict)
+
+
+def _subject_pattern() -> Optional[re.Pattern]:
+    index = get_curriculum_index()
+    if index is None or not len(index):
+        return None
+    keys = sorted(index.keys(), key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(k) for k in keys) + r")\b")
+
+
+_subjects: Optional[re.Pattern] = None
+_subjects_loaded = False
+_subjects_lock = threading.Lock()
+
+
+def _find_subject(text: str) -> str:
+    """Curriculum subject named in text, "" if none"""
+    global _subjects, _subjects_loaded
+    if not _subjects_loaded:
+        with _subjects_lock:
+            if not _subjects_loaded:
+                _subjects = _subject_pattern()
+                _subjects_loaded = True
+    match = _subjects.search(canonical_name(text)) if _subjects else None
+    if not match:
+        return ""
+    entry = get_curriculum_index().lookup(match.group(1))
+    return entry.subject if entry else ""
+
+
+def _extract_topics(text: str, subject: str) -> List[str]:
+    match = _TOPIC_PHRASE.search(text)
+    if not match:
+        return []
+    # Topics keep the learner's wording ("Python decorators"), as the manager tends to
+    topics = []
+    for part in _TOPIC_SPLIT.split(_TOPIC_TAIL.sub("", match.group(1))):
+        name = part.strip(" .!?")
+        if name and canonical_name(name) != canonical_name(subject):
+            topics.append(name)
+    return topics
+
+
+def predict_route(text: str) -> RoutePrediction:
+    """
+    Guess how ManagerAgent will route text
+
+    Confidence is high only for unambiguous messages: a practice cue without
+    an exam timeline (QUIZZER), or an exam cue with a timeline (PLANNER).
+    """
+    lowered = text.lower()
+    quiz = bool(_QUIZ_CUES.search(lowered))
+    plan = bool(_PLAN_CUES.search(lowered))
+    span = _SPAN.search(lowered)
+    days = None
+    if span:
+        days = int(span.group(1)) * (7 if span.group(2).startswith("week") else 1)
+
+    subject = _find_subject(text)
+    info = {"subject": subject, "topics": _extract_topics(text, subject),
+            "days_available": days, "exam_date": None, "additional_context": ""}
+
+    if quiz and not days:
+        return RoutePrediction("QUIZZER", 0.9 if not plan else 0.7, info)
+    if plan and days and not quiz:
+        return RoutePrediction("PLANNER", 0.95 if subject else 0.85, info)
+    if plan or quiz:
+        return RoutePrediction("PLANNER" if plan else "QUIZZER", 0.5, info)
+    return RoutePrediction("MANAGER", 0.5, info)
+
+
+def _subject_key(subject: Optional[str]) -> str:
+    """Curriculum subject for a name or alias ("python" and "Python Programming" agree)"""
+    index = get_curriculum_index()
+    entry = index.lookup(subject) if index and subject else None
+    return canonical_name(entry.subject if entry else subject or "")
+
+
+def _topic_order(topics: Optional[List[str]]) -> List[str]:
+    return list(dict.fromkeys(canonical_name(t) for t in topics or [] if t.strip()))
+
+
+def same_request(a: Dict, b: Dict) -> bool:
+    """
+    Whether two call requests are equivalent
+
+    Names are compared canonically. Topics are compared in order (duplicates
+    dropped), since the order can shape a plan's schedule.
+    """
+    if a.keys() != b.keys():
+        return False
+    for key, value in a.items():
+        other = b[key]
+        if key == "subject":
+            if _subject_key(value) != _subject_key(other):
+                return False
+        elif key == "topic":
+            if canonical_name(value or "") != canonical_name(other or ""):
+                return False
+        elif key == "topics":
+            if _topic_order(value) != _topic_order(other):
+                return False
+        elif value != other:
+            return False
+    return True
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class Speculation:
+    """A specialist call started before the routing decision it depends on"""
+
+    label = "speculation"
+    wasted = "wasted_calls"
+
+    def __init__(self, intent: str, request: Dict, call: Callable[..., Any], **kwargs):
+        """
+        Args:
+            intent: Routing the result is only valid for
+            request: What the result depends on, compared with same_request()
+            call: The specialist call, run in the shared speculation pool
+        """
+        self.intent = intent
+        self.request = request
+        self.pending = True
+        self._start(call, kwargs)
+        self._count("started")
+        self._count(f"started.{intent.lower()}")
+
+    def _start(self, call: Callable[..., Any], kwargs: Dict):
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SPECULATION_MAX_WORKERS,
+                                               thread_name_prefix="speculation")
+        self._future: Future = _executor.submit(carry_context(with_priority), SPECULATIVE, call, **kwargs)
+
+    def _result(self) -> Any:
+        return self._future.result()
+
+    def _cancel(self) -> bool:
+        return self._future.cancel()
+
+    def take(self, intent: str, request: Dict) -> Optional[Any]:
+        """The speculative result if it was made for this intent and request, else None"""
+        if not self.pending or intent != self.intent or not same_request(request, self.request):
+            return None
+        self.pending = False
+        try:
+            result = self._result()
+        except Exception:
+            self._count("errors")
+            return None
+        if isinstance(result, dict) and result.get("success") is False:
+            # Agents report failures (a preempted call, say) in the result; the turn redoes them
+            self._count("errors")
+            return None
+        self._count("hits")
+        return result
+
+    def discard(self):
+        """Drop an unused speculation; a call that already started still runs to completion"""
+        if not self.pending:
+            return
+        self.pending = False
+        self._count("misses")
+        if not self._cancel():
+            self._count(self.wasted)
+
+    def _count(self, name: str):
+        metrics.increment(f"{self.label}.{name}")
+
+
+class FusedPayload(Speculation):
+    """
+    Specialist output that came back with the routing decision
+
+    The payload is already paid for, so nothing runs in the background; the
+    call only turns it into the specialist's result (parsing a question,
+    caching a plan) once the request is confirmed.
+    """
+
+    label = "fused"
+    wasted = "wasted_payloads"
+
+    def _start(self, call: Callable[..., Any], kwargs: Dict):
+        self._call = lambda: call(**kwargs)
+
+    def _result(self) -> Any:
+        return self._call()
+
+    def _cancel(self) -> bool:
+        return False
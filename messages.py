@@ -0,0 +1,44 @@
+"""
+User-Facing Messages for EduQuest
+Static text the CLI can show before any agent or model SDK is loaded
+"""
+
+WELCOME_MESSAGE = """
+╔═══════════════════════════════════════════════════════════╗
+║              Welcome to EduQuest!                         ║
+╚═══════════════════════════════════════════════════════════╝
+
+Hi! I'm your AI tutor designed to help u ace ur exams.
+
+I can help you:
+  - Create structured study plans based on your timeline
+  - Quiz you on specific topics with real-time feedback
+  - Track your progress and identify weak areas
+
+Examples of what you can say:
+  • "I have a Java exam in 3 days covering OOPs and Threads"
+  • "Help me prepare for my Data Structures final"
+  • "Quiz me on Python decorators and generators"
+  • "I want to practice Algorithms"
+
+What would you like to do today?
+"""
+
+HELP_MESSAGE = """
+EduQuest Help
+
+CREATING STUDY PLANS:
+  Tell me about your exam, subject, topics, and timeline.
+  Example: "I have a Database exam in 5 days on SQL, Normalization, and Transactions"
+
+TAKING QUIZZES:
+  Ask to be quizzed on specific topics.
+  Example: "Quiz me on Java OOPs concepts"
+
+TIPS:
+  • Be specific about topics and timeframes
+  • You can switch between planning and quizzing anytime
+  • Type 'exit' or 'quit' to end the session
+
+What would you like help with?
+"""
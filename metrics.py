@@ -0,0 +1,64 @@
+"""
+Metrics for EduQuest
+Process-wide counters, gauges and timing summaries
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe registry of named counters, gauges and observations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._observations: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Record one observation (e.g. a wait time) into a count/sum/max summary"""
+        with self._lock:
+            summary = self._observations.get(name)
+            if summary is None:
+                self._observations[name] = {"count": 1, "sum": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str) -> float:
+        """Current value of a counter or gauge (0 if unset)"""
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict:
+        """Copy of all metrics"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "observations": {k: dict(v) for k, v in self._observations.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._observations.clear()
+
+
+# Global metrics instance
+metrics = Metrics()
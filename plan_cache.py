@@ -0,0 +1,132 @@
+"""
+Study Plan Template Cache for EduQuest
+Date-relative plans ("Day 1..Day N") shared across learners with the same request
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import PLAN_TEMPLATE_TTL_SECONDS, PLAN_TEMPLATE_MAX_ENTRIES
+from curriculum import canonical_name
+
+PlanKey = Tuple[str, Tuple[str, ...], int, float, str, Tuple[Tuple[str, int], ...]]
+
+_DAY_PATTERN = re.compile(r"\bDay (\d+)\b")
+
+
+def make_plan_key(subject: str, topics: List[str], days_available: int,
+                  hours_per_day: float, additional_context: str = "",
+                  due_reviews: Sequence[Tuple[str, int]] = ()) -> PlanKey:
+    """
+    Cohort key: canonical subject and topics, horizon, hours per day, context and due reviews
+
+    Topics keep their order (duplicates dropped): the scheduler follows it
+    for subjects outside the curriculum, so it shapes the plan.
+    """
+    return (
+        canonical_name(subject or ""),
+        tuple(dict.fromkeys(canonical_name(t) for t in topics if t.strip())),
+        int(days_available),
+        float(hours_per_day),
+        canonical_name(additional_context or ""),
+        tuple(sorted((canonical_name(t), int(day)) for t, day in due_reviews)),
+    )
+
+
+def render_plan(template: str, start_date: datetime, exam_date_str: str) -> str:
+    """
+    Apply concrete dates to a date-relative plan
+
+    The first mention of each "Day N" gets its calendar date; the exam date is
+    added as a header line.
+    """
+    seen = set()
+
+    def add_date(match: re.Match) -> str:
+        day = int(match.group(1))
+        if day in seen or day < 1:
+            return match.group(0)
+        seen.add(day)
+        date = start_date + timedelta(days=day - 1)
+        return f"{match.group(0)} ({date.strftime('%B %d, %Y')})"
+
+    return f"Exam Date: {exam_date_str}\n\n" + _DAY_PATTERN.sub(add_date, template)
+
+
+class PlanTemplateCache:
+    """
+    Thread-safe LRU cache of date-relative plan templates with a TTL
+
+    Concurrent requests for the same key wait for a single generation instead
+    of each calling the model.
+    """
+
+    def __init__(self, max_entries: int = PLAN_TEMPLATE_MAX_ENTRIES,
+                 ttl_seconds: float = PLAN_TEMPLATE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[PlanKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[PlanKey, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PlanKey) -> Optional[str]:
+        """Return a fresh template for the key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, template = entry
+            if time.monotonic() - created > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return template
+
+    def put(self, key: PlanKey, template: str):
+        """Store a template, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), template)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key: PlanKey, factory: Callable[[], str]) -> Tuple[str, bool]:
+        """
+        Return (template, cached), generating it with factory on a miss
+
+        Exceptions from factory propagate and nothing is cached.
+        """
+        template = self.get(key)
+        if template is not None:
+            self.hits += 1
+            return template, True
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another learner in the cohort may have generated it meanwhile
+            template = self.get(key)
+            if template is not None:
+                self.hits += 1
+                return template, True
+            self.misses += 1
+            try:
+                template = factory()
+                self.put(key, template)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return template, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide cache shared by all planner instances
+plan_templates = PlanTemplateCache()
@@ -0,0 +1,439 @@
+"""
+HTTP Server for EduQuest
+Serves many learners from one process, each with their own session
+
+Endpoints (JSON in, JSON out):
+    POST   /sessions             {"learner_id": "...", "tenant": "..."} (both optional)
+                                 -> {"session_id": ...}
+    POST   /sessions/<id>/turn   {"input": "...", "prefilled": {"days": "5", ...}}
+                                 -> {"output": "...", "intent": ..., "mode": ..., "active": ...}
+    DELETE /sessions/<id>        drop a session
+    GET    /stats                session count, peak RSS and metrics
+    GET    /tenants              live token accounting and shares per tenant
+
+Used by server_cluster.py to run this server as one of several workers, and
+only served to requests whose X-EduQuest-Cluster-Token header matches
+EDUQUEST_CLUSTER_TOKEN (disabled when that is not set):
+    GET    /sessions             -> {"sessions": [ids held in memory or the store]}
+    POST   /sessions             {"session_id": "..."} creates the session under that id
+    POST   /sessions/<id>/handoff  -> {"state": base64}; the session leaves this worker
+    POST   /sessions/<id>/adopt  {"state": base64} takes over a handed-off session
+
+Session ids are 32 hex digits, or 12 and 32 joined by "-" as the dispatcher
+mints them (they name files in the session store); others are not found.
+
+With --session-dir (or EDUQUEST_SESSION_DIR) every session is logged to a
+session_store.SessionStore, so sessions survive restarts and idle eviction.
+
+Follow-up prompts (days, topics, number of questions, ...) are answered from
+the turn's "prefilled" fields, as in the batch runner. Agents are shared;
+turns for one session are serialized. A session's model calls are charged
+to its tenant (a school, say), which gets a fair share of the model quota.
+
+Usage:
+    python server.py --port 8080
+    python server.py --stub --stub-latency 0.2
+    python server.py --session-dir var/sessions
+"""
+import argparse
+import base64
+import hmac
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from config import (
+    SERVER_HOST, SERVER_PORT, SESSION_IDLE_TIMEOUT_SECONDS, SESSION_COMPACT_AFTER_SECONDS,
+    SESSION_STORE_DIR, CLUSTER_TOKEN
+)
+from call_scheduler import get_call_scheduler
+from metrics import metrics
+from session_state import SessionState
+from tenant_budget import get_tenant_ledger, tenant_context
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+_SESSION_ID = re.compile(r"[0-9a-f]{32}|[0-9a-f]{12}-[0-9a-f]{32}")
+
+
+def valid_session_id(session_id: str) -> bool:
+    """Whether session_id has the form of an id this server or a dispatcher issues"""
+    return bool(_SESSION_ID.fullmatch(session_id))
+
+
+class SessionExists(ValueError):
+    """A session with the requested id already exists"""
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, if the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _forget_learner(learner_id: str):
+    """
+    Drop this process's review memory and ability estimate of a learner
+
+    While the learner was served elsewhere their answers went to the shared
+    history only, so both are rebuilt from it on next use.
+    """
+    from analytics import get_quiz_history
+    from irt import get_ability_model
+    from spaced_repetition import get_review_scheduler
+
+    history = get_quiz_history()
+    get_review_scheduler(history).forget(learner_id)
+    get_ability_model(history).forget(learner_id)
+
+
+class LearnerSession:
+    """One learner's EduQuest instance plus the buffers used to drive it over HTTP"""
+
+    def __init__(self, manager, planner, quizzer, state: Optional[SessionState] = None):
+        from eduquest import EduQuest
+
+        self.state = state or SessionState()
+        self.prefilled: Dict[str, str] = {}
+        self.output: List[str] = []
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.app = EduQuest(manager, planner, quizzer, state=self.state,
+                            ask=lambda field, prompt: self.prefilled.get(field, ""),
+                            output=lambda text="": self.output.append(_ANSI.sub("", str(text))))
+
+    def turn(self, user_input: str, prefilled: Optional[Dict[str, str]] = None) -> Dict:
+        """Run one turn and return its output"""
+        with self.lock:
+            self.prefilled = {k: str(v) for k, v in (prefilled or {}).items()}
+            self.output = []
+            start = time.perf_counter()
+            with tenant_context(self.state.tenant):
+                active = self.app.handle_input(user_input)
+            self.last_used = time.monotonic()
+            return {
+                "output": "\n".join(self.output),
+                "intent": self.app.last_intent,
+                "mode": self.state.current_mode,
+                "active": active,
+                "seconds": round(time.perf_counter() - start, 4),
+            }
+
+
+class SessionRegistry:
+    """Thread-safe map of session id to LearnerSession with idle compaction and eviction"""
+
+    def __init__(self, manager=None, planner=None, quizzer=None,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT_SECONDS, store=None):
+        """
+        Args:
+            manager, planner, quizzer: Shared agent instances (created if omitted)
+            idle_timeout: Seconds after which an unused session is dropped from memory
+            store: Optional SessionStore; evicted or pre-restart sessions are restored from it
+        """
+        from agents.manager_agent import ManagerAgent
+        from agents.planner_agent import PlannerAgent
+        from agents.quiz_agent import QuizAgent
+
+        self.manager = manager or ManagerAgent()
+        self.planner = planner or PlannerAgent()
+        self.quizzer = quizzer or QuizAgent()
+        self.idle_timeout = idle_timeout
+        self.store = store
+        self._sessions: Dict[str, LearnerSession] = {}
+        self._lock = threading.Lock()
+
+    def create(self, learner_id: Optional[str] = None, tenant: Optional[str] = None,
+               session_id: Optional[str] = None) -> str:
+        """
+        Start a new session
+
+        Args:
+            session_id: Id to use (a cluster dispatcher picks ids so it can
+                route them); a fresh random id if omitted
+
+        Raises:
+            ValueError: session_id is not a valid id
+            SessionExists: session_id is already taken
+        """
+        if session_id is not None and not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        if session_id is not None and self.get(session_id) is not None:
+            raise SessionExists(f"Session {session_id} already exists")
+        session_id = session_id or uuid.uuid4().hex
+        self._add(session_id, LearnerSession(self.manager, self.planner, self.quizzer,
+                                             SessionState(learner_id or session_id, tenant)))
+        return session_id
+
+    def _add(self, session_id: str, learner: LearnerSession):
+        if self.store is not None:
+            self.store.track(session_id, learner.state)
+        with self._lock:
+            self._evict_idle()
+            self._sessions[session_id] = learner
+            metrics.set_gauge("server.sessions", len(self._sessions))
+
+    def session_ids(self) -> List[str]:
+        """Every session this server can serve, in memory or restorable from the store"""
+        with self._lock:
+            ids = set(self._sessions)
+        if self.store is not None:
+            ids.update(self.store.session_ids())
+        return sorted(ids)
+
+    def hand_off(self, session_id: str) -> Optional[bytes]:
+        """
+        Export a session for another server and forget it here
+
+        Waits for a turn in progress to finish. Returns None if the session is unknown.
+        """
+        from session_store import export_session
+
+        learner = self.get(session_id)
+        if learner is None:
+            return None
+        with learner.lock:
+            data = export_session(session_id, learner.state)
+            self.drop(session_id)
+        metrics.increment("server.sessions_handed_off")
+        return data
+
+    def adopt(self, session_id: str, data: bytes):
+        """
+        Take over a session exported by hand_off() on another server
+
+        Raises:
+            ValueError: session_id is not a valid id, or data is not a session
+        """
+        from session_store import import_session
+
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        state = import_session(data)
+        _forget_learner(state.learner_id)
+        self._add(session_id, LearnerSession(self.manager, self.planner, self.quizzer, state))
+        metrics.increment("server.sessions_adopted")
+
+    def get(self, session_id: str) -> Optional[LearnerSession]:
+        with self._lock:
+            learner = self._sessions.get(session_id)
+        if learner is not None or self.store is None:
+            return learner
+
+        state = self.store.restore(session_id)
+        if state is None:
+            return None
+        with self._lock:
+            # Another request may have restored it meanwhile; keep the first
+            learner = self._sessions.setdefault(
+                session_id, LearnerSession(self.manager, self.planner, self.quizzer, state))
+            metrics.set_gauge("server.sessions", len(self._sessions))
+        metrics.increment("server.sessions_restored")
+        return learner
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            removed = self._sessions.pop(session_id, None) is not None
+            metrics.set_gauge("server.sessions", len(self._sessions))
+        if self.store is not None and session_id in self.store:
+            self.store.delete(session_id)
+            removed = True
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        cutoff = now - self.idle_timeout
+        for session_id in [k for k, v in self._sessions.items() if v.last_used < cutoff]:
+            del self._sessions[session_id]
+            metrics.increment("server.sessions_evicted")
+        for learner in self._sessions.values():
+            # Skip sessions mid-turn rather than wait on them under the registry lock
+            if learner.last_used < now - SESSION_COMPACT_AFTER_SECONDS and learner.lock.acquire(False):
+                try:
+                    learner.state.compact()
+                finally:
+                    learner.lock.release()
+
+
+class EduQuestHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's SessionRegistry"""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def registry(self) -> SessionRegistry:
+        return self.server.registry
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet under load
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _session_path(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) >= 2 and parts[0] == "sessions" and valid_session_id(parts[1]):
+            return parts[1], parts[2:]
+        return None, parts
+
+    def _from_dispatcher(self) -> bool:
+        """Whether the request carries this worker's cluster token"""
+        token = self.headers.get("X-EduQuest-Cluster-Token")
+        return bool(CLUSTER_TOKEN and token) and hmac.compare_digest(token, CLUSTER_TOKEN)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, {"sessions": len(self.registry),
+                             "peak_rss_bytes": peak_rss_bytes(),
+                             "metrics": metrics.snapshot()})
+        elif self.path == "/tenants":
+            self._send(200, {"tenants": get_tenant_ledger().snapshot(),
+                             "scheduler": get_call_scheduler().stats()})
+        elif self.path.rstrip("/") == "/sessions" and self._from_dispatcher():
+            self._send(200, {"sessions": self.registry.session_ids()})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send(400, {"error": "invalid JSON"})
+            return
+
+        if self.path.rstrip("/") == "/sessions":
+            if body.get("session_id") is not None and not self._from_dispatcher():
+                self._send(403, {"error": "session ids are chosen by the server"})
+                return
+            try:
+                session_id = self.registry.create(body.get("learner_id"), body.get("tenant"),
+                                                  body.get("session_id"))
+            except SessionExists as e:
+                self._send(409, {"error": str(e)})
+                return
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(201, {"session_id": session_id})
+            return
+
+        session_id, rest = self._session_path()
+        if rest in (["handoff"], ["adopt"]) and not self._from_dispatcher():
+            self._send(404, {"error": "not found"})
+            return
+        if session_id is not None and rest == ["handoff"]:
+            data = self.registry.hand_off(session_id)
+            if data is None:
+                self._send(404, {"error": "unknown session"})
+            else:
+                self._send(200, {"state": base64.b64encode(data).decode("ascii")})
+            return
+        if session_id is not None and rest == ["adopt"]:
+            try:
+                self.registry.adopt(session_id, base64.b64decode(body["state"]))
+            except (KeyError, ValueError) as e:
+                self._send(400, {"error": f"invalid session state: {e}"})
+                return
+            self._send(201, {"session_id": session_id})
+            return
+        if session_id is None or rest != ["turn"]:
+            self._send(404, {"error": "not found"})
+            return
+        learner = self.registry.get(session_id)
+        if learner is None:
+            self._send(404, {"error": "unknown session"})
+            return
+        try:
+            result = learner.turn(str(body.get("input", "")), body.get("prefilled"))
+        except Exception as e:
+            metrics.increment("server.turn_errors")
+            self._send(500, {"error": str(e)})
+            return
+        metrics.increment("server.turns")
+        metrics.observe("server.turn_seconds", result["seconds"])
+        self._send(200, result)
+
+    def do_DELETE(self):
+        session_id, rest = self._session_path()
+        if session_id is not None and not rest and self.registry.drop(session_id):
+            self._send(200, {"deleted": session_id})
+        else:
+            self._send(404, {"error": "unknown session"})
+
+
+def create_server(host: str = SERVER_HOST, port: int = SERVER_PORT,
+                  registry: Optional[SessionRegistry] = None) -> ThreadingHTTPServer:
+    """Build (but do not start) a threaded HTTP server around a session registry"""
+    server = ThreadingHTTPServer((host, port), EduQuestHandler)
+    server.daemon_threads = True
+    server.registry = registry if registry is not None else SessionRegistry()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve EduQuest over HTTP")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--stub", action="store_true", help="Use the local stub backend")
+    parser.add_argument("--stub-latency", type=float, default=0.0,
+                        help="Seconds of simulated latency per stub call")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=None)
+    parser.add_argument("--session-dir", default=SESSION_STORE_DIR,
+                        help="Persist sessions to this directory")
+    args = parser.parse_args()
+
+    store = None
+    if args.session_dir:
+        from session_store import SessionStore
+        store = SessionStore(args.session_dir)
+
+    agents = ()
+    if args.stub:
+        from agents.manager_agent import ManagerAgent
+        from agents.planner_agent import PlannerAgent
+        from agents.quiz_agent import QuizAgent
+        from llm_backend import StubBackend, shared_backend
+
+        backend = shared_backend(StubBackend(latency=args.stub_latency,
+                                             tokens_per_second=args.stub_tokens_per_second), "stub")
+        agents = (ManagerAgent(backend), PlannerAgent(backend), QuizAgent(backend))
+
+    server = create_server(args.host, args.port, SessionRegistry(*agents, store=store))
+    print(f"EduQuest serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,676 @@
+"""
+Multi-Process Server for EduQuest
+N server.py worker processes behind a session-affine dispatcher
+
+One CPython process is bound by the GIL once routing, grading memos and
+analytics run in-process, so the cluster runs each worker as its own
+server.py process and puts a thin HTTP dispatcher in front of them. The
+dispatcher serves the same API as server.py:
+
+    POST /sessions          picks the session id, then creates it on its worker
+    .../sessions/<id>/...   forwarded to the worker that owns <id>
+    GET  /stats             sessions and peak RSS summed, and each worker's stats
+    GET  /tenants           every worker's answer, keyed by worker
+    GET  /cluster           workers, their ports and session counts
+    POST /cluster/workers   start one more worker
+    DELETE /cluster/workers/<worker>  drain and stop a worker
+
+Sessions are pinned to workers by consistent hashing on the session id
+(HashRing, CLUSTER_RING_REPLICAS virtual nodes per worker), so adding or
+removing a worker only moves about 1/N of the sessions. Ids minted by the
+dispatcher start with a hash of the learner id and only that prefix is
+hashed (routing_key), so all of a learner's sessions share a worker, and
+with it their cached review memory and ability model. Moving
+sessions are handed off through the session store format: the old owner
+exports and forgets each session (POST .../handoff), and the new owner
+adopts it into its own store (POST .../adopt). Requests for a session wait
+while it moves. A session that cannot move goes back to its old worker and
+stays pinned there until the next membership change moves it; a worker is
+only stopped once all its sessions have left. A worker that dies is
+restarted with the same id and store directory, so its sessions are
+restored from its store.
+
+Workers attach to one copy of the curriculum index in shared memory. Each
+gets SCHEDULER_MAX_CONCURRENT // workers model-call slots, at least one,
+for the worker count the cluster starts with; tenant shares are enforced
+per worker. That share is a per-worker floor: workers added later get the
+same share (a running worker's quota cannot change), so each one adds to
+the total, as does starting more workers than there are slots. All
+workers share the quiz history under ANALYTICS_DIR, sharded by learner
+rather than by worker (analytics.ShardedHistory), so a learner's history
+does not move when they do; the adopting worker rebuilds their review
+memory and ability from it.
+
+Usage:
+    python server_cluster.py --workers 4 --port 8080 --session-dir var/sessions
+    python server_cluster.py --workers 4 --stub --stub-latency 0.2
+"""
+import argparse
+import bisect
+import hashlib
+import http.client
+import json
+import os
+import re
+import secrets
+import select
+import signal
+import subprocess
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    SERVER_HOST, SERVER_PORT, SESSION_STORE_DIR, SCHEDULER_MAX_CONCURRENT,
+    CLUSTER_WORKERS, CLUSTER_RING_REPLICAS, CLUSTER_HEALTH_INTERVAL_SECONDS
+)
+from metrics import metrics
+
+_SERVING = re.compile(r"serving on http://[^:]+:(\d+)")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def new_session_id(learner_id: Optional[str] = None) -> str:
+    """A session id whose routing key is the learner's (random without a learner)"""
+    affinity = (hashlib.md5(learner_id.encode("utf-8")).hexdigest()[:12] if learner_id
+                else uuid.uuid4().hex[:12])
+    return f"{affinity}-{uuid.uuid4().hex}"
+
+
+def routing_key(session_id: str) -> str:
+    """The part of a session id the ring hashes (ids from server.py are used whole)"""
+    return session_id.split("-", 1)[0]
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto nodes
+
+    Each node owns replicas points on a 64-bit ring; a key belongs to the
+    node owning the first point at or after the key's hash.
+    """
+
+    def __init__(self, nodes: Sequence[str] = (), replicas: int = CLUSTER_RING_REPLICAS):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self.replicas):
+            point = _ring_hash(f"{node}#{i}")
+            at = bisect.bisect_left(self._points, point)
+            self._points.insert(at, point)
+            self._owners.insert(at, node)
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def node_for(self, key: str) -> str:
+        """Node owning key (raises LookupError on an empty ring)"""
+        if not self._points:
+            raise LookupError("No nodes on the ring")
+        at = bisect.bisect_left(self._points, _ring_hash(key)) % len(self._points)
+        return self._owners[at]
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(replicas=self.replicas)
+        ring._points, ring._owners, ring._nodes = list(self._points), list(self._owners), list(self._nodes)
+        return ring
+
+
+class WorkerUnavailable(RuntimeError):
+    """A worker could not be reached"""
+
+
+class Worker:
+    """One server.py process serving the sessions the ring assigns to it"""
+
+    def __init__(self, worker_id: str, server_args: List[str], env: Dict[str, str],
+                 session_dir: Optional[str]):
+        self.id = worker_id
+        self.server_args = server_args
+        self.env = env
+        self.store_dir = os.path.join(session_dir, worker_id) if session_dir else ""
+        self.process: Optional[subprocess.Popen] = None
+        self.port: Optional[int] = None
+        self.restarts = 0
+        self._connections = threading.local()
+
+    def start(self):
+        """Start the process and wait until it accepts connections"""
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "server.py"), "--host", "127.0.0.1", "--port", "0",
+             "--session-dir", self.store_dir, *self.server_args],
+            cwd=ROOT, env=self.env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, text=True,
+            # Out of the terminal's process group: Ctrl-C reaches the dispatcher,
+            # which then stops its workers in order
+            start_new_session=True)
+        for line in self.process.stderr:
+            match = _SERVING.search(line)
+            if match:
+                self.port = int(match.group(1))
+                break
+            sys.stderr.write(f"[{self.id}] {line}")
+        else:
+            raise WorkerUnavailable(f"Worker {self.id} exited during startup")
+        threading.Thread(target=self._relay_stderr, args=(self.process,),
+                         name=f"{self.id}-stderr", daemon=True).start()
+
+    def _relay_stderr(self, process: subprocess.Popen):
+        for line in process.stderr:
+            sys.stderr.write(f"[{self.id}] {line}")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the process; SIGINT lets server.py flush and close its session store"""
+        if not self.alive():
+            return
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        # One keep-alive connection per dispatcher thread, renewed after a restart
+        connection = getattr(self._connections, "value", None)
+        if connection is not None and connection.sock is not None:
+            # A kept-alive socket the worker closed while idle reads as ready (EOF)
+            if select.select([connection.sock], [], [], 0)[0]:
+                connection.close()
+        if connection is None or connection.port != self.port:
+            connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=300)
+            self._connections.value = connection
+        return connection
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                internal: bool = False) -> Tuple[int, bytes]:
+        """
+        Send one request to the worker
+
+        Args:
+            internal: Send the cluster token, for the dispatcher's own calls
+                (never for forwarded client requests)
+
+        Returns:
+            (status, response body)
+
+        Raises:
+            WorkerUnavailable: The worker is down or dropped the connection
+        """
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if internal:
+            headers["X-EduQuest-Cluster-Token"] = self.env["EDUQUEST_CLUSTER_TOKEN"]
+        for attempt in range(2):
+            connection = self._connection()
+            sent = False
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                sent = True
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                self._connections.value = None
+                # Retry once on a new connection only if the worker cannot have
+                # acted on the request: it failed while being sent, or it is a
+                # GET (a turn must never run twice). Timeouts are not retried.
+                retry = (not sent or method == "GET") and not isinstance(e, TimeoutError)
+                if attempt or not retry or not self.alive():
+                    raise WorkerUnavailable(f"Worker {self.id}: {e}") from e
+        raise AssertionError("unreachable")
+
+    def request_json(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Dict]:
+        """request() from the dispatcher itself, with JSON in and out"""
+        status, data = self.request(method, path, json.dumps(body).encode("utf-8")
+                                    if body is not None else None, internal=True)
+        return status, json.loads(data or b"{}")
+
+
+class Cluster:
+    """
+    Workers, the ring assigning sessions to them, and session migration
+
+    Args:
+        workers: Worker processes to start
+        server_args: Extra server.py arguments for every worker (e.g. --stub)
+        session_dir: Parent of the workers' session stores (None: not persisted,
+            but sessions still move between live workers)
+        replicas: Virtual nodes per worker on the ring
+
+    Each worker may have SCHEDULER_MAX_CONCURRENT // workers model calls in
+    flight (at least one); workers added later get the same number.
+    """
+
+    def __init__(self, workers: int = CLUSTER_WORKERS, server_args: Sequence[str] = (),
+                 session_dir: Optional[str] = SESSION_STORE_DIR,
+                 replicas: int = CLUSTER_RING_REPLICAS):
+        self.server_args = list(server_args)
+        self.session_dir = session_dir
+        self.workers: Dict[str, Worker] = {}
+        self.ring = HashRing(replicas=replicas)
+        self._pinned: Dict[str, str] = {}  # session -> worker, for sessions that failed to move
+        self._next_id = 0
+        self._cond = threading.Condition()
+        self._moving: set = set()
+        self._creating = 0          # creates sent to a worker and not yet answered
+        self._rebalancing = False   # sessions are being listed; creates wait
+        self._membership = threading.Lock()  # one add/remove at a time
+        self._stop = threading.Event()
+        self._token = secrets.token_hex(16)
+        self._curriculum = self._share_curriculum()
+        self._quota = max(1, SCHEDULER_MAX_CONCURRENT // max(1, workers))
+
+        try:
+            for _ in range(workers):
+                worker = self._new_worker()
+                self.workers[worker.id] = worker
+                self.ring.add(worker.id)
+            # Stores written under another worker count restore sessions that
+            # now belong elsewhere
+            self._rebalance(self.ring.copy())
+        except Exception:
+            self.close()
+            raise
+        self._monitor = threading.Thread(target=self._monitor_loop, name="cluster-monitor", daemon=True)
+        self._monitor.start()
+
+    @staticmethod
+    def _share_curriculum():
+        from curriculum import get_curriculum_index
+
+        index = get_curriculum_index()
+        return index.share() if index is not None else None
+
+    def _new_worker(self) -> Worker:
+        worker_id = f"w{self._next_id}"
+        self._next_id += 1
+        env = dict(os.environ)
+        env["EDUQUEST_MAX_CONCURRENT_CALLS"] = str(self._quota)
+        env["EDUQUEST_CLUSTER_TOKEN"] = self._token
+        if self._curriculum is not None:
+            env["EDUQUEST_CURRICULUM_SHM"] = self._curriculum.name
+        worker = Worker(worker_id, self.server_args, env, self.session_dir)
+        worker.start()
+        return worker
+
+    # ----- routing -----
+
+    def _route(self, session_id: str) -> Worker:
+        # Callers hold _cond
+        worker_id = self._pinned.get(session_id) or self.ring.node_for(routing_key(session_id))
+        return self.workers[worker_id]
+
+    def owner(self, session_id: str) -> Worker:
+        """Worker serving session_id, waiting while the session moves between workers"""
+        with self._cond:
+            while session_id in self._moving:
+                self._cond.wait()
+            return self._route(session_id)
+
+    def create_session(self, body: Dict) -> Tuple[int, Dict]:
+        """Create a session on the worker its new id hashes to"""
+        body = dict(body, session_id=new_session_id(body.get("learner_id")))
+        # Counted until the worker answers, so a rebalance lists it (or it is
+        # routed by the new ring) rather than missing it
+        with self._cond:
+            while self._rebalancing:
+                self._cond.wait()
+            worker = self._route(body["session_id"])
+            self._creating += 1
+        try:
+            return worker.request_json("POST", "/sessions", body)
+        finally:
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify_all()
+
+    def broadcast(self, path: str) -> Dict[str, Dict]:
+        """GET path from every worker (None for a worker that is down)"""
+        with self._cond:
+            workers = list(self.workers.values())
+        results = {}
+        for worker in workers:
+            try:
+                results[worker.id] = worker.request_json("GET", path)[1]
+            except WorkerUnavailable:
+                results[worker.id] = None
+        return results
+
+    def describe(self) -> Dict:
+        sessions = self.broadcast("/sessions")
+        with self._cond:
+            return {
+                "workers": {w.id: {"port": w.port, "pid": w.process.pid, "alive": w.alive(),
+                                   "restarts": w.restarts, "on_ring": w.id in self.ring.nodes,
+                                   "sessions": len((sessions.get(w.id) or {}).get("sessions", []))}
+                            for w in self.workers.values()},
+                "moving": len(self._moving),
+                "calls_per_worker": self._quota,
+                "pinned": len(self._pinned),
+            }
+
+    # ----- membership -----
+
+    def add_worker(self) -> str:
+        """
+        Start a worker and move the sessions it now owns to it
+
+        Raises:
+            WorkerUnavailable: The worker did not start, or a worker could not
+                list its sessions (the new worker is stopped again)
+        """
+        with self._membership:
+            worker = self._new_worker()
+            ring = self.ring.copy()
+            ring.add(worker.id)
+            with self._cond:
+                self.workers[worker.id] = worker
+            try:
+                self._rebalance(ring)
+            except WorkerUnavailable:
+                with self._cond:
+                    del self.workers[worker.id]
+                worker.stop()
+                raise
+            metrics.increment("cluster.workers_added")
+            return worker.id
+
+    def remove_worker(self, worker_id: str) -> bool:
+        """
+        Move a worker's sessions to the others, then stop it
+
+        Returns:
+            False if the worker is unknown or the last one
+
+        Raises:
+            WorkerUnavailable: Sessions could not be listed or moved; the
+                worker keeps serving the sessions still on it
+        """
+        with self._membership:
+            if worker_id not in self.workers or len(self.workers) == 1:
+                return False
+            ring = self.ring.copy()
+            ring.remove(worker_id)
+            stuck = self._rebalance(ring)
+            if stuck:
+                raise WorkerUnavailable(f"{len(stuck)} sessions could not leave worker {worker_id}")
+            with self._cond:
+                worker = self.workers.pop(worker_id)
+            worker.stop()
+            metrics.increment("cluster.workers_removed")
+            return True
+
+    def _rebalance(self, ring: HashRing) -> List[str]:
+        """
+        Route by ring, moving every session to its owner there
+
+        Returns:
+            Sessions that could not move (pinned to the worker holding them)
+
+        Raises:
+            WorkerUnavailable: A worker could not list its sessions; nothing moved
+        """
+        # Creates wait from before the listing until the new ring is in place,
+        # and creates already sent finish first, so none lands behind the
+        # listing; turns go on, and only moving sessions wait for their handoff
+        with self._cond:
+            self._rebalancing = True
+            while self._creating:
+                self._cond.wait()
+            workers = list(self.workers.values())
+        try:
+            moves = []
+            for worker in workers:
+                status, body = worker.request_json("GET", "/sessions")
+                for session_id in body.get("sessions", []) if status == 200 else []:
+                    target = ring.node_for(routing_key(session_id))
+                    if target != worker.id:
+                        moves.append((session_id, worker, self.workers[target]))
+            with self._cond:
+                self._moving.update(session_id for session_id, _, _ in moves)
+                # The listing shows where every session is, so earlier pins are retried
+                self._pinned.clear()
+                self.ring = ring
+        finally:
+            with self._cond:
+                self._rebalancing = False
+                self._cond.notify_all()
+        stuck = []
+        try:
+            for session_id, source, target in moves:
+                if not self._move(session_id, source, target):
+                    stuck.append(session_id)
+                    with self._cond:
+                        self._pinned[session_id] = source.id
+        finally:
+            with self._cond:
+                self._moving.clear()
+                self._cond.notify_all()
+        return stuck
+
+    def _move(self, session_id: str, source: Worker, target: Worker) -> bool:
+        """Hand a session from source to target; False if it stays on source"""
+        try:
+            status, body = source.request_json("POST", f"/sessions/{session_id}/handoff")
+        except WorkerUnavailable:
+            return False
+        if status != 200:
+            return True  # dropped meanwhile
+        try:
+            status, _ = target.request_json("POST", f"/sessions/{session_id}/adopt", body)
+            if status == 201:
+                metrics.increment("cluster.sessions_moved")
+                return True
+        except WorkerUnavailable:
+            pass
+        metrics.increment("cluster.move_failures")
+        # Give it back rather than lose it
+        try:
+            status, _ = source.request_json("POST", f"/sessions/{session_id}/adopt", body)
+            if status == 201:
+                return False
+        except WorkerUnavailable:
+            pass
+        metrics.increment("cluster.sessions_lost")
+        print(f"Session {session_id} could not move to {target.id} or return to {source.id}",
+              file=sys.stderr)
+        return True
+
+    # ----- supervision -----
+
+    def _monitor_loop(self):
+        while not self._stop.wait(CLUSTER_HEALTH_INTERVAL_SECONDS):
+            with self._cond:
+                dead = [w for w in self.workers.values() if not w.alive()]
+            for worker in dead:
+                if self._stop.is_set():
+                    return
+                print(f"Worker {worker.id} exited ({worker.process.returncode}); restarting",
+                      file=sys.stderr)
+                try:
+                    worker.start()
+                    worker.restarts += 1
+                    metrics.increment("cluster.worker_restarts")
+                except WorkerUnavailable as e:
+                    print(str(e), file=sys.stderr)
+
+    def close(self):
+        """Stop every worker and release the shared curriculum"""
+        self._stop.set()
+        for worker in list(self.workers.values()):
+            worker.stop()
+        if self._curriculum is not None:
+            self._curriculum.close()
+            self._curriculum.unlink()
+            self._curriculum = None
+
+
+class DispatcherHandler(BaseHTTPRequestHandler):
+    """Forwards each request to the worker owning its session"""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def cluster(self) -> Cluster:
+        return self.server.cluster
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_raw(self, status: int, data: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send(self, status: int, body: Dict):
+        self._send_raw(status, json.dumps(body).encode("utf-8"))
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _forward(self, method: str, body: Optional[bytes] = None):
+        parts = self.path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "sessions" or parts[2:3] in (["handoff"], ["adopt"]):
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            status, data = self.cluster.owner(parts[1]).request(method, self.path, body)
+        except WorkerUnavailable as e:
+            metrics.increment("cluster.unavailable")
+            self._send(503, {"error": str(e)})
+            return
+        self._send_raw(status, data)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/cluster":
+            self._send(200, self.cluster.describe())
+        elif path == "/stats":
+            # server.py's fields, summed over workers, plus each worker's own
+            workers = self.cluster.broadcast(path)
+            live = [stats for stats in workers.values() if stats]
+            self._send(200, {"sessions": sum(stats["sessions"] for stats in live),
+                             "peak_rss_bytes": sum(stats["peak_rss_bytes"] or 0 for stats in live),
+                             "workers": workers, "metrics": metrics.snapshot()})
+        elif path == "/tenants":
+            self._send(200, {"workers": self.cluster.broadcast(path)})
+        else:
+            self._forward("GET")
+
+    def do_POST(self):
+        body = self._body()
+        path = self.path.rstrip("/")
+        if path == "/sessions":
+            try:
+                request = json.loads(body or b"{}")
+                status, response = self.cluster.create_session(request)
+            except ValueError:
+                self._send(400, {"error": "invalid JSON"})
+                return
+            except WorkerUnavailable as e:
+                self._send(503, {"error": str(e)})
+                return
+            self._send(status, response)
+        elif path == "/cluster/workers":
+            try:
+                self._send(201, {"worker": self.cluster.add_worker()})
+            except WorkerUnavailable as e:
+                self._send(503, {"error": str(e)})
+        else:
+            self._forward("POST", body)
+
+    def do_DELETE(self):
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["cluster", "workers"] and len(parts) == 3:
+            try:
+                removed = self.cluster.remove_worker(parts[2])
+            except WorkerUnavailable as e:
+                self._send(503, {"error": str(e)})
+                return
+            if removed:
+                self._send(200, {"removed": parts[2]})
+            else:
+                self._send(409, {"error": "unknown worker, or the last one"})
+        else:
+            self._forward("DELETE")
+
+
+class DispatcherServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Every client connection arrives here; the default listen backlog of 5
+    # resets connections when many clients connect at once
+    request_queue_size = 128
+
+
+def create_dispatcher(cluster: Cluster, host: str = SERVER_HOST,
+                      port: int = SERVER_PORT) -> ThreadingHTTPServer:
+    """Build (but do not start) the dispatcher for a running cluster"""
+    server = DispatcherServer((host, port), DispatcherHandler)
+    server.cluster = cluster
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve EduQuest from several worker processes")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=CLUSTER_WORKERS)
+    parser.add_argument("--session-dir", default=SESSION_STORE_DIR,
+                        help="Persist sessions under this directory (one store per worker)")
+    parser.add_argument("--stub", action="store_true", help="Use the local stub backend")
+    parser.add_argument("--stub-latency", type=float, default=0.0)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    server_args = []
+    if args.stub:
+        server_args += ["--stub", "--stub-latency", str(args.stub_latency)]
+        if args.stub_tokens_per_second:
+            server_args += ["--stub-tokens-per-second", str(args.stub_tokens_per_second)]
+
+    # Workers run in their own sessions, so stop them on SIGTERM as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    cluster = Cluster(args.workers, server_args, args.session_dir or None)
+    server = create_dispatcher(cluster, args.host, args.port)
+    print(f"EduQuest serving on http://{args.host}:{server.server_port} "
+          f"with {args.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cluster.close()
+
+
+if __name__ == "__main__":
+    main()
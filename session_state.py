@@ -1,77 +1,369 @@
 """
 Session State Management for EduQuest
 Tracks quiz progress, user history, and conversation context
+
+Sessions are kept compact so one process can hold many of them: classes use
+__slots__, topics and short strings are interned, timestamps are integer
+seconds, quiz verdicts are packed into a small int, and long text (questions,
+answers, feedback, messages) lives out of line in a per-session TextArena
+whose full segments are zlib-compressed. The attribute API is unchanged.
+
+Every mutation is also reported as an event to an optional sink (see
+session_store.py), and apply_event()/snapshot_events() rebuild a session
+from such events.
 """
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+import json
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_right
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from config import SESSION_ARENA_SEGMENT_BYTES, SESSION_INLINE_TEXT_CHARS
+
+
+class TextArena:
+    """
+    Append-only store of strings addressed by integer reference
+
+    Text is UTF-8 encoded into an open segment; once that reaches
+    segment_bytes it is sealed and zlib-compressed. Reads from a sealed
+    segment decompress it on demand (the last one is cached).
+    """
+
+    __slots__ = ("_ends", "_segment_starts", "_sealed", "_open", "_segment_bytes", "_cached")
+
+    def __init__(self, segment_bytes: int = SESSION_ARENA_SEGMENT_BYTES):
+        self._ends = array("Q")            # logical end offset of each entry
+        self._segment_starts = array("Q", [0])  # logical start of each segment (last = open)
+        self._sealed: List[bytes] = []
+        self._open = bytearray()
+        self._segment_bytes = segment_bytes
+        self._cached: Optional[Tuple[int, bytes]] = None
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def put(self, text: str) -> int:
+        """Store text and return its reference"""
+        self._open += text.encode("utf-8")
+        self._ends.append(self._segment_starts[-1] + len(self._open))
+        if len(self._open) >= self._segment_bytes:
+            self.seal()
+        return len(self._ends) - 1
+
+    def get(self, ref: int) -> str:
+        """Text previously stored under ref"""
+        start = self._ends[ref - 1] if ref else 0
+        end = self._ends[ref]
+        segment = bisect_right(self._segment_starts, start) - 1
+        if segment < len(self._sealed):
+            if self._cached is None or self._cached[0] != segment:
+                self._cached = (segment, zlib.decompress(self._sealed[segment]))
+            data = self._cached[1]
+        else:
+            data = self._open
+        offset = self._segment_starts[segment]
+        return bytes(data[start - offset:end - offset]).decode("utf-8")
+
+    def seal(self):
+        """Compress the open segment (no-op when it is empty)"""
+        if not self._open:
+            return
+        self._sealed.append(zlib.compress(bytes(self._open)))
+        self._segment_starts.append(self._segment_starts[-1] + len(self._open))
+        self._open = bytearray()
+        self._cached = None
+
+
+class Event:
+    """Session event kinds; field layouts are listed in session_store.EVENT_FIELDS"""
+    QUIZ_STARTED = 1     # topics, total_questions, exam_mode, started (unix s)
+    QUESTION_ADDED = 2   # question, topic, difficulty, hints
+    ANSWER_RECORDED = 3  # index, user_answer, is_correct, correct_answer, feedback, advance, is_partial
+    ANSWER_DEFERRED = 4  # user_answer
+    QUIZ_ADVANCED = 5    # (none) current question dropped without an answer
+    QUIZ_ENDED = 6       # (none)
+    PLAN_SET = 7         # subject, topics, days_available, exam_date, schedule JSON, created
+    MESSAGE_ADDED = 8    # role, content, timestamp
+    MODE_SET = 9         # mode
+    QUESTION_STATE = 10  # snapshot only: question, topic, user_answer, is_correct, correct_answer,
+    #                      feedback, difficulty, is_partial, hints, hints_shown
+    QUIZ_STATE = 11      # snapshot only: current_question_index, score, is_active
+    SESSION_DELETED = 12  # (none)
+    LEARNER_SET = 13     # learner_id, tenant
+    HINT_SHOWN = 14      # hints (None unless fetched just now) for the current question
+
+
+TextRef = Union[None, str, int]
+
+
+def _store(arena: TextArena, text: Optional[str]) -> TextRef:
+    """None stays None, short text is interned, long text goes to the arena"""
+    if text is None:
+        return None
+    if len(text) <= SESSION_INLINE_TEXT_CHARS:
+        return sys.intern(text)
+    return arena.put(text)
+
+
+def _load(arena: TextArena, ref: TextRef) -> Optional[str]:
+    return arena.get(ref) if isinstance(ref, int) else ref
+
+
+def _to_timestamp(value: Optional[datetime]) -> int:
+    return int(value.timestamp()) if value else 0
+
+
+def _from_timestamp(value: int) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value else None
+
+
+# QuizQuestion verdict flags
+_ANSWERED = 1
+_GRADED = 2
+_CORRECT = 4
+_PARTIAL = 8
 
 
-@dataclass
 class QuizQuestion:
     """Represents a single quiz question"""
-    question: str
-    topic: str
-    user_answer: Optional[str] = None
-    correct_answer: Optional[str] = None
-    feedback: Optional[str] = None
-    is_correct: Optional[bool] = None
+
+    __slots__ = ("_arena", "_question", "topic", "difficulty", "_user_answer", "_correct_answer",
+                 "_feedback", "_flags", "_hints", "hints_shown")
+
+    def __init__(self, question: str, topic: str, user_answer: Optional[str] = None,
+                 correct_answer: Optional[str] = None, feedback: Optional[str] = None,
+                 is_correct: Optional[bool] = None, arena: Optional[TextArena] = None,
+                 difficulty: Optional[str] = None, is_partial: bool = False,
+                 hints: Optional[Sequence[str]] = None, hints_shown: int = 0):
+        self._arena = arena if arena is not None else TextArena()
+        self._question = _store(self._arena, question)
+        self.topic = sys.intern(topic)
+        self.difficulty = sys.intern(difficulty) if difficulty else None
+        self._flags = 0
+        self._user_answer: TextRef = None
+        self._correct_answer: TextRef = None
+        self._feedback: TextRef = None
+        self.user_answer = user_answer
+        self.correct_answer = correct_answer
+        self.feedback = feedback
+        self.is_correct = is_correct
+        self.is_partial = is_partial
+        self._hints: TextRef = None
+        self.hints = hints
+        self.hints_shown = hints_shown  # hint tiers the learner has asked for
+
+    def __repr__(self) -> str:
+        return (f"QuizQuestion(question={self.question!r}, topic={self.topic!r}, "
+                f"user_answer={self.user_answer!r}, is_correct={self.is_correct!r})")
+
+    @property
+    def question(self) -> str:
+        return _load(self._arena, self._question)
+
+    @property
+    def user_answer(self) -> Optional[str]:
+        return _load(self._arena, self._user_answer) if self._flags & _ANSWERED else None
+
+    @user_answer.setter
+    def user_answer(self, value: Optional[str]):
+        self._user_answer = _store(self._arena, value)
+        self._flags = self._flags | _ANSWERED if value is not None else self._flags & ~_ANSWERED
+
+    @property
+    def correct_answer(self) -> Optional[str]:
+        return _load(self._arena, self._correct_answer)
+
+    @correct_answer.setter
+    def correct_answer(self, value: Optional[str]):
+        self._correct_answer = _store(self._arena, value)
+
+    @property
+    def feedback(self) -> Optional[str]:
+        return _load(self._arena, self._feedback)
+
+    @feedback.setter
+    def feedback(self, value: Optional[str]):
+        self._feedback = _store(self._arena, value)
+
+    @property
+    def hints(self) -> List[str]:
+        """Hints generated with the question, weakest first (one per line in the arena)"""
+        text = _load(self._arena, self._hints)
+        return text.split("\n") if text else []
+
+    @hints.setter
+    def hints(self, value: Optional[Sequence[str]]):
+        self._hints = _store(self._arena, "\n".join(" ".join(h.split()) for h in value) if value else None)
+
+    @property
+    def is_correct(self) -> Optional[bool]:
+        if not self._flags & _GRADED:
+            return None
+        return bool(self._flags & _CORRECT)
+
+    @is_correct.setter
+    def is_correct(self, value: Optional[bool]):
+        flags = self._flags & ~(_GRADED | _CORRECT)
+        if value is not None:
+            flags |= _GRADED | (_CORRECT if value else 0)
+        self._flags = flags
+
+    @property
+    def is_partial(self) -> bool:
+        """Graded as partially correct (is_correct is then False)"""
+        return bool(self._flags & _PARTIAL)
+
+    @is_partial.setter
+    def is_partial(self, value: bool):
+        self._flags = self._flags | _PARTIAL if value else self._flags & ~_PARTIAL
 
 
-@dataclass
 class QuizSession:
     """Manages a quiz session state"""
-    topics: List[str] = field(default_factory=list)
-    questions: List[QuizQuestion] = field(default_factory=list)
-    current_question_index: int = 0
-    score: int = 0
-    total_questions: int = 0
-    is_active: bool = False
-    started_at: Optional[datetime] = None
-    
-    def start(self, topics: List[str], total_questions: int):
+
+    __slots__ = ("topics", "questions", "current_question_index", "score",
+                 "total_questions", "is_active", "_started", "exam_mode", "_arena", "_sink")
+
+    def __init__(self, topics: Optional[List[str]] = None,
+                 questions: Optional[List[QuizQuestion]] = None,
+                 current_question_index: int = 0, score: int = 0,
+                 total_questions: int = 0, is_active: bool = False,
+                 started_at: Optional[datetime] = None,
+                 exam_mode: bool = False):  # exam mode: answers are graded together at the end
+        self.topics = [sys.intern(t) for t in topics or []]
+        self.questions = questions if questions is not None else []
+        self.current_question_index = current_question_index
+        self.score = score
+        self.total_questions = total_questions
+        self.is_active = is_active
+        self._started = _to_timestamp(started_at)
+        self.exam_mode = exam_mode
+        self._arena = TextArena()
+        self._sink = None
+
+    @property
+    def started_at(self) -> Optional[datetime]:
+        return _from_timestamp(self._started)
+
+    @started_at.setter
+    def started_at(self, value: Optional[datetime]):
+        self._started = _to_timestamp(value)
+
+    def start(self, topics: List[str], total_questions: int, exam_mode: bool = False):
         """Initialize a new quiz session"""
-        self.topics = topics
+        started = int(time.time())
+        if self._sink:
+            self._sink.emit(Event.QUIZ_STARTED, (topics, total_questions, exam_mode, started))
+        self.topics = [sys.intern(t) for t in topics]
         self.total_questions = total_questions
+        self.exam_mode = exam_mode
         self.questions = []
+        self._arena = TextArena()
         self.current_question_index = 0
         self.score = 0
         self.is_active = True
-        self.started_at = datetime.now()
-    
-    def add_question(self, question: str, topic: str):
-        """Add a new question to the session"""
-        self.questions.append(QuizQuestion(question=question, topic=topic))
-    
-    def record_answer(self, user_answer: str, is_correct: bool, 
-                     correct_answer: str, feedback: str):
-        """Record the user's answer and feedback"""
-        if self.current_question_index < len(self.questions):
-            q = self.questions[self.current_question_index]
-            q.user_answer = user_answer
+        self._started = started
+
+    def add_question(self, question: str, topic: str, difficulty: Optional[str] = None,
+                     hints: Optional[Sequence[str]] = None):
+        """Add a new question to the session, with its tiered hints if they came with it"""
+        q = QuizQuestion(question=question, topic=topic, arena=self._arena, difficulty=difficulty,
+                         hints=hints)
+        if self._sink:
+            self._sink.emit(Event.QUESTION_ADDED, (question, topic, difficulty,
+                                                   _load(self._arena, q._hints)))
+        self.questions.append(q)
+
+    def show_hint(self, hints: Optional[Sequence[str]] = None) -> Optional[Tuple[int, str]]:
+        """
+        Reveal the next hint tier of the current question
+
+        Args:
+            hints: Hints to store first, for a question that was asked without them
+
+        Returns:
+            (tier, hint), 1-based; the strongest tier repeats once all have
+            been shown. None if there is no current question or no hints.
+        """
+        if self.current_question_index >= len(self.questions):
+            return None
+        q = self.questions[self.current_question_index]
+        if hints:
+            q.hints = hints
+        known = q.hints
+        if not known:
+            return None
+        if self._sink:
+            self._sink.emit(Event.HINT_SHOWN, (_load(self._arena, q._hints) if hints else None,))
+        q.hints_shown = min(q.hints_shown + 1, len(known))
+        return q.hints_shown, known[q.hints_shown - 1]
+
+    def record_answer(self, user_answer: str, is_correct: bool,
+                     correct_answer: str, feedback: str,
+                     question_index: Optional[int] = None, is_partial: bool = False):
+        """
+        Record the user's answer and feedback
+
+        Without question_index the current question is graded and the quiz
+        advances; with it, a previously deferred answer is graded in place.
+        """
+        index = self.current_question_index if question_index is None else question_index
+        if index < len(self.questions):
+            if self._sink:
+                self._sink.emit(Event.ANSWER_RECORDED, (index, user_answer, is_correct, correct_answer,
+                                                        feedback, question_index is None, is_partial))
+            q = self.questions[index]
+            if question_index is None or q.user_answer != user_answer:
+                q.user_answer = user_answer
             q.is_correct = is_correct
+            q.is_partial = is_partial
             q.correct_answer = correct_answer
             q.feedback = feedback
-            
+
             if is_correct:
                 self.score += 1
-            
+
+            if question_index is None:
+                self.current_question_index += 1
+
+    def defer_answer(self, user_answer: str):
+        """Store the answer to the current question ungraded and advance (exam mode)"""
+        if self.current_question_index < len(self.questions):
+            if self._sink:
+                self._sink.emit(Event.ANSWER_DEFERRED, (user_answer,))
+            self.questions[self.current_question_index].user_answer = user_answer
             self.current_question_index += 1
-    
+
+    def advance(self):
+        """Move past the current question without recording an answer"""
+        if self._sink:
+            self._sink.emit(Event.QUIZ_ADVANCED, ())
+        self.current_question_index += 1
+
+    def pending_answers(self) -> List[int]:
+        """Indexes of questions answered but not yet graded"""
+        return [i for i, q in enumerate(self.questions)
+                if q.user_answer is not None and q.is_correct is None]
+
     def get_current_question(self) -> Optional[QuizQuestion]:
         """Get the current question"""
         if self.current_question_index < len(self.questions):
             return self.questions[self.current_question_index]
         return None
-    
+
     def is_complete(self) -> bool:
         """Check if the quiz is complete"""
         return self.current_question_index >= self.total_questions
-    
+
     def end(self):
-        """End the quiz session"""
+        """End the quiz session; its text is compressed since it is now read-only"""
         self.is_active = False
-    
+        self._arena.seal()
+
     def get_summary(self) -> Dict:
         """Get a summary of the quiz session"""
         return {
@@ -83,53 +375,225 @@ class QuizSession:
         }
 
 
-@dataclass
 class StudyPlan:
-    """Represents a study plan"""
-    subject: str
-    topics: List[str]
-    days_available: int
-    exam_date: Optional[str] = None
-    daily_schedule: List[Dict] = field(default_factory=list)
-    created_at: datetime = field(default_factory=datetime.now)
+    """Represents a study plan; the daily schedule is kept compressed until read"""
+
+    __slots__ = ("subject", "topics", "days_available", "exam_date", "_schedule", "_created")
+
+    def __init__(self, subject: str, topics: List[str], days_available: int,
+                 exam_date: Optional[str] = None,
+                 daily_schedule: Optional[List[Dict]] = None,
+                 created_at: Optional[datetime] = None):
+        self.subject = sys.intern(subject)
+        self.topics = [sys.intern(t) for t in topics]
+        self.days_available = days_available
+        self.exam_date = exam_date
+        self.daily_schedule = daily_schedule or []
+        self._created = _to_timestamp(created_at) or int(time.time())
+
+    @property
+    def daily_schedule(self) -> List[Dict]:
+        if not self._schedule:
+            return []
+        return json.loads(zlib.decompress(self._schedule))
+
+    @daily_schedule.setter
+    def daily_schedule(self, value: List[Dict]):
+        self._schedule = zlib.compress(json.dumps(value).encode("utf-8")) if value else b""
+
+    @property
+    def created_at(self) -> datetime:
+        return _from_timestamp(self._created)
+
+
+class _HistoryView(Sequence):
+    """Read-only list of {"role", "content", "timestamp"} dicts built on access"""
+
+    __slots__ = ("_state",)
+
+    def __init__(self, state: "SessionState"):
+        self._state = state
+
+    def __len__(self) -> int:
+        return len(self._state._history_times)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        state = self._state
+        return {
+            "role": state._roles[state._history_roles[index]],
+            "content": state._history.get(index),
+            "timestamp": datetime.fromtimestamp(state._history_times[index]),
+        }
 
 
 class SessionState:
-    """Global session state manager"""
-    def __init__(self):
+    """
+    Global session state manager
+
+    Mutators emit their event before applying the change, so a sink may
+    snapshot the state at emit time and treat the event as coming after it.
+    """
+
+    __slots__ = ("quiz_session", "current_study_plan", "current_mode",
+                 "_history", "_history_roles", "_history_times", "_sink", "learner_id", "tenant")
+
+    # Each message stores its role as a 1-byte index into this tuple
+    _roles: Tuple[str, ...] = ("user", "assistant", "system")
+
+    def __init__(self, learner_id: str = "local", tenant: Optional[str] = None):
+        self.learner_id = learner_id  # who quiz results are attributed to in analytics
+        self.tenant = tenant          # who model calls are charged to (see tenant_budget.py)
         self.quiz_session: Optional[QuizSession] = None
         self.current_study_plan: Optional[StudyPlan] = None
-        self.conversation_history: List[Dict] = []
         self.current_mode: str = "manager"  # manager, planning, quizzing
-    
-    def start_quiz(self, topics: List[str], total_questions: int):
+        self._history = TextArena()       # message i is entry i
+        self._history_roles = bytearray()
+        self._history_times = array("I")  # unix seconds
+        self._sink = None  # receives (kind, fields) for every change; see attach()
+
+    @property
+    def conversation_history(self) -> Sequence[Dict]:
+        return _HistoryView(self)
+
+    def attach(self, sink):
+        """Report every later change to sink.emit(kind, fields), e.g. a session_store.SessionLog"""
+        self._sink = sink
+        if self.quiz_session:
+            self.quiz_session._sink = sink
+
+    def start_quiz(self, topics: List[str], total_questions: int, exam_mode: bool = False):
         """Start a new quiz session"""
         self.quiz_session = QuizSession()
-        self.quiz_session.start(topics, total_questions)
+        self.quiz_session._sink = self._sink
+        self.quiz_session.start(topics, total_questions, exam_mode)
         self.current_mode = "quizzing"
-    
+
     def end_quiz(self):
         """End the current quiz session"""
+        if self._sink:
+            self._sink.emit(Event.QUIZ_ENDED, ())
         if self.quiz_session:
             self.quiz_session.end()
         self.current_mode = "manager"
-    
+
     def set_study_plan(self, plan: StudyPlan):
         """Set the current study plan"""
+        if self._sink:
+            self._sink.emit(Event.PLAN_SET, (plan.subject, plan.topics, plan.days_available,
+                                             plan.exam_date, json.dumps(plan.daily_schedule),
+                                             plan._created))
         self.current_study_plan = plan
         self.current_mode = "planning"
-    
+
     def reset_mode(self):
         """Reset to manager mode"""
+        if self._sink:
+            self._sink.emit(Event.MODE_SET, ("manager",))
         self.current_mode = "manager"
-    
+
     def add_to_history(self, role: str, content: str):
-        """Add message to conversation history"""
-        self.conversation_history.append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now()
-        })
+        """
+        Add message to conversation history
+
+        Raises:
+            ValueError: role is not "user", "assistant" or "system"
+        """
+        if role not in self._roles:
+            raise ValueError(f"Unknown message role: {role!r}")
+        timestamp = int(time.time())
+        if self._sink:
+            self._sink.emit(Event.MESSAGE_ADDED, (role, content, timestamp))
+        self._append_history(role, content, timestamp)
+
+    def _append_history(self, role: str, content: str, timestamp: int):
+        self._history.put(content)
+        self._history_roles.append(self._roles.index(role))
+        self._history_times.append(timestamp)
+
+    def compact(self):
+        """Compress text still held uncompressed (call when a session goes idle)"""
+        self._history.seal()
+        if self.quiz_session and not self.quiz_session.is_active:
+            self.quiz_session._arena.seal()
+
+
+def apply_event(state: SessionState, kind: int, fields: Tuple[Any, ...]):
+    """Replay one event onto state (which should have no sink attached)"""
+    quiz = state.quiz_session
+    if kind == Event.QUIZ_STARTED:
+        topics, total, exam_mode, started = fields
+        state.start_quiz(topics, total, bool(exam_mode))
+        state.quiz_session._started = started
+    elif kind == Event.QUESTION_ADDED:
+        question, topic, difficulty, hints = fields
+        quiz.add_question(question, topic, difficulty, hints.split("\n") if hints else None)
+    elif kind == Event.HINT_SHOWN:
+        quiz.show_hint(fields[0].split("\n") if fields[0] else None)
+    elif kind == Event.ANSWER_RECORDED:
+        index, user_answer, is_correct, correct_answer, feedback, advance, is_partial = fields
+        quiz.record_answer(user_answer, bool(is_correct), correct_answer, feedback,
+                           question_index=None if advance else index, is_partial=bool(is_partial))
+    elif kind == Event.ANSWER_DEFERRED:
+        quiz.defer_answer(fields[0])
+    elif kind == Event.QUIZ_ADVANCED:
+        quiz.advance()
+    elif kind == Event.QUIZ_ENDED:
+        state.end_quiz()
+    elif kind == Event.PLAN_SET:
+        subject, topics, days, exam_date, schedule, created = fields
+        plan = StudyPlan(subject, topics, days, exam_date, json.loads(schedule))
+        plan._created = created
+        state.set_study_plan(plan)
+    elif kind == Event.MESSAGE_ADDED:
+        state._append_history(*fields)
+    elif kind == Event.MODE_SET:
+        state.current_mode = fields[0]
+    elif kind == Event.QUESTION_STATE:
+        (question, topic, user_answer, is_correct, correct_answer, feedback, difficulty, is_partial,
+         hints, hints_shown) = fields
+        quiz.questions.append(QuizQuestion(question, topic, user_answer, correct_answer,
+                                           feedback, is_correct, arena=quiz._arena,
+                                           difficulty=difficulty, is_partial=bool(is_partial),
+                                           hints=hints.split("\n") if hints else None,
+                                           hints_shown=hints_shown or 0))
+    elif kind == Event.QUIZ_STATE:
+        quiz.current_question_index, quiz.score, quiz.is_active = fields[0], fields[1], bool(fields[2])
+    elif kind == Event.LEARNER_SET:
+        state.learner_id, state.tenant = fields
+    else:
+        raise ValueError(f"Unknown session event kind: {kind}")
+
+
+def snapshot_events(state: SessionState) -> List[Tuple[int, Tuple[Any, ...]]]:
+    """The shortest event list that rebuilds state with apply_event()"""
+    events: List[Tuple[int, Tuple[Any, ...]]] = [(Event.LEARNER_SET, (state.learner_id, state.tenant))]
+    plan = state.current_study_plan
+    if plan:
+        events.append((Event.PLAN_SET, (plan.subject, plan.topics, plan.days_available,
+                                        plan.exam_date, json.dumps(plan.daily_schedule),
+                                        plan._created)))
+    history = state._history
+    for i, timestamp in enumerate(state._history_times):
+        events.append((Event.MESSAGE_ADDED, (state._roles[state._history_roles[i]],
+                                             history.get(i), timestamp)))
+    quiz = state.quiz_session
+    if quiz:
+        events.append((Event.QUIZ_STARTED, (quiz.topics, quiz.total_questions,
+                                            quiz.exam_mode, quiz._started)))
+        for q in quiz.questions:
+            events.append((Event.QUESTION_STATE, (q.question, q.topic, q.user_answer,
+                                                  q.is_correct, q.correct_answer, q.feedback,
+                                                  q.difficulty, q.is_partial,
+                                                  _load(q._arena, q._hints), q.hints_shown)))
+        events.append((Event.QUIZ_STATE, (quiz.current_question_index, quiz.score, quiz.is_active)))
+    events.append((Event.MODE_SET, (state.current_mode,)))
+    return events
 
 
 # Global session instance
@@ -0,0 +1,435 @@
+"""
+Persistent Session Store for EduQuest
+Append-only binary event log with periodic snapshots
+
+Every change to an attached SessionState (quiz started, question added,
+answer recorded, plan set, message added, ...) is appended to one log file
+as a CRC-checked binary frame. Every SESSION_SNAPSHOT_EVERY events a
+session's full state is written as a snapshot, so restoring replays the
+snapshot plus at most that many tail events.
+
+Appends only encode into a memory buffer; a background thread writes and
+fsyncs the buffer every SESSION_FLUSH_INTERVAL_SECONDS, so a crash loses at
+most that window and the turn path never waits on the disk.
+
+Layout of <directory>:
+    sessions.log          b"EQLG" + version, then frames
+    snapshots/<id>.snap   b"EQSN" + version + covered log offset, then frames
+
+Frame: <II (body length, crc32 of body), body = <BH (kind, id length),
+session id (UTF-8), then the fields listed in EVENT_FIELDS.
+"""
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    SESSION_STORE_DIR, SESSION_SNAPSHOT_EVERY, SESSION_FLUSH_INTERVAL_SECONDS
+)
+from metrics import metrics
+from session_state import Event, SessionState, apply_event, snapshot_events
+
+LOG_MAGIC = b"EQLG"
+SNAPSHOT_MAGIC = b"EQSN"
+FORMAT_VERSION = 1
+
+_FILE_HEADER = struct.Struct("<4sH")
+_SNAPSHOT_HEADER = struct.Struct("<4sHQ")
+_FRAME = struct.Struct("<II")
+_BODY = struct.Struct("<BH")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_I8 = struct.Struct("<b")
+_NONE = 0xFFFFFFFF
+
+# Field codes: s = str, n = optional str, q = int64, b = optional bool, l = list of str.
+# Fields may only be appended; frames written before a field existed decode it as None.
+EVENT_FIELDS = {
+    Event.QUIZ_STARTED: "lqbq",
+    Event.QUESTION_ADDED: "ssnn",
+    Event.ANSWER_RECORDED: "qnbnnbb",
+    Event.ANSWER_DEFERRED: "n",
+    Event.QUIZ_ADVANCED: "",
+    Event.QUIZ_ENDED: "",
+    Event.PLAN_SET: "slqnsq",
+    Event.MESSAGE_ADDED: "ssq",
+    Event.MODE_SET: "s",
+    Event.QUESTION_STATE: "ssnbnnnbnq",
+    Event.QUIZ_STATE: "qqb",
+    Event.SESSION_DELETED: "",
+    Event.LEARNER_SET: "sn",
+    Event.HINT_SHOWN: "n",
+}
+
+
+def _encode_str(out: bytearray, value: Optional[str]):
+    if value is None:
+        out += _U32.pack(_NONE)
+    else:
+        data = value.encode("utf-8")
+        out += _U32.pack(len(data))
+        out += data
+
+
+def encode_event(session_id: str, kind: int, fields: Tuple[Any, ...]) -> bytes:
+    """One framed event"""
+    sid = session_id.encode("utf-8")
+    body = bytearray(_BODY.pack(kind, len(sid)))
+    body += sid
+    for code, value in zip(EVENT_FIELDS[kind], fields):
+        if code == "s":
+            _encode_str(body, value or "")
+        elif code == "n":
+            _encode_str(body, value)
+        elif code == "q":
+            body += _I64.pack(int(value))
+        elif code == "b":
+            body += _I8.pack(-1 if value is None else int(bool(value)))
+        elif code == "l":
+            body += _U16.pack(len(value))
+            for item in value:
+                _encode_str(body, item)
+    return _FRAME.pack(len(body), zlib.crc32(body)) + bytes(body)
+
+
+def _decode_str(body: bytes, pos: int) -> Tuple[Optional[str], int]:
+    (length,) = _U32.unpack_from(body, pos)
+    pos += 4
+    if length == _NONE:
+        return None, pos
+    return body[pos:pos + length].decode("utf-8"), pos + length
+
+
+def decode_body(body: bytes) -> Tuple[int, str, Tuple[Any, ...]]:
+    """(kind, session id, fields) from a frame body"""
+    kind, sid_length = _BODY.unpack_from(body, 0)
+    pos = _BODY.size
+    session_id = body[pos:pos + sid_length].decode("utf-8")
+    pos += sid_length
+    fields: List[Any] = []
+    for code in EVENT_FIELDS[kind]:
+        if pos >= len(body):
+            fields.append(None)
+            continue
+        if code in "sn":
+            value, pos = _decode_str(body, pos)
+        elif code == "q":
+            (value,) = _I64.unpack_from(body, pos)
+            pos += 8
+        elif code == "b":
+            (raw,) = _I8.unpack_from(body, pos)
+            value = None if raw < 0 else bool(raw)
+            pos += 1
+        else:
+            (count,) = _U16.unpack_from(body, pos)
+            pos += 2
+            value = []
+            for _ in range(count):
+                item, pos = _decode_str(body, pos)
+                value.append(item)
+        fields.append(value)
+    return kind, session_id, tuple(fields)
+
+
+def read_frame(f) -> Optional[bytes]:
+    """Next frame body from f, or None at end of file or on a torn/corrupt frame"""
+    header = f.read(_FRAME.size)
+    if len(header) < _FRAME.size:
+        return None
+    length, crc = _FRAME.unpack(header)
+    body = f.read(length)
+    if len(body) < length or zlib.crc32(body) != crc:
+        return None
+    return body
+
+
+def _replay(state: SessionState, f):
+    body = read_frame(f)
+    while body is not None:
+        kind, _, fields = decode_body(body)
+        apply_event(state, kind, fields)
+        body = read_frame(f)
+
+
+def export_session(session_id: str, state: SessionState) -> bytes:
+    """state as snapshot frames, e.g. to hand the session to another process"""
+    return b"".join(encode_event(session_id, kind, fields)
+                    for kind, fields in snapshot_events(state))
+
+
+def import_session(data: bytes) -> SessionState:
+    """A detached SessionState rebuilt from export_session() output"""
+    state = SessionState()
+    _replay(state, io.BytesIO(data))
+    return state
+
+
+class SessionLog:
+    """Sink attached to one SessionState; forwards its events to the store"""
+
+    __slots__ = ("store", "session_id", "state", "since_snapshot")
+
+    def __init__(self, store: "SessionStore", session_id: str, state: SessionState,
+                 since_snapshot: int = 0):
+        self.store = store
+        self.session_id = session_id
+        self.state = state
+        self.since_snapshot = since_snapshot
+
+    def emit(self, kind: int, fields: Tuple[Any, ...]):
+        # Events are emitted just before the change is applied, so the state
+        # is snapshotted here, before appending, while it matches the log
+        if self.since_snapshot >= self.store.snapshot_every:
+            self.store.snapshot(self.session_id, self.state)
+            self.since_snapshot = 0
+        self.store.append(self.session_id, kind, fields)
+        self.since_snapshot += 1
+
+
+class SessionStore:
+    """
+    Durable home for many sessions' event logs
+
+    Usage:
+        store = SessionStore("var/sessions")
+        store.track(session_id, state)        # log every later change
+        state = store.restore(session_id)     # after a restart
+    """
+
+    def __init__(self, directory: str = SESSION_STORE_DIR,
+                 snapshot_every: int = SESSION_SNAPSHOT_EVERY,
+                 flush_interval: float = SESSION_FLUSH_INTERVAL_SECONDS):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.flush_interval = flush_interval
+        self.log_path = os.path.join(directory, "sessions.log")
+        self.snapshot_dir = os.path.join(directory, "snapshots")
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+        self._lock = threading.Lock()        # buffer and index
+        self._flush_lock = threading.Lock()  # file writes
+        self._buffer = bytearray()
+        self._tails: Dict[str, List[int]] = {}    # log offsets since each session's snapshot
+        self._snapshots: Dict[str, int] = {}      # covered log offset per snapshot on disk
+        # (covered offset, file contents) per snapshot not yet written; None = delete the file
+        self._pending_snapshots: Dict[str, Optional[Tuple[int, bytes]]] = {}
+
+        self._load_snapshot_offsets()
+        self._offset = self._scan_log()
+        self._durable = self._offset  # log bytes written and fsynced
+        self._torn = False            # a failed write may have left bytes past _durable
+        self._log = open(self.log_path, "ab")
+
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-store-flusher",
+                                         daemon=True)
+        self._flusher.start()
+
+    # ----- startup -----
+
+    def _load_snapshot_offsets(self):
+        for name in os.listdir(self.snapshot_dir):
+            if not name.endswith(".snap"):
+                continue
+            with open(os.path.join(self.snapshot_dir, name), "rb") as f:
+                header = f.read(_SNAPSHOT_HEADER.size)
+            if len(header) == _SNAPSHOT_HEADER.size:
+                magic, version, offset = _SNAPSHOT_HEADER.unpack(header)
+                if magic == SNAPSHOT_MAGIC and version == FORMAT_VERSION:
+                    self._snapshots[name[:-len(".snap")]] = offset
+
+    def _scan_log(self) -> int:
+        """Index tail events per session; truncate a torn final frame. Returns the log size."""
+        if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
+            with open(self.log_path, "wb") as f:
+                f.write(_FILE_HEADER.pack(LOG_MAGIC, FORMAT_VERSION))
+            return _FILE_HEADER.size
+
+        with open(self.log_path, "rb") as f:
+            magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+            if magic != LOG_MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{self.log_path} is not a version {FORMAT_VERSION} session log")
+            offset = f.tell()
+            while True:
+                body = read_frame(f)
+                if body is None:
+                    break
+                kind, session_id, _ = decode_body(body)
+                if kind == Event.SESSION_DELETED:
+                    self._tails.pop(session_id, None)
+                    self._snapshots.pop(session_id, None)
+                elif offset >= self._snapshots.get(session_id, 0):
+                    self._tails.setdefault(session_id, []).append(offset)
+                offset = f.tell()
+
+        if offset < os.path.getsize(self.log_path):
+            metrics.increment("session_store.truncated_frames")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(offset)
+        return offset
+
+    # ----- write path -----
+
+    def append(self, session_id: str, kind: int, fields: Tuple[Any, ...]) -> int:
+        """Buffer one event; returns its log offset"""
+        frame = encode_event(session_id, kind, fields)
+        with self._lock:
+            offset = self._offset
+            self._buffer += frame
+            self._offset += len(frame)
+            self._tails.setdefault(session_id, []).append(offset)
+        metrics.increment("session_store.events")
+        return offset
+
+    def snapshot(self, session_id: str, state: SessionState):
+        """Record state as covering everything logged so far for session_id"""
+        events = export_session(session_id, state)
+        with self._lock:
+            data = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, FORMAT_VERSION, self._offset) + events
+            # _snapshots only learns of it once the file is in place (see flush)
+            self._pending_snapshots[session_id] = (self._offset, data)
+            self._tails[session_id] = []
+        metrics.increment("session_store.snapshots")
+
+    def track(self, session_id: str, state: SessionState):
+        """Snapshot state as it is now and log every later change"""
+        self.snapshot(session_id, state)
+        state.attach(SessionLog(self, session_id, state))
+
+    def delete(self, session_id: str):
+        """Forget a session so it cannot be restored"""
+        self.append(session_id, Event.SESSION_DELETED, ())
+        with self._lock:
+            self._tails.pop(session_id, None)
+            self._snapshots.pop(session_id, None)
+            self._pending_snapshots[session_id] = None
+
+    def flush(self):
+        """
+        Write and fsync buffered events, then pending snapshots
+
+        Whatever could not be written is queued again, ahead of newer events,
+        for the next flush.
+
+        Raises:
+            OSError: Writing or syncing failed
+        """
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, bytearray()
+                snapshots, self._pending_snapshots = self._pending_snapshots, {}
+            if not buffer and not snapshots:
+                return
+            start = time.perf_counter()
+            written = 0
+            try:
+                if buffer:
+                    self._write_log(buffer)
+                written = len(buffer)
+                # Snapshots only ever cover log bytes that are already durable
+                for session_id in list(snapshots):
+                    self._write_snapshot(session_id, snapshots[session_id])
+                    pending = snapshots.pop(session_id)
+                    if pending is not None:
+                        with self._lock:
+                            # Unless deleted meanwhile
+                            if session_id in self._tails:
+                                self._snapshots[session_id] = pending[0]
+            finally:
+                if buffer[written:] or snapshots:
+                    with self._lock:
+                        self._buffer[:0] = buffer[written:]
+                        for session_id, pending in snapshots.items():
+                            # A newer snapshot or delete supersedes this one
+                            self._pending_snapshots.setdefault(session_id, pending)
+            metrics.increment("session_store.flushes")
+            metrics.increment("session_store.bytes", len(buffer))
+            metrics.observe("session_store.flush_seconds", time.perf_counter() - start)
+
+    def _write_log(self, data: bytes):
+        if self._torn:
+            # Drop what a failed write left behind so offsets stay as appended
+            self._log.close()
+            os.truncate(self.log_path, self._durable)
+            self._log = open(self.log_path, "ab")
+            self._torn = False
+        try:
+            self._log.write(data)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        except OSError:
+            self._torn = True
+            raise
+        self._durable += len(data)
+
+    def _write_snapshot(self, session_id: str, pending: Optional[Tuple[int, bytes]]):
+        path = os.path.join(self.snapshot_dir, session_id + ".snap")
+        if pending is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pending[1])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                metrics.increment("session_store.flush_errors")
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
+        self._log.close()
+
+    # ----- read path -----
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._tails or session_id in self._snapshots
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._tails) | set(self._snapshots))
+
+    def restore(self, session_id: str) -> Optional[SessionState]:
+        """
+        Rebuild a session from its snapshot and tail, and keep logging it
+
+        Returns:
+            The restored SessionState, or None if the session is unknown
+        """
+        if session_id not in self:
+            return None
+        self.flush()
+        start = time.perf_counter()
+        with self._lock:
+            has_snapshot = session_id in self._snapshots
+            tail = list(self._tails.get(session_id, []))
+
+        state = SessionState()
+        if has_snapshot:
+            with open(os.path.join(self.snapshot_dir, session_id + ".snap"), "rb") as f:
+                f.seek(_SNAPSHOT_HEADER.size)
+                _replay(state, f)
+        with open(self.log_path, "rb") as f:
+            for offset in tail:
+                f.seek(offset)
+                kind, _, fields = decode_body(read_frame(f))
+                apply_event(state, kind, fields)
+
+        state.attach(SessionLog(self, session_id, state, since_snapshot=len(tail)))
+        metrics.increment("session_store.restores")
+        metrics.observe("session_store.restore_seconds", time.perf_counter() - start)
+        return state
@@ -0,0 +1,99 @@
+"""
+Request Coalescing for EduQuest
+Concurrent identical calls share one execution ("singleflight")
+
+When a class starts together, many learners send the same prompt at the
+same moment (the first question on a topic, the same quick tips). The first
+caller for a key runs the call; callers arriving with the same key while it
+is in flight wait for it and receive its result (or its exception) instead
+of calling upstream themselves. Nothing is kept once the call finishes, so
+this is not a cache: a later caller runs a fresh call.
+
+Metrics, per group name:
+    <name>.calls       calls actually run
+    <name>.shared      callers served by another caller's call
+    <name>.waiting     gauge: callers currently waiting on a call
+    <name>.waiters     observation per call: callers that shared it
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from metrics import metrics
+
+
+class _Flight:
+    """One call in progress and the callers waiting on it"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time
+
+    Args:
+        name: Metrics prefix
+        max_waiters: Callers that may share one call (None for no limit, 0 to
+            never share); once a call has that many, the next caller with the
+            key starts a new call that later callers join instead
+    """
+
+    def __init__(self, name: str = "singleflight", max_waiters: Optional[int] = None):
+        self.name = name
+        self.max_waiters = max_waiters
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._waiting = 0
+
+    def do(self, key: Hashable, call: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run call, or wait for the identical call already in flight
+
+        Returns:
+            (result, shared); shared is True when another caller's call produced it
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and (self.max_waiters is None or flight.waiters < self.max_waiters):
+                flight.waiters += 1
+                self._waiting += 1
+                metrics.set_gauge(f"{self.name}.waiting", self._waiting)
+            else:
+                flight = None
+                leader = self._flights[key] = _Flight()
+
+        if flight is not None:
+            flight.done.wait()
+            with self._lock:
+                self._waiting -= 1
+                metrics.set_gauge(f"{self.name}.waiting", self._waiting)
+            metrics.increment(f"{self.name}.shared")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        metrics.increment(f"{self.name}.calls")
+        try:
+            leader.result = call()
+        except BaseException as e:
+            leader.error = e
+            raise
+        finally:
+            with self._lock:
+                # A full flight may already have been replaced by a newer one
+                if self._flights.get(key) is leader:
+                    del self._flights[key]
+            leader.done.set()
+            metrics.observe(f"{self.name}.waiters", leader.waiters)
+        return leader.result, False
+
+    def in_flight(self) -> int:
+        """Calls currently running"""
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,281 @@
+"""
+Spaced Repetition for EduQuest
+Per-learner SM-2 memory model with due-date priority queues
+
+Every graded answer reviews two items: the topic (keyed by
+curriculum.canonical_name) and the question itself (keyed by
+analytics.question_key). Items live in min-heaps ordered by due time; a
+reschedule pushes a fresh entry and leaves the old one to be skipped when
+it surfaces, so updates are O(log n) however many items a learner has.
+
+A learner's memory is rebuilt by replaying their answers from the quiz
+history the first time it is needed, then kept up to date answer by answer.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Collection, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from analytics import CORRECT, PARTIAL, INCORRECT, QuizHistory, question_key
+from config import (
+    SR_INITIAL_EASE, SR_MIN_EASE, SR_RELEARN_SECONDS, SR_FAST_ANSWER_SECONDS, SR_MAX_LEARNERS
+)
+from curriculum import canonical_name
+
+DAY_SECONDS = 86400
+
+
+def quality_of(verdict: int, latency: Optional[float] = None) -> int:
+    """SM-2 recall quality (0-5) for an answer verdict; fast correct answers are perfect"""
+    if verdict == CORRECT:
+        return 5 if latency is not None and latency <= SR_FAST_ANSWER_SECONDS else 4
+    if verdict == PARTIAL:
+        return 3
+    if verdict == INCORRECT:
+        return 1
+    return 0  # skipped
+
+
+class ReviewItem:
+    """Scheduling state of one topic or question"""
+
+    __slots__ = ("topic", "text", "ease", "interval", "repetitions", "lapses", "due")
+
+    def __init__(self, topic: str, text: Optional[str] = None):
+        self.topic = topic          # display name as first seen
+        self.text = text            # question text, when known in this process
+        self.ease = SR_INITIAL_EASE
+        self.interval = 0.0         # days
+        self.repetitions = 0        # successful reviews in a row
+        self.lapses = 0
+        self.due = 0.0              # unix seconds; never reviewed items are due immediately
+
+    def review(self, quality: int, now: float):
+        """
+        Apply one SM-2 review
+
+        A miss resets the streak and brings the item back after
+        SR_RELEARN_SECONDS. A successful review before the item is due does
+        not stretch the interval, so several answers in one sitting count once.
+        """
+        if quality >= 3 and now < self.due:
+            return
+        if quality >= 3:
+            if self.repetitions == 0:
+                self.interval = 1.0
+            elif self.repetitions == 1:
+                self.interval = 6.0
+            else:
+                self.interval *= self.ease
+            self.repetitions += 1
+            self.due = now + self.interval * DAY_SECONDS
+        else:
+            self.repetitions = 0
+            self.lapses += 1
+            self.interval = 1.0
+            self.due = now + SR_RELEARN_SECONDS
+        self.ease = max(SR_MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+
+class DueQueue:
+    """Min-heap of keys by due time with lazy deletion of rescheduled entries"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._live: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def push(self, key: Hashable, due: float):
+        """Schedule key at due, replacing any earlier schedule for it"""
+        seq = next(self._seq)
+        self._live[key] = seq
+        heapq.heappush(self._heap, (due, seq, key))
+        # Stale entries are normally dropped as they surface; rebuild if they pile up
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [e for e in self._heap if self._live.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+
+    def _prune(self):
+        heap = self._heap
+        while heap and self._live.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def peek(self) -> Optional[Tuple[float, Hashable]]:
+        """Earliest (due, key), None if empty"""
+        self._prune()
+        return (self._heap[0][0], self._heap[0][2]) if self._heap else None
+
+    def due(self, until: float, limit: int) -> List[Tuple[float, Hashable]]:
+        """Up to limit (due, key) pairs due by until, earliest first, in O(limit log n)"""
+        taken = []
+        self._prune()
+        while self._heap and len(taken) < limit and self._heap[0][0] <= until:
+            taken.append(heapq.heappop(self._heap))
+            self._prune()
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return [(due, key) for due, _, key in taken]
+
+
+class LearnerMemory:
+    """All review items of one learner"""
+
+    def __init__(self):
+        self.topics: Dict[str, ReviewItem] = {}
+        self.questions: Dict[Tuple[str, int], ReviewItem] = {}
+        self.topic_queue = DueQueue()
+        self._question_queues: Dict[str, DueQueue] = {}
+
+    def review(self, topic: str, verdict: int, latency: Optional[float] = None,
+               question: int = 0, text: Optional[str] = None, now: Optional[float] = None):
+        """Record one graded answer against its topic and question"""
+        now = time.time() if now is None else now
+        quality = quality_of(verdict, latency)
+        key = canonical_name(topic)
+
+        item = self.topics.get(key)
+        if item is None:
+            item = self.topics[key] = ReviewItem(topic)
+        item.review(quality, now)
+        self.topic_queue.push(key, item.due)
+
+        if question:
+            q_item = self.questions.get((key, question))
+            if q_item is None:
+                q_item = self.questions[(key, question)] = ReviewItem(topic, text)
+            q_item.text = text or q_item.text
+            q_item.review(quality, now)
+            self._question_queues.setdefault(key, DueQueue()).push(question, q_item.due)
+
+    def next_topic(self, topics: Sequence[str], pending: Optional[Dict[str, int]] = None,
+                   now: Optional[float] = None) -> str:
+        """
+        The quiz topic to ask about next: never seen, then most overdue
+
+        Args:
+            topics: Topics of the current quiz, in order (ties keep this order)
+            pending: Questions per topic asked but not graded yet (exam mode);
+                each pushes its topic back by SR_RELEARN_SECONDS
+        """
+        now = time.time() if now is None else now
+        pending = pending or {}
+
+        def priority(i: int) -> Tuple[float, int]:
+            item = self.topics.get(canonical_name(topics[i]))
+            due = item.due if item else 0.0
+            waiting = pending.get(topics[i], 0)
+            if waiting:
+                due = max(due, now) + waiting * SR_RELEARN_SECONDS
+            return due, i
+
+        return topics[min(range(len(topics)), key=priority)]
+
+    def due_question(self, topic: str, exclude: Collection[int] = (), now: Optional[float] = None,
+                     scan: int = 8) -> Optional[ReviewItem]:
+        """A due question of topic whose text is known, skipping keys in exclude"""
+        key = canonical_name(topic)
+        queue = self._question_queues.get(key)
+        if not queue:
+            return None
+        now = time.time() if now is None else now
+        for _, question in queue.due(now, scan):
+            item = self.questions[(key, question)]
+            if question not in exclude and item.text:
+                return item
+        return None
+
+    def due_topics(self, until: float, limit: int = 20) -> List[Tuple[str, float]]:
+        """(topic, due) of topics due by until, earliest first"""
+        return [(self.topics[key].topic, due) for due, key in self.topic_queue.due(until, limit)]
+
+
+class ReviewScheduler:
+    """Spaced-repetition memories of every learner, backed by a quiz history"""
+
+    def __init__(self, history: Optional[QuizHistory] = None, max_learners: int = SR_MAX_LEARNERS):
+        self.history = history
+        self.max_learners = max_learners
+        self._memories: "OrderedDict[str, LearnerMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _memory(self, learner: str) -> LearnerMemory:
+        # Caller holds the lock
+        memory = self._memories.get(learner)
+        if memory is not None:
+            self._memories.move_to_end(learner)
+            return memory
+        memory = LearnerMemory()
+        if self.history is not None:
+            for topic, question, verdict, latency, timestamp, _ in self.history.learner_answers(learner):
+                memory.review(topic, verdict, latency, question, now=timestamp)
+        self._memories[learner] = memory
+        if len(self._memories) > self.max_learners:
+            self._memories.popitem(last=False)
+        return memory
+
+    def record(self, learner: str, topic: str, verdict: int, latency: Optional[float] = None,
+               question: Optional[str] = None, now: Optional[float] = None):
+        """Review a graded answer (see analytics.verdict_of)"""
+        with self._lock:
+            self._memory(learner).review(topic, verdict, latency,
+                                         question_key(question) if question else 0, question, now)
+
+    def forget(self, learner: str):
+        """Drop learner's memory; the next lookup rebuilds it from the history"""
+        with self._lock:
+            self._memories.pop(learner, None)
+
+    def next_topic(self, learner: str, topics: Sequence[str],
+                   pending: Optional[Dict[str, int]] = None, now: Optional[float] = None) -> str:
+        """See LearnerMemory.next_topic"""
+        with self._lock:
+            return self._memory(learner).next_topic(topics, pending, now)
+
+    def due_question(self, learner: str, topic: str, exclude: Collection[str] = (),
+                     now: Optional[float] = None) -> Optional[str]:
+        """Text of a due question on topic to ask again, skipping the texts in exclude"""
+        with self._lock:
+            item = self._memory(learner).due_question(
+                topic, {question_key(text) for text in exclude}, now)
+            return item.text if item else None
+
+    def due_topics(self, learner: str, within_days: float = 0, limit: int = 20,
+                   now: Optional[float] = None) -> List[str]:
+        """Topics due for review now (or within the next within_days), earliest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [topic for topic, _ in
+                    self._memory(learner).due_topics(now + within_days * DAY_SECONDS, limit)]
+
+    def due_days(self, learner: str, days: int, limit: int = 50,
+                 now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Plan day (1 = today) on which each topic falls due within a days-long plan
+
+        Returns:
+            {topic: day}; overdue topics are due on day 1
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            due = self._memory(learner).due_topics(now + days * DAY_SECONDS, limit)
+        return {topic: min(days, max(1, math.floor((at - now) / DAY_SECONDS) + 1)) for topic, at in due}
+
+
+_schedulers: "weakref.WeakKeyDictionary[QuizHistory, ReviewScheduler]" = weakref.WeakKeyDictionary()
+_schedulers_lock = threading.Lock()
+
+
+def get_review_scheduler(history: QuizHistory) -> ReviewScheduler:
+    """The scheduler shared by everything recording into history"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(history)
+        if scheduler is None:
+            scheduler = _schedulers[history] = ReviewScheduler(history)
+        return scheduler
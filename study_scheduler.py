@@ -0,0 +1,215 @@
+"""
+Study Scheduler for EduQuest
+Deterministic day-by-day allocation of study hours, computed locally
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence, Tuple
+
+from config import DEFAULT_STUDY_HOURS_PER_DAY, SCHEDULE_SLOT_HOURS, REVIEW_HOURS_PER_SLOT
+
+# Days after first study at which a topic comes back in a review slot
+REVIEW_INTERVALS = (1, 3, 7, 14)
+
+
+@dataclass(frozen=True)
+class TopicSpec:
+    """A topic to schedule with its relative effort and prerequisites"""
+    name: str
+    weight: float = 1.0
+    prerequisites: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class StudyBlock:
+    """A contiguous block of study time on one topic"""
+    topic: str
+    hours: float
+    kind: str = "study"  # study, review, revision
+
+
+@dataclass(frozen=True)
+class DaySchedule:
+    """All blocks allocated to a single day"""
+    day: int
+    blocks: Tuple[StudyBlock, ...]
+
+    @property
+    def hours(self) -> float:
+        return sum(b.hours for b in self.blocks)
+
+    def to_dict(self) -> Dict:
+        return {
+            "day": self.day,
+            "hours": self.hours,
+            "blocks": [{"topic": b.topic, "hours": b.hours, "kind": b.kind}
+                       for b in self.blocks]
+        }
+
+
+def topological_order(topics: Sequence[TopicSpec]) -> List[TopicSpec]:
+    """
+    Order topics so every prerequisite comes before the topics that need it
+
+    Ties keep the caller's order. Prerequisites that are not in the list are
+    ignored, and topics caught in a cycle are appended in the caller's order.
+    """
+    index = {t.name: i for i, t in enumerate(topics)}
+    indegree = [0] * len(topics)
+    dependents: List[List[int]] = [[] for _ in topics]
+
+    for i, topic in enumerate(topics):
+        for prereq in set(topic.prerequisites):
+            j = index.get(prereq)
+            if j is not None and j != i:
+                indegree[i] += 1
+                dependents[j].append(i)
+
+    ready = [i for i, degree in enumerate(indegree) if degree == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for k in dependents[i]:
+            indegree[k] -= 1
+            if indegree[k] == 0:
+                heapq.heappush(ready, k)
+
+    if len(order) < len(topics):
+        placed = set(order)
+        order.extend(i for i in range(len(topics)) if i not in placed)
+
+    return [topics[i] for i in order]
+
+
+@lru_cache(maxsize=256)
+def _allocate(topics: Tuple[TopicSpec, ...], days: int, hours_per_day: float,
+              review_slots: int, final_revision_day: bool,
+              due_reviews: Tuple[Tuple[str, int], ...]) -> Tuple[DaySchedule, ...]:
+    slot = SCHEDULE_SLOT_HOURS
+    slots_per_day = max(1, int(round(hours_per_day / slot)))
+    review_slot_size = max(1, int(round(REVIEW_HOURS_PER_SLOT / slot)))
+
+    ordered = topological_order(topics)
+    revision_day = final_revision_day and days > 1 and bool(ordered)
+    study_days = days - 1 if revision_day else days
+
+    # Reserve review capacity from day 2 onward, but never more than half a day
+    review_per_day = min(review_slots * review_slot_size, slots_per_day // 2)
+    capacity = [slots_per_day - (review_per_day if d > 0 else 0) for d in range(study_days)]
+    total_capacity = sum(capacity)
+
+    # Scale relative weights to whole slots filling the available time
+    # (largest-remainder rounding keeps the total exact and deterministic)
+    total_weight = sum(max(t.weight, 0.0) for t in ordered) or 1.0
+    shares = [max(t.weight, 0.0) / total_weight * total_capacity for t in ordered]
+    need = [max(1, int(s)) for s in shares]
+    remainder = total_capacity - sum(need)
+    by_fraction = sorted(range(len(ordered)), key=lambda i: (-(shares[i] - int(shares[i])), i))
+    for i in by_fraction[:max(remainder, 0)]:
+        need[i] += 1
+
+    # Next-fit packing in prerequisite order, splitting topics across days
+    study: List[List[Tuple[str, int]]] = [[] for _ in range(study_days)]
+    last_day: Dict[str, int] = {}
+    day = 0
+    free = capacity[0]
+    for topic, slots in zip(ordered, need):
+        while slots > 0:
+            if free == 0 and day + 1 < study_days:
+                day += 1
+                free = capacity[day]
+                continue
+            # More topics than slots: overflow lands on the last study day
+            take = min(slots, free) if free else slots
+            study[day].append((topic.name, take))
+            last_day[topic.name] = day
+            slots -= take
+            free = max(free - take, 0)
+
+    # Fill review slots first with topics the learner's memory says are due
+    # (overdue ones on day 2), then with finished topics whose last study day is
+    # a review interval ago, falling back to the most recently finished topic
+    remembered = dict(due_reviews)
+    schedule = []
+    for d in range(study_days):
+        blocks = [StudyBlock(name, n * slot) for name, n in study[d]]
+        if d > 0 and review_per_day:
+            finished = [name for name, end in last_day.items() if end < d]
+            recalled = [name for name, day in remembered.items() if day <= d + 1][:review_slots]
+            for name in recalled:
+                del remembered[name]
+            due = recalled + [name for name in finished
+                              if d - last_day[name] in REVIEW_INTERVALS and name not in recalled]
+            if not due:
+                due = finished[-1:]
+            if due:
+                due = due[:review_slots]
+                base, extra = divmod(review_per_day, len(due))
+                for i, name in enumerate(due):
+                    n = base + (1 if i < extra else 0)
+                    if n:
+                        blocks.append(StudyBlock(name, n * slot, "review"))
+            # Review time with nothing due goes back to the day's last study block
+            unused = slots_per_day * slot - sum(b.hours for b in blocks)
+            studied = [i for i, b in enumerate(blocks) if b.kind == "study"]
+            if unused > 0 and studied:
+                last = blocks[studied[-1]]
+                blocks[studied[-1]] = StudyBlock(last.topic, last.hours + unused)
+        schedule.append(DaySchedule(d + 1, tuple(blocks)))
+
+    if revision_day:
+        base, extra = divmod(slots_per_day, len(ordered))
+        blocks = []
+        for i, topic in enumerate(ordered):
+            n = base + (1 if i < extra else 0)
+            if n:
+                blocks.append(StudyBlock(topic.name, n * slot, "revision"))
+        schedule.append(DaySchedule(days, tuple(blocks)))
+
+    return tuple(schedule)
+
+
+def allocate_schedule(topics: Sequence[TopicSpec], days: int,
+                      hours_per_day: float = DEFAULT_STUDY_HOURS_PER_DAY,
+                      review_slots: int = 1,
+                      final_revision_day: bool = True,
+                      due_reviews: Sequence[Tuple[str, int]] = ()) -> List[DaySchedule]:
+    """
+    Compute a day-by-day allocation of study hours
+
+    Args:
+        topics: Topics with relative weights and prerequisites
+        days: Number of days available
+        hours_per_day: Study hours per day
+        review_slots: Review blocks per day (from day 2) for spaced repetition
+        final_revision_day: Reserve the last day for revision of every topic
+        due_reviews: (topic name, plan day) pairs from the learner's spaced
+            repetition memory; each gets a review slot on or after that day
+
+    Returns:
+        One DaySchedule per day; identical inputs return identical schedules
+    """
+    if days <= 0 or not topics:
+        return []
+    return list(_allocate(tuple(topics), days, float(hours_per_day),
+                          review_slots, final_revision_day, tuple(due_reviews)))
+
+
+def format_schedule(schedule: Sequence[DaySchedule],
+                    start_date: Optional[datetime] = None) -> str:
+    """Render a schedule as compact text, one line per day"""
+    lines = []
+    for day in schedule:
+        label = f"Day {day.day}"
+        if start_date:
+            label += f" ({(start_date + timedelta(days=day.day - 1)).strftime('%B %d, %Y')})"
+        blocks = "; ".join(
+            f"{b.topic} {b.hours:g}h" + ("" if b.kind == "study" else f" [{b.kind}]")
+            for b in day.blocks
+        )
+        lines.append(f"{label}: {blocks}")
+    return "\n".join(lines)
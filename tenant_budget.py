@@ -0,0 +1,245 @@
+"""
+Tenant Budgets for EduQuest
+Per-tenant token accounting and fair shares of the model quota
+
+A tenant is whoever pays for a group of learners (a school, a class). Every
+model call is charged to the tenant in the calling context with the prompt
+and output tokens from its response's usage metadata. The ledger keeps
+lifetime totals and an exponentially decayed token rate over
+TENANT_WINDOW_SECONDS, which defines each tenant's current share.
+
+Tenants are "active" while they have calls running or queued or a recent
+token rate. An active tenant's fair share is its weight over the weights of
+all active tenants; a tenant is over its share when its part of the recent
+token rate exceeds TENANT_OVERSHARE_FACTOR times that, or over its budget
+when its rate passes its TENANT_TOKEN_BUDGETS entry (tokens per window).
+CallScheduler uses this for admission control, and each tenant's virtual
+time (tokens charged divided by weight) orders its queues fairly.
+
+Code serving a tenant wraps its work in `with tenant_context(name)`.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from config import (
+    TENANT_WEIGHTS, TENANT_TOKEN_BUDGETS, TENANT_WINDOW_SECONDS, TENANT_OVERSHARE_FACTOR
+)
+from metrics import metrics
+
+DEFAULT_TENANT = "default"
+
+# Tenant states returned by TenantLedger.status()
+WITHIN_SHARE = "ok"
+OVER_SHARE = "over_share"
+OVER_BUDGET = "over_budget"
+
+_current: contextvars.ContextVar = contextvars.ContextVar("tenant", default=DEFAULT_TENANT)
+
+
+def current_tenant() -> str:
+    """Tenant charged for model calls made from the current context"""
+    return _current.get()
+
+
+@contextmanager
+def tenant_context(tenant: Optional[str]) -> Iterator[None]:
+    """Charge the model calls made inside the block to tenant"""
+    token = _current.set(tenant or DEFAULT_TENANT)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class TenantAccount:
+    """Usage and scheduling state of one tenant"""
+
+    __slots__ = ("name", "weight", "budget", "calls", "prompt_tokens", "output_tokens",
+                 "rate", "rate_at", "virtual_time", "in_flight", "queued", "shed", "deferred")
+
+    def __init__(self, name: str, weight: float, budget: Optional[float]):
+        self.name = name
+        self.weight = weight
+        self.budget = budget          # tokens per window, None for no limit
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.rate = 0.0               # decayed tokens over the window
+        self.rate_at = time.monotonic()
+        self.virtual_time = 0.0       # tokens charged / weight, floored when it becomes active
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+        self.deferred = 0
+
+
+class TenantLedger:
+    """
+    Thread-safe token accounts of every tenant
+
+    Args:
+        weights: Relative share per tenant (missing tenants weigh 1)
+        budgets: Tokens per window per tenant (missing tenants are unlimited)
+        window: Seconds over which the token rate decays to 1/e
+        overshare: How far past its fair share a tenant may go before it is throttled
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 budgets: Optional[Dict[str, float]] = None,
+                 window: float = TENANT_WINDOW_SECONDS,
+                 overshare: float = TENANT_OVERSHARE_FACTOR):
+        self.weights = TENANT_WEIGHTS if weights is None else weights
+        self.budgets = TENANT_TOKEN_BUDGETS if budgets is None else budgets
+        self.window = window
+        self.overshare = overshare
+        self._accounts: Dict[str, TenantAccount] = {}
+        self._lock = threading.Lock()
+
+    def _account(self, tenant: str) -> TenantAccount:
+        # Caller holds the lock
+        account = self._accounts.get(tenant)
+        if account is None:
+            account = self._accounts[tenant] = TenantAccount(
+                tenant, float(self.weights.get(tenant, 1.0)), self.budgets.get(tenant))
+        return account
+
+    def _decayed(self, account: TenantAccount, now: float) -> float:
+        # Caller holds the lock
+        if now > account.rate_at:
+            account.rate *= math.exp((account.rate_at - now) / self.window)
+            account.rate_at = now
+        return account.rate
+
+    def _is_active(self, account: TenantAccount, now: float) -> bool:
+        return account.in_flight > 0 or account.queued > 0 or self._decayed(account, now) >= 1.0
+
+    def _active(self, now: float) -> List[TenantAccount]:
+        return [a for a in self._accounts.values() if self._is_active(a, now)]
+
+    def _wake(self, account: TenantAccount, now: float):
+        # Caller holds the lock; an idle tenant re-enters at the slowest active
+        # tenant's virtual time rather than spending credit banked while idle
+        if not self._is_active(account, now):
+            others = [a.virtual_time for a in self._active(now)]
+            if others:
+                account.virtual_time = max(account.virtual_time, min(others))
+
+    def status(self, tenant: str) -> str:
+        """WITHIN_SHARE, OVER_SHARE or OVER_BUDGET for tenant right now"""
+        now = time.monotonic()
+        with self._lock:
+            account = self._account(tenant)
+            rate = self._decayed(account, now)
+            if account.budget is not None and rate > account.budget:
+                return OVER_BUDGET
+            active = self._active(now)
+            if len(active) < 2 or account not in active:
+                return WITHIN_SHARE
+            total_rate = sum(a.rate for a in active)
+            fair = account.weight / sum(a.weight for a in active)
+            if total_rate > 0 and rate / total_rate > fair * self.overshare:
+                return OVER_SHARE
+            return WITHIN_SHARE
+
+    def fair_slots(self, tenant: str, capacity: int) -> int:
+        """Concurrent calls tenant is entitled to out of capacity while others are active"""
+        now = time.monotonic()
+        with self._lock:
+            account = self._account(tenant)
+            active = self._active(now)
+            if account not in active:
+                active.append(account)
+            return max(1, int(capacity * account.weight / sum(a.weight for a in active)))
+
+    def virtual_time(self, tenant: str) -> float:
+        with self._lock:
+            return self._account(tenant).virtual_time
+
+    def started(self, tenant: str, queued: bool = False):
+        """A call for tenant was admitted (or, with queued, put in a queue)"""
+        now = time.monotonic()
+        with self._lock:
+            account = self._account(tenant)
+            self._wake(account, now)
+            if queued:
+                account.queued += 1
+            else:
+                account.in_flight += 1
+
+    def dequeued(self, tenant: str, admitted: bool):
+        """A queued call left its queue, admitted or not"""
+        with self._lock:
+            account = self._account(tenant)
+            account.queued -= 1
+            if admitted:
+                account.in_flight += 1
+
+    def finished(self, tenant: str):
+        with self._lock:
+            self._account(tenant).in_flight -= 1
+
+    def in_flight(self, tenant: str) -> int:
+        with self._lock:
+            return self._account(tenant).in_flight
+
+    def record(self, tenant: str, prompt_tokens: int, output_tokens: int):
+        """Charge one completed call's tokens to tenant"""
+        now = time.monotonic()
+        tokens = prompt_tokens + output_tokens
+        with self._lock:
+            account = self._account(tenant)
+            account.calls += 1
+            account.prompt_tokens += prompt_tokens
+            account.output_tokens += output_tokens
+            account.rate = self._decayed(account, now) + tokens
+            account.virtual_time += tokens / account.weight
+        metrics.increment(f"tenants.{tenant}.tokens", tokens)
+
+    def count(self, tenant: str, event: str):
+        """Count a shed or deferred call against tenant"""
+        with self._lock:
+            account = self._account(tenant)
+            setattr(account, event, getattr(account, event) + 1)
+        metrics.increment(f"tenants.{tenant}.{event}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Live accounting for every tenant seen, e.g. for the server's /tenants endpoint"""
+        now = time.monotonic()
+        with self._lock:
+            active = self._active(now)
+            total_rate = sum(a.rate for a in active) or 1.0
+            total_weight = sum(a.weight for a in active) or 1.0
+            return {
+                a.name: {
+                    "weight": a.weight,
+                    "budget": a.budget,
+                    "calls": a.calls,
+                    "prompt_tokens": a.prompt_tokens,
+                    "output_tokens": a.output_tokens,
+                    "recent_tokens": round(self._decayed(a, now), 1),
+                    "share": round(a.rate / total_rate, 4) if a in active else 0.0,
+                    "fair_share": round(a.weight / total_weight, 4) if a in active else 0.0,
+                    "in_flight": a.in_flight,
+                    "queued": a.queued,
+                    "shed": a.shed,
+                    "deferred": a.deferred,
+                }
+                for a in self._accounts.values()
+            }
+
+
+_ledger: Optional[TenantLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_tenant_ledger() -> TenantLedger:
+    """The ledger shared by every agent in this process"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TenantLedger()
+        return _ledger